@@ -0,0 +1,479 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import concurrent.futures
+import functools
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import traceback
+import typing
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+
+import click
+import requests
+import yaml
+
+from terraform_module_generator import pipeline, providers, streaming
+from terraform_module_generator.cli import (
+    OutputTarget,
+    generate_modules,
+    get_copyright_header_template,
+    get_license,
+    get_provider_schema,
+    get_provider_store,
+)
+from terraform_module_generator.module_cache import ModuleCache
+from terraform_module_generator.schema_cache import SchemaCache
+from terraform_module_generator.store import ProviderStore
+
+LOGGER = logging.getLogger(__name__)
+
+# The amount of provider schemas which can be fetched at the same time, each of them
+# runs the provider binary
+SCHEMA_JOBS = 4
+
+
+@dataclass()
+class BatchEntry:
+    """
+    A single module to generate, as described in the batch manifest.
+    """
+
+    namespace: str
+    type: str
+    version: str
+    output_dir: str
+    license: typing.Optional[str] = None
+    copyright_header_from_template_file: typing.Optional[str] = None
+    v1: bool = False
+    share_nested_blocks: bool = False
+    plugin_config: bool = False
+    include: typing.Optional[typing.List[str]] = None
+    exclude: typing.Optional[typing.List[str]] = None
+    incremental: bool = False
+    streaming: bool = False
+    max_memory: typing.Optional[str] = None
+    schema_file: typing.Optional[str] = None
+    report: typing.Optional[str] = None
+    test_shards: int = 1
+
+    @property
+    def provider(self) -> typing.Tuple[str, str, str]:
+        return (self.namespace, self.type, self.version)
+
+
+@dataclass()
+class BatchResult:
+    """
+    The outcome of the generation of a single entry of the batch manifest.
+    """
+
+    entry: BatchEntry
+    success: bool
+    duration: float
+    module_path: typing.Optional[str] = None
+    error: typing.Optional[str] = field(default=None, repr=False)
+
+
+def load_manifest(manifest_file: str) -> typing.List[BatchEntry]:
+    """
+    Load the batch manifest.  The manifest is a yaml file containing a list of
+    modules to generate, each of them defined by the same values that can be passed
+    to the cli to generate a single module.
+
+        .. code-block:: yaml
+
+            - namespace: hashicorp
+              type: local
+              version: 2.1.0
+              output_dir: /tmp/modules
+              license: ASL 2.0
+              v1: true
+              share-nested-blocks: true
+              include:
+                - local_*
+    """
+    return parse_manifest(
+        yaml.safe_load(Path(manifest_file).read_text()), manifest_file
+    )
+
+
+def parse_manifest(raw_manifest: typing.Any, source: str) -> typing.List[BatchEntry]:
+    """
+    Get the entries of a manifest which was already loaded, see load_manifest.
+
+    :param source: Where the manifest comes from, for the error messages.
+    """
+    if not isinstance(raw_manifest, list) or not all(
+        isinstance(entry, dict) for entry in raw_manifest
+    ):
+        raise ValueError(
+            f"The manifest {source} should contain a list of modules to generate."
+        )
+
+    return [
+        BatchEntry(**{k.replace("-", "_"): v for k, v in entry.items()})
+        for entry in raw_manifest
+    ]
+
+
+def generate_entries(
+    entries: typing.List[BatchEntry],
+    cache_dir: typing.Optional[str],
+    provider_mirror: typing.Optional[str] = None,
+    provider_store: typing.Optional[ProviderStore] = None,
+    module_cache: typing.Optional[ModuleCache] = None,
+) -> typing.List[BatchResult]:
+    """
+    Generate all the entries, one after the other.  All the entries are expected to
+    be for the same provider, they then share the same working directory, and only
+    the first one will need to fetch the provider schema.  The entries which only differ
+    by their output target (output dir, license, copyright header and v1) are generated
+    together, from a single parse of the provider schema.  If a module cache is given,
+    the provider schemas and the parsed modules it holds are reused.
+    """
+    working_dir = cache_dir or tempfile.mkdtemp()
+
+    groups: typing.Dict[str, typing.List[BatchEntry]] = dict()
+    for entry in entries:
+        generation = replace(
+            entry,
+            output_dir="",
+            license=None,
+            copyright_header_from_template_file=None,
+            v1=False,
+        )
+        groups.setdefault(json.dumps(asdict(generation)), []).append(entry)
+
+    results: typing.Dict[int, BatchResult] = dict()
+    for group in groups.values():
+        entry = group[0]
+        start = time.monotonic()
+        try:
+            module_paths = generate_modules(
+                entry.namespace,
+                entry.type,
+                entry.version,
+                [
+                    OutputTarget(
+                        output_dir=target.output_dir,
+                        license=get_license(target.license),
+                        copyright_header_tmpl=get_copyright_header_template(
+                            target.copyright_header_from_template_file
+                        ),
+                        v1=target.v1,
+                    )
+                    for target in group
+                ],
+                working_dir,
+                schema_cache_dir=working_dir,
+                # The modules are already generated in parallel, the resources
+                # of each module should not be on top of that
+                workers=1,
+                share_nested_blocks=entry.share_nested_blocks,
+                plugin_config=entry.plugin_config,
+                include=entry.include,
+                exclude=entry.exclude,
+                incremental_generation=entry.incremental,
+                stream=entry.streaming,
+                max_memory=(
+                    streaming.parse_memory_size(entry.max_memory)
+                    if entry.max_memory is not None
+                    else None
+                ),
+                schema_file=entry.schema_file,
+                report_file=entry.report,
+                provider_mirror=provider_mirror,
+                provider_store=provider_store,
+                test_shards=entry.test_shards,
+                module_cache=module_cache,
+            )
+        except Exception:
+            LOGGER.exception(f"Failed to generate module for entries {group}")
+            error = traceback.format_exc()
+            for target in group:
+                results[id(target)] = BatchResult(
+                    entry=target,
+                    success=False,
+                    duration=time.monotonic() - start,
+                    error=error,
+                )
+        else:
+            for target, module_path in zip(group, module_paths):
+                results[id(target)] = BatchResult(
+                    entry=target,
+                    success=True,
+                    duration=time.monotonic() - start,
+                    module_path=module_path,
+                )
+
+    if cache_dir is None:
+        shutil.rmtree(working_dir)
+
+    return [results[id(entry)] for entry in entries]
+
+
+def get_missing_providers(
+    entries: typing.List[BatchEntry], cache_dir: str
+) -> typing.Set[providers.Provider]:
+    """
+    Get the providers which need to be installed to generate the entries: the ones
+    whose schema is neither in the schema cache nor in a schema file.
+    """
+    schema_cache = SchemaCache(cache_dir)
+    return {
+        entry.provider
+        for entry in entries
+        if entry.schema_file is None and not schema_cache.path(*entry.provider).exists()
+    }
+
+
+def fetch_providers(
+    entries: typing.List[BatchEntry],
+    working_dir: str,
+    provider_mirror: typing.Optional[str] = None,
+    session: typing.Optional[requests.Session] = None,
+    provider_store: typing.Optional[ProviderStore] = None,
+) -> typing.List[BatchEntry]:
+    """
+    Install in the working dir the providers of the entries which are missing, see
+    get_missing_providers, sending the requests to the registry through the session.
+    A failure is raised, all the entries then fail in the batch summary.
+    """
+    for provider in sorted(get_missing_providers(entries, working_dir)):
+        providers.install_provider(
+            *provider, working_dir, provider_mirror, session, provider_store
+        )
+    return entries
+
+
+def fetch_schemas(
+    entries: typing.List[BatchEntry],
+    working_dir: str,
+    provider_mirror: typing.Optional[str] = None,
+    provider_store: typing.Optional[ProviderStore] = None,
+) -> typing.List[BatchEntry]:
+    """
+    Get the schema of the providers of the entries which are not in the schema cache of
+    the working dir yet, and add them to it.  A failure is raised, all the entries then
+    fail in the batch summary.
+    """
+    schema_cache = SchemaCache(working_dir)
+    for provider in sorted(get_missing_providers(entries, working_dir)):
+        get_provider_schema(
+            *provider,
+            working_dir,
+            schema_cache,
+            provider_mirror=provider_mirror,
+            provider_store=provider_store,
+        )
+    return entries
+
+
+def generate_batch(
+    entries: typing.List[BatchEntry],
+    cache_dir: typing.Optional[str] = None,
+    jobs: typing.Optional[int] = None,
+    provider_mirror: typing.Optional[str] = None,
+    prefetch_jobs: int = providers.PREFETCH_JOBS,
+    provider_store: typing.Optional[ProviderStore] = None,
+    schema_jobs: int = SCHEMA_JOBS,
+) -> typing.List[BatchResult]:
+    """
+    Generate all the entries of the batch on a pool of processes.  The entries for
+    the same provider are generated in the same process, one after the other, so that
+    they don't compete for the same files in the cache directory.  The results are
+    returned in the same order as the entries.
+
+    The providers go through a pipeline, so that the next providers are fetched while
+    the modules of the current ones are generated:
+     1. The providers are installed in the cache directory, prefetch_jobs of them at the
+        same time, from the registry or from the provider mirror if one is given.  They
+        share a pool of connections to the registry.  They are installed from and added
+        to the provider store, if one is given.
+     2. Their schema is added to the schema cache of the cache directory, schema_jobs of
+        them at the same time.
+     3. Their modules are generated on the pool of processes, from the cached schema.
+    """
+    working_dir = cache_dir or tempfile.mkdtemp()
+    jobs = jobs or os.cpu_count() or 1
+
+    groups: typing.Dict[typing.Tuple[str, str, str], typing.List[int]] = dict()
+    for i, entry in enumerate(entries):
+        groups.setdefault(entry.provider, []).append(i)
+
+    session = providers.get_session(prefetch_jobs)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        outputs = pipeline.run_pipeline(
+            [[entries[i] for i in group] for group in groups.values()],
+            [
+                pipeline.Stage(
+                    "fetch",
+                    functools.partial(
+                        fetch_providers,
+                        working_dir=working_dir,
+                        provider_mirror=provider_mirror,
+                        session=session,
+                        provider_store=provider_store,
+                    ),
+                    jobs=prefetch_jobs,
+                ),
+                pipeline.Stage(
+                    "schema",
+                    functools.partial(
+                        fetch_schemas,
+                        working_dir=working_dir,
+                        provider_mirror=provider_mirror,
+                        provider_store=provider_store,
+                    ),
+                    jobs=schema_jobs,
+                ),
+                pipeline.Stage(
+                    "generate",
+                    functools.partial(
+                        generate_entries,
+                        cache_dir=working_dir,
+                        provider_mirror=provider_mirror,
+                        provider_store=provider_store,
+                    ),
+                    jobs=jobs,
+                    executor=executor,
+                ),
+            ],
+        )
+    session.close()
+
+    results: typing.Dict[int, BatchResult] = dict()
+    for group, output in zip(groups.values(), outputs):
+        if isinstance(output, pipeline.PipelineError):
+            # The entries of the provider are not generated when it can not be fetched
+            error = f"{output}\n" + "".join(
+                traceback.format_exception(
+                    type(output.error), output.error, output.error.__traceback__
+                )
+            )
+            output = [
+                BatchResult(entry=entries[i], success=False, duration=0, error=error)
+                for i in group
+            ]
+
+        for i, result in zip(group, output):
+            LOGGER.info(
+                f"{'Generated' if result.success else 'Failed to generate'} module "
+                f"for {'/'.join(result.entry.provider)} in {result.duration:.2f}s"
+            )
+            results[i] = result
+
+    if cache_dir is None:
+        shutil.rmtree(working_dir)
+
+    return [results[i] for i in range(len(entries))]
+
+
+@click.command()
+@click.option(
+    "--cache-dir",
+    help=(
+        "A directory in which provider binaries should be downloaded an installed, and not cleaned up afterward.  "
+        "It is shared by all the entries of the manifest."
+    ),
+    required=False,
+)
+@click.option(
+    "--jobs",
+    help="The amount of modules which can be generated in parallel.  Defaults to the amount of cpus.",
+    type=int,
+    required=False,
+)
+@click.option(
+    "--provider-mirror",
+    help=(
+        "A directory laid out as a terraform filesystem mirror (packed or unpacked), the providers are installed "
+        "from it instead of being downloaded from the registry."
+    ),
+    required=False,
+)
+@click.option(
+    "--prefetch-jobs",
+    help="The amount of providers which can be downloaded and installed at the same time, while generating the modules.",
+    type=click.IntRange(min=1),
+    default=providers.PREFETCH_JOBS,
+)
+@click.option(
+    "--schema-jobs",
+    help="The amount of provider schemas which can be fetched at the same time, while generating the modules.",
+    type=click.IntRange(min=1),
+    default=SCHEMA_JOBS,
+)
+@click.option(
+    "--provider-store",
+    help=(
+        "A directory in which the provider archives and binaries are stored, by content, and shared by all the "
+        "generations using it.  Defaults to the providers directory of the cache dir, if any."
+    ),
+    required=False,
+)
+@click.option(
+    "--provider-store-max-size",
+    help="The size (i.e. 2G, 512M) above which the least recently used providers are evicted from the provider store.",
+    required=False,
+)
+@click.option(
+    "--summary-file",
+    help="A file in which the outcome of the generation of each entry should be written, as json.",
+    required=False,
+)
+@click.argument(
+    "manifest",
+    required=True,
+)
+def main(
+    cache_dir: typing.Optional[str],
+    jobs: typing.Optional[int],
+    provider_mirror: typing.Optional[str],
+    prefetch_jobs: int,
+    schema_jobs: int,
+    provider_store: typing.Optional[str],
+    provider_store_max_size: typing.Optional[str],
+    summary_file: typing.Optional[str],
+    manifest: str,
+) -> None:
+    results = generate_batch(
+        load_manifest(manifest),
+        cache_dir,
+        jobs,
+        provider_mirror,
+        prefetch_jobs,
+        get_provider_store(provider_store, cache_dir, provider_store_max_size),
+        schema_jobs,
+    )
+
+    for result in results:
+        status = "OK" if result.success else "FAILED"
+        click.echo(
+            f"{status:<7} {'/'.join(result.entry.provider):<50} "
+            f"{'v1' if result.entry.v1 else 'v2'} {result.duration:8.2f}s "
+            f"{result.module_path or ''}"
+        )
+
+    if summary_file is not None:
+        Path(summary_file).write_text(
+            json.dumps([asdict(result) for result in results], indent=2)
+        )
+
+    failures = [result for result in results if not result.success]
+    if failures:
+        raise click.ClickException(
+            f"Failed to generate {len(failures)} out of {len(results)} modules"
+        )
+
+
+if __name__ == "__main__":
+    main()
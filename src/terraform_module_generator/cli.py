@@ -3,20 +3,44 @@
     :contact: code@inmanta.com
     :license: Inmanta EULA
 """
+import contextlib
+import cProfile
+import logging
 import shutil
 import tempfile
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Sequence
 
 import click
 from inmanta_module_factory.builder import InmantaModuleBuilder
 from inmanta_module_factory.helpers.const import ASL_2_0_LICENSE, EULA_LICENSE
 from inmanta_module_factory.inmanta.module import Module
 from inmanta_plugins.terraform.tf.terraform_provider import TerraformProvider
-from inmanta_plugins.terraform.tf.terraform_provider_installer import ProviderInstaller
 
-from terraform_module_generator import schema
-from terraform_module_generator.inmanta_module_tests import upgrade_module_tests
+import inmanta.module
+from terraform_module_generator import (
+    incremental,
+    providers,
+    report,
+    schema,
+    schema_json,
+    streaming,
+    tracing,
+)
+from terraform_module_generator.inmanta_module_tests import (
+    add_submodules,
+    get_advanced_test_files,
+    get_submodule_sizes,
+    write_module_tests,
+)
+from terraform_module_generator.module_cache import ModuleCache
+from terraform_module_generator.schema.helpers import cache
+from terraform_module_generator.schema.helpers.parallel import RenderedModuleElement
+from terraform_module_generator.schema_cache import SchemaCache
+from terraform_module_generator.store import ProviderStore
+
+LOGGER = logging.getLogger(__name__)
 
 AVAILABLE_LICENSES = (
     ASL_2_0_LICENSE,
@@ -24,45 +48,622 @@ AVAILABLE_LICENSES = (
 )
 
 
-def generate_module(
+def get_license(license: Optional[str]) -> str:
+    """
+    Validate the license provided by the user, and return the default one if none was provided.
+    """
+    if license is None:
+        return EULA_LICENSE
+
+    if license not in AVAILABLE_LICENSES:
+        raise ValueError(
+            f"The license should be one of {AVAILABLE_LICENSES} but got {license} instead."
+        )
+
+    return license
+
+
+def get_copyright_header_template(
+    copyright_header_from_template_file: Optional[str],
+) -> Optional[str]:
+    """
+    Read the copyright header template from the file provided by the user, if any.
+    """
+    if copyright_header_from_template_file is None:
+        return None
+
+    copyright_header_file = Path(copyright_header_from_template_file)
+    if not copyright_header_file.exists() or not copyright_header_file.is_file():
+        raise ValueError(
+            f"The path {copyright_header_from_template_file} doesn't point to a file."
+        )
+
+    return copyright_header_file.read_text()
+
+
+def get_provider_schema(
     namespace: str,
     type: str,
     version: str,
-    output_dir: str,
     working_dir: str,
-    license: str,
-    copyright_header_tmpl: Optional[str] = None,
-    v1: bool = True,
-) -> str:
-    installer = ProviderInstaller(namespace, type, version)
-    installer.resolve()
-    installer.download(working_dir + f"/{namespace}-{type}-{version}")
-    installed = installer.install(working_dir, force=True)
+    schema_cache: Optional[SchemaCache] = None,
+    schema_file: Optional[str] = None,
+    provider_mirror: Optional[str] = None,
+    provider_store: Optional[ProviderStore] = None,
+) -> Any:
+    """
+    Get the schema of the provider.  If a schema cache is provided and already contains
+    the schema, or if a schema file is provided, the provider binary doesn't need to be
+    downloaded nor executed.
 
-    with TerraformProvider(
+    :param schema_file: A file containing the output of `terraform providers schema
+        -json`, for a configuration using the provider.
+    :param provider_mirror: A directory laid out as a terraform filesystem mirror, the
+        provider is installed from it instead of being downloaded from the registry.
+    :param provider_store: A store the provider binary should be installed from, or
+        added to once it is downloaded.
+    """
+    if schema_file is not None:
+        with tracing.span("load schema file"):
+            return schema_json.load_schema_file(schema_file, namespace, type)
+
+    if schema_cache is not None:
+        with tracing.span("load cached schema"):
+            cached_schema = schema_cache.get(namespace, type, version)
+        if cached_schema is not None:
+            LOGGER.info(f"Using cached schema for {namespace}/{type} {version}")
+            return cached_schema
+
+    with tracing.span("install provider"):
+        installed = providers.install_provider(
+            namespace,
+            type,
+            version,
+            working_dir,
+            provider_mirror,
+            store=provider_store,
+        )
+
+    with tracing.span("get provider schema"), TerraformProvider(
         installed, working_dir + f"/{namespace}-{type}-{version}.log"
     ) as provider:
         provider_schema = provider.schema
 
-    module = Module(type, version, license=license)
-    module_builder = InmantaModuleBuilder(
-        module,
-        generation="v1" if v1 else "v2",
+    if schema_cache is not None:
+        with tracing.span("cache schema"):
+            schema_cache.put(namespace, type, version, provider_schema)
+
+    return provider_schema
+
+
+def get_provider_store(
+    store_dir: Optional[str], cache_dir: Optional[str], max_size: Optional[str]
+) -> Optional[ProviderStore]:
+    """
+    Get the provider store to use, the given one or the one of the cache dir.
+    """
+    if store_dir is None and cache_dir is not None:
+        store_dir = str(Path(cache_dir, "providers"))
+    if store_dir is None:
+        return None
+
+    return ProviderStore(
+        store_dir, streaming.parse_memory_size(max_size) if max_size else None
     )
 
+
+def get_terraform_module(
+    namespace: str,
+    type: str,
+    version: str,
+    working_dir: str,
+    schema_cache_dir: Optional[str] = None,
+    share_nested_blocks: bool = False,
+    plugin_config: bool = False,
+    include: Optional[Sequence[str]] = None,
+    exclude: Optional[Sequence[str]] = None,
+    schema_file: Optional[str] = None,
+    provider_mirror: Optional[str] = None,
+    provider_store: Optional[ProviderStore] = None,
+    module_cache: Optional[ModuleCache] = None,
+    parsed: bool = False,
+) -> schema.Module:
+    """
+    Get the module for the provider, from its schema.  If a module cache is given, the
+    provider schema is taken from it when it is there, and added to it otherwise.  If
+    parsed is set, the module is only built in memory, the module previously parsed
+    with the same options is then taken from the cache as well.
+    """
+    schema_key = None
+    module_key = None
+    if module_cache is not None:
+        schema_key = module_cache.schema_key(namespace, type, version, schema_file)
+        module_key = module_cache.module_key(
+            schema_key, share_nested_blocks, include, exclude, plugin_config
+        )
+        if parsed:
+            terraform_module = module_cache.modules.get(module_key)
+            if terraform_module is not None:
+                LOGGER.info(f"Using parsed module for {namespace}/{type} {version}")
+                return terraform_module
+
+    provider_schema = (
+        module_cache.schemas.get(schema_key)
+        if module_cache is not None and schema_key is not None
+        else None
+    )
+    if provider_schema is None:
+        provider_schema = get_provider_schema(
+            namespace,
+            type,
+            version,
+            working_dir,
+            SchemaCache(schema_cache_dir) if schema_cache_dir is not None else None,
+            schema_file,
+            provider_mirror,
+            provider_store,
+        )
+        if module_cache is not None and schema_key is not None:
+            module_cache.schemas.put(schema_key, provider_schema)
+
     terraform_module = schema.Module(
         name=type,
         schema=provider_schema,
         namespace=namespace,
         type=type,
         version=version,
+        share_nested_blocks=share_nested_blocks,
+        include=include,
+        exclude=exclude,
+        plugin_config=plugin_config,
+    )
+    if parsed and module_cache is not None and module_key is not None:
+        module_cache.modules.put(module_key, terraform_module)
+
+    return terraform_module
+
+
+@dataclass()
+class OutputTarget:
+    """
+    A flavour of the module to generate.  All the targets of a generation are built
+    from the same provider schema, they only differ by how the module is packaged.
+
+    :attr output_dir: The directory in which the module should be generated.
+    :attr license: The license of the generated module.
+    :attr copyright_header_tmpl: The copyright header to use in the generated files.
+    :attr v1: Whether to generate a v1 module, or a v2 module.
+    """
+
+    output_dir: str
+    license: str = EULA_LICENSE
+    copyright_header_tmpl: Optional[str] = None
+    v1: bool = True
+
+
+def parse_target(value: str, default: OutputTarget) -> OutputTarget:
+    """
+    Parse an output target, provided as comma separated key=value pairs, i.e.
+    output-dir=/tmp/v2,v1=false,license=ASL 2.0.  The values which are not provided
+    are taken from the default target.
+    """
+    target = replace(default)
+    for item in value.split(","):
+        key, sep, raw = item.partition("=")
+        key = key.strip().replace("_", "-")
+        if not sep:
+            raise ValueError(f"Invalid output target item {item!r} in {value!r}")
+
+        if key == "output-dir":
+            target.output_dir = raw
+        elif key == "license":
+            target.license = get_license(raw)
+        elif key == "copyright-header-from-template-file":
+            target.copyright_header_tmpl = get_copyright_header_template(raw)
+        elif key == "v1":
+            if raw.lower() not in ("true", "false"):
+                raise ValueError(f"Invalid value for v1 in {value!r}: {raw}")
+            target.v1 = raw.lower() == "true"
+        else:
+            raise ValueError(f"Unknown output target option {key!r} in {value!r}")
+
+    return target
+
+
+def get_module_builder(
+    type: str, version: str, target: OutputTarget
+) -> InmantaModuleBuilder:
+    return InmantaModuleBuilder(
+        Module(type, version, license=target.license),
+        generation="v1" if target.v1 else "v2",
     )
-    terraform_module.build(module_builder)
 
-    inmanta_module = module_builder.generate_module(
-        Path(output_dir), True, copyright_header_template=copyright_header_tmpl
+
+def generate_module(
+    namespace: str,
+    type: str,
+    version: str,
+    output_dir: str,
+    working_dir: str,
+    license: str,
+    copyright_header_tmpl: Optional[str] = None,
+    v1: bool = True,
+    schema_cache_dir: Optional[str] = None,
+    workers: int = 1,
+    share_nested_blocks: bool = False,
+    plugin_config: bool = False,
+    include: Optional[Sequence[str]] = None,
+    exclude: Optional[Sequence[str]] = None,
+    incremental_generation: bool = False,
+    stream: bool = False,
+    max_memory: Optional[int] = None,
+    schema_file: Optional[str] = None,
+    report_file: Optional[str] = None,
+    provider_mirror: Optional[str] = None,
+    provider_store: Optional[ProviderStore] = None,
+    test_shards: int = 1,
+    module_cache: Optional[ModuleCache] = None,
+) -> str:
+    """
+    Generate the module for the given provider in the output dir.
+
+    :param workers: The amount of worker processes building the resources, 0 to pick
+        it based on the amount of resources.
+    :param schema_file: A file containing the output of `terraform providers schema
+        -json`, the schema of the provider is read from it instead of running the
+        provider.
+    :param report_file: A file the size of each generated resource should be reported
+        in.  If it already contains the report of a previous generation of the module,
+        the new report contains the differences with it.
+    :param provider_mirror: A directory laid out as a terraform filesystem mirror, the
+        provider is installed from it instead of being downloaded from the registry.
+    :param provider_store: A store the provider binary should be installed from, or
+        added to once it is downloaded.
+    :param test_shards: The amount of test cases the sub-modules of the generated
+        module should be split in, to compile them in parallel.
+    :param module_cache: The provider schemas and parsed modules kept in memory by a
+        long running process, which can be reused by this generation.
+    :param plugin_config: When set, the config block of each entity is serialized by a
+        plugin of the generated module instead of a dict expression, which is cheaper to
+        compile for large resources.
+    :param incremental_generation: When set, and the module was already generated in
+        the output dir with the same options, it is updated in place, only the
+        resources whose schema changed are generated again.  Otherwise, the module is
+        fully generated, with a manifest allowing to update it later.
+    :param stream: When set, the files of each resource are written as soon as it is
+        built, instead of keeping the whole module in memory.
+    :param max_memory: If building the whole module in memory is expected to take
+        more than this amount of bytes, the resources are streamed.
+    """
+    (module_path,) = generate_modules(
+        namespace,
+        type,
+        version,
+        [OutputTarget(output_dir, license, copyright_header_tmpl, v1)],
+        working_dir,
+        schema_cache_dir=schema_cache_dir,
+        workers=workers,
+        share_nested_blocks=share_nested_blocks,
+        plugin_config=plugin_config,
+        include=include,
+        exclude=exclude,
+        incremental_generation=incremental_generation,
+        stream=stream,
+        max_memory=max_memory,
+        schema_file=schema_file,
+        report_file=report_file,
+        provider_mirror=provider_mirror,
+        provider_store=provider_store,
+        test_shards=test_shards,
+        module_cache=module_cache,
+    )
+    return module_path
+
+
+def generate_modules(
+    namespace: str,
+    type: str,
+    version: str,
+    targets: Sequence[OutputTarget],
+    working_dir: str,
+    schema_cache_dir: Optional[str] = None,
+    workers: int = 1,
+    share_nested_blocks: bool = False,
+    plugin_config: bool = False,
+    include: Optional[Sequence[str]] = None,
+    exclude: Optional[Sequence[str]] = None,
+    incremental_generation: bool = False,
+    stream: bool = False,
+    max_memory: Optional[int] = None,
+    schema_file: Optional[str] = None,
+    report_file: Optional[str] = None,
+    provider_mirror: Optional[str] = None,
+    provider_store: Optional[ProviderStore] = None,
+    test_shards: int = 1,
+    module_cache: Optional[ModuleCache] = None,
+) -> List[str]:
+    """
+    Generate the module for the given provider once for each of the output targets.
+    The provider schema is only fetched and parsed once, and unless the module is
+    streamed or generated incrementally, it is also converted once, each target only
+    writes the converted module in its own layout.  Return the path of each generated
+    module, in the order of the targets.
+
+    See generate_module for the meaning of the other options.
+    """
+    output_dirs = [Path(target.output_dir).resolve() for target in targets]
+    if len(set(output_dirs)) != len(output_dirs):
+        raise ValueError(
+            "Each output target should have its own output dir, the modules would "
+            "overwrite each other otherwise."
+        )
+
+    # Unless it is kept in the module cache, the provider schema is only referenced by
+    # the module, so that it can release it.  A parsed module is already in memory,
+    # streaming it would not make the generation any smaller.
+    terraform_module = get_terraform_module(
+        namespace,
+        type,
+        version,
+        working_dir,
+        schema_cache_dir,
+        share_nested_blocks,
+        plugin_config,
+        include,
+        exclude,
+        schema_file,
+        provider_mirror,
+        provider_store,
+        module_cache,
+        parsed=not stream and not incremental_generation,
+    )
+    if (
+        not stream
+        and not incremental_generation
+        and not share_nested_blocks
+        and max_memory is not None
+        and not terraform_module.is_parsed
+    ):
+        estimated_memory = streaming.estimate_memory(terraform_module)
+        if estimated_memory > max_memory:
+            LOGGER.info(
+                f"Streaming the resources, building them all in memory would take "
+                f"about {estimated_memory // 1024**2}MiB"
+            )
+            stream = True
+
+    generation_report: Optional[report.GenerationReport]
+    with (
+        report.record_report(Path(report_file), type, version)
+        if report_file is not None
+        else contextlib.nullcontext()
+    ) as generation_report:
+        if incremental_generation:
+            return [
+                update_module(
+                    terraform_module,
+                    get_module_builder(type, version, target),
+                    target,
+                    options=incremental.get_options_fingerprint(
+                        namespace,
+                        type,
+                        target.license,
+                        target.copyright_header_tmpl,
+                        target.v1,
+                        include,
+                        exclude,
+                        plugin_config,
+                    ),
+                    generation_report=generation_report if i == 0 else None,
+                    test_shards=test_shards,
+                )
+                for i, target in enumerate(targets)
+            ]
+
+        module_builders = [
+            get_module_builder(type, version, target) for target in targets
+        ]
+        if stream:
+            return stream_modules(
+                terraform_module,
+                module_builders,
+                targets,
+                generation_report,
+                test_shards,
+            )
+
+        with tracing.span("build module"):
+            terraform_module.build(
+                module_builders[0], workers=workers, release_schemas=True
+            )
+        if generation_report is not None:
+            generation_report.add_model_files(
+                module_builders[0]._model_files,
+                terraform_module.resource_schemas.keys(),
+            )
+        if len(module_builders) > 1:
+            # The elements are the same for all the targets, we render them once
+            rendered_elements = [
+                RenderedModuleElement.from_module_element(module_element)
+                for module_elements in module_builders[0]._model_files.values()
+                for module_element in module_elements
+            ]
+            plugins = list(module_builders[0]._plugins)
+            streaming.release_module_element_loggers(module_builders[0]._model_files)
+            for module_builder in module_builders:
+                module_builder._plugins = list(plugins)
+                module_builder._model_files.clear()
+                for module_element in rendered_elements:
+                    module_builder.add_module_element(module_element)
+
+        module_paths: List[str] = []
+        for module_builder, target in zip(module_builders, targets):
+            with tracing.span("write module", output_dir=target.output_dir):
+                inmanta_module = module_builder.generate_module(
+                    Path(target.output_dir),
+                    True,
+                    copyright_header_template=target.copyright_header_tmpl,
+                )
+            sub_modules: Dict[str, int] = dict()
+            add_submodules(sub_modules, module_builder._model_files)
+            write_module_tests(
+                module_builder,
+                inmanta_module.path,
+                sub_modules,
+                test_shards,
+                target.copyright_header_tmpl,
+            )
+            streaming.release_module_element_loggers(module_builder._model_files)
+            module_paths.append(inmanta_module.path)
+
+        return module_paths
+
+
+def stream_modules(
+    terraform_module: schema.Module,
+    module_builders: Sequence[InmantaModuleBuilder],
+    targets: Sequence[OutputTarget],
+    generation_report: Optional[report.GenerationReport] = None,
+    test_shards: int = 1,
+) -> List[str]:
+    """
+    Generate the module for each of the targets, writing the files of each resource
+    in all of them as soon as it is built.
+    """
+    stream_targets: List[streaming.StreamTarget] = []
+    inmanta_modules: List[inmanta.module.Module] = []
+    sub_modules: Dict[str, int] = dict()
+    for module_builder, target in zip(module_builders, targets):
+        # The base elements are written with the skeleton of the module, the resources
+        # are then written one by one
+        terraform_module.build_base(module_builder)
+        if not sub_modules:
+            add_submodules(sub_modules, module_builder._model_files)
+        with tracing.span("write module", output_dir=target.output_dir):
+            inmanta_module = module_builder.generate_module(
+                Path(target.output_dir),
+                True,
+                copyright_header_template=target.copyright_header_tmpl,
+            )
+        streaming.release_module_element_loggers(module_builder._model_files)
+        module_builder._model_files.clear()
+        stream_targets.append(
+            streaming.StreamTarget(
+                module_builder,
+                Path(inmanta_module.path, "model"),
+                target.copyright_header_tmpl,
+            )
+        )
+        inmanta_modules.append(inmanta_module)
+
+    streaming.build_modules(
+        terraform_module, stream_targets, generation_report, sub_modules
+    )
+    add_submodules(sub_modules, stream_targets[0].module_builder._model_files)
+
+    for stream_target, inmanta_module in zip(stream_targets, inmanta_modules):
+        streaming.write_model_files(
+            stream_target.module_builder,
+            stream_target.model_dir,
+            stream_target.copyright_header_tmpl,
+        )
+        write_module_tests(
+            stream_target.module_builder,
+            inmanta_module.path,
+            sub_modules,
+            test_shards,
+            stream_target.copyright_header_tmpl,
+        )
+
+    return [inmanta_module.path for inmanta_module in inmanta_modules]
+
+
+def update_module(
+    terraform_module: schema.Module,
+    module_builder: InmantaModuleBuilder,
+    target: OutputTarget,
+    options: str,
+    generation_report: Optional[report.GenerationReport] = None,
+    test_shards: int = 1,
+) -> str:
+    """
+    Update in place the module previously generated in the output dir of the target,
+    if it was generated with the same options, or generate it fully with a manifest
+    allowing to update it later.  The resources which are not generated again are
+    reported as they were in the previous report.
+    """
+    type = terraform_module.name
+    version = terraform_module.version
+    module_path = incremental.find_module(target.output_dir, type)
+    previous = (
+        incremental.GenerationManifest.load(module_path)
+        if module_path is not None
+        else None
     )
-    upgrade_module_tests(inmanta_module)
+    if module_path is not None and previous is not None and previous.options == options:
+        LOGGER.info(f"Updating the module generated at {module_path}")
+        with tracing.span("update module", module_path=str(module_path)):
+            manifest, changed = incremental.regenerate_model(
+                module_path,
+                terraform_module,
+                module_builder,
+                previous,
+                target.copyright_header_tmpl,
+            )
+        if generation_report is not None:
+            generation_report.add_model_files(
+                module_builder._model_files, changed & manifest.resources.keys()
+            )
+            generation_report.add_unchanged_resources(
+                manifest.resources.keys() - changed
+            )
+
+        inmanta_module = inmanta.module.Module.from_path(str(module_path))
+        assert inmanta_module is not None
+        if str(inmanta_module.version) != version:
+            inmanta_module.rewrite_version(version)
+
+        test_files = get_advanced_test_files(str(module_path))
+        if changed or len(test_files) != test_shards:
+            # The resources might not have the same sub-modules anymore
+            for test_file in test_files:
+                test_file.unlink()
+            # The module builder only holds the resources which were generated again
+            write_module_tests(
+                module_builder,
+                inmanta_module.path,
+                get_submodule_sizes(inmanta_module),
+                test_shards,
+                target.copyright_header_tmpl,
+            )
+    else:
+        with tracing.span("build module"):
+            resources, _ = incremental.build_module(terraform_module, module_builder)
+        if generation_report is not None:
+            generation_report.add_model_files(
+                module_builder._model_files, resources.keys()
+            )
+        with tracing.span("write module", output_dir=target.output_dir):
+            inmanta_module = module_builder.generate_module(
+                Path(target.output_dir),
+                True,
+                copyright_header_template=target.copyright_header_tmpl,
+            )
+        sub_modules: Dict[str, int] = dict()
+        add_submodules(sub_modules, module_builder._model_files)
+        write_module_tests(
+            module_builder,
+            inmanta_module.path,
+            sub_modules,
+            test_shards,
+            target.copyright_header_tmpl,
+        )
+        manifest = incremental.GenerationManifest(
+            module=type, options=options, resources=resources
+        )
+
+    manifest.save(Path(inmanta_module.path))
+    streaming.release_module_element_loggers(module_builder._model_files)
 
     return inmanta_module.path
 
@@ -85,7 +686,10 @@ def generate_module(
 )
 @click.option(
     "--cache-dir",
-    help="A directory in which provider binaries should be downloaded an installed, and not cleaned up afterward.",
+    help=(
+        "A directory in which provider binaries should be downloaded an installed, and not cleaned up afterward.  "
+        "The parsed provider schemas are cached there as well, so that they don't need to be fetched again."
+    ),
     required=False,
 )
 @click.option(
@@ -107,6 +711,147 @@ def generate_module(
     is_flag=True,
     default=False,
 )
+@click.option(
+    "--share-nested-blocks",
+    help=(
+        "Represent all the nested blocks with the same structure by a single entity, shared by all the "
+        "resources using it.  This makes the generated module smaller for providers repeating the same blocks."
+    ),
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--plugin-config",
+    help=(
+        "Serialize the config block of each entity with a single call to a plugin of the generated module, "
+        "instead of a dict expression.  This makes the generated module faster to compile for providers with "
+        "large resources."
+    ),
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--include",
+    help=(
+        "Only generate the resources and data sources whose name matches this glob pattern (i.e. aws_s3_*).  "
+        "Can be used multiple times."
+    ),
+    multiple=True,
+)
+@click.option(
+    "--exclude",
+    help="Don't generate the resources and data sources whose name matches this glob pattern.  Can be used multiple times.",
+    multiple=True,
+)
+@click.option(
+    "--incremental",
+    help=(
+        "If the module was already generated in the output dir, only generate again the resources whose "
+        "schema changed, leaving the other files untouched."
+    ),
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--streaming",
+    "stream",
+    help=(
+        "Write the files of each resource as soon as it is built, instead of keeping the whole module "
+        "in memory.  This bounds the memory usage for large providers."
+    ),
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--max-memory",
+    help=(
+        "A memory budget for the generation (i.e. 2G, 512M).  If building the whole module in memory is "
+        "expected to exceed it, the resources are streamed."
+    ),
+    required=False,
+)
+@click.option(
+    "--workers",
+    help=(
+        "The amount of worker processes building the resources of the module, 0 to pick it based on the amount "
+        "of resources (one per 100 resources, at most one per cpu)."
+    ),
+    type=click.IntRange(min=0),
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--target",
+    help=(
+        "Generate another flavour of the module, from the same provider schema, as comma separated "
+        "key=value pairs (i.e. output-dir=/tmp/v2,v1=false,license=ASL 2.0).  The accepted keys are "
+        "output-dir, v1, license and copyright-header-from-template-file, the missing ones take the "
+        "value of the main module.  Can be used multiple times."
+    ),
+    multiple=True,
+)
+@click.option(
+    "--schema-file",
+    help=(
+        "A file containing the output of `terraform providers schema -json`, for a configuration using the "
+        "provider.  The schema of the provider is read from it, the provider is not downloaded nor executed."
+    ),
+    required=False,
+)
+@click.option(
+    "--provider-mirror",
+    help=(
+        "A directory laid out as a terraform filesystem mirror (packed or unpacked), the provider is installed "
+        "from it instead of being downloaded from the registry."
+    ),
+    required=False,
+)
+@click.option(
+    "--provider-store",
+    help=(
+        "A directory in which the provider archives and binaries are stored, by content, and shared by all the "
+        "generations using it.  Defaults to the providers directory of the cache dir, if any."
+    ),
+    required=False,
+)
+@click.option(
+    "--provider-store-max-size",
+    help="The size (i.e. 2G, 512M) above which the least recently used providers are evicted from the provider store.",
+    required=False,
+)
+@click.option(
+    "--test-shards",
+    help=(
+        "Split the sub-modules of the generated module in this amount of test cases of about the same size, "
+        "test_advanced_<shard>.py, so that they can be compiled in parallel, i.e. with pytest-xdist."
+    ),
+    type=click.IntRange(min=1),
+    default=1,
+)
+@click.option(
+    "--trace",
+    help=(
+        "Write the duration of each stage of the generation (download, parse, build and write of each "
+        "resource) to this file, in the chrome trace event format.  It can be opened in Perfetto."
+    ),
+    required=False,
+)
+@click.option(
+    "--report",
+    "report_file",
+    help=(
+        "Write the size of each generated resource (entities, attributes, relations, indexes, implementations, "
+        "depth, lines) and the time spent building it to this json file.  If the file already contains the "
+        "report of a previous generation, the differences with it are part of the new report."
+    ),
+    required=False,
+)
+@click.option(
+    "--profile",
+    help="Profile the generation, the statistics are written next to the generated module, to <type>-generation.prof.",
+    is_flag=True,
+    default=False,
+)
 @click.argument(
     "output_dir",
     required=True,
@@ -119,39 +864,84 @@ def main(
     license: Optional[str],
     copyright_header_from_template_file: Optional[str],
     v1: bool,
+    share_nested_blocks: bool,
+    plugin_config: bool,
+    include: Sequence[str],
+    exclude: Sequence[str],
+    incremental: bool,
+    stream: bool,
+    max_memory: Optional[str],
+    workers: int,
+    target: Sequence[str],
+    schema_file: Optional[str],
+    provider_mirror: Optional[str],
+    provider_store: Optional[str],
+    provider_store_max_size: Optional[str],
+    test_shards: int,
+    trace: Optional[str],
+    report_file: Optional[str],
+    profile: bool,
     output_dir: str,
 ) -> None:
+    main_target = OutputTarget(
+        output_dir=output_dir,
+        license=get_license(license),
+        copyright_header_tmpl=get_copyright_header_template(
+            copyright_header_from_template_file
+        ),
+        v1=v1,
+    )
+    targets = [main_target] + [parse_target(t, main_target) for t in target]
+
     working_dir = cache_dir
     if working_dir is None:
         working_dir = tempfile.mkdtemp()
 
-    if license is None:
-        license = EULA_LICENSE
-    if license not in AVAILABLE_LICENSES:
-        raise ValueError(
-            f"The license should be one of {AVAILABLE_LICENSES} but got {license} instead."
-        )
-
-    copyright_header_tmpl = None
-    if copyright_header_from_template_file is not None:
-        copyright_header_file = Path(copyright_header_from_template_file)
-        if not copyright_header_file.exists() or not copyright_header_file.is_file():
-            raise ValueError(
-                f"The path {copyright_header_from_template_file} doesn't point to a file."
-            )
+    profiler = cProfile.Profile() if profile else None
+    if trace is not None:
+        tracing.start_tracing()
+    if profiler is not None:
+        profiler.enable()
 
-        copyright_header_tmpl = copyright_header_file.read_text()
+    try:
+        generate_modules(
+            namespace,
+            type,
+            version,
+            targets,
+            working_dir,
+            schema_cache_dir=cache_dir,
+            workers=workers,
+            share_nested_blocks=share_nested_blocks,
+            plugin_config=plugin_config,
+            include=include,
+            exclude=exclude,
+            incremental_generation=incremental,
+            stream=stream,
+            max_memory=(
+                streaming.parse_memory_size(max_memory)
+                if max_memory is not None
+                else None
+            ),
+            schema_file=schema_file,
+            report_file=report_file,
+            provider_mirror=provider_mirror,
+            provider_store=get_provider_store(
+                provider_store, cache_dir, provider_store_max_size
+            ),
+            test_shards=test_shards,
+        )
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profile_path = Path(output_dir, f"{type}-generation.prof")
+            profile_path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(profile_path))
+            LOGGER.info(f"Wrote the profile of the generation to {profile_path}")
+        if trace is not None:
+            tracing.write_trace(trace, tracing.stop_tracing())
 
-    generate_module(
-        namespace,
-        type,
-        version,
-        output_dir,
-        working_dir,
-        license,
-        copyright_header_tmpl,
-        v1,
-    )
+    cache.log_cache_info()
 
     if cache_dir is None:
         shutil.rmtree(working_dir)
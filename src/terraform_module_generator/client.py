@@ -0,0 +1,184 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import http.client
+import json
+import os
+import socket
+import tempfile
+import typing
+from pathlib import Path
+
+import click
+import yaml
+
+# This module is imported by the client, it should only import what the client needs,
+# so that it starts fast: the generator itself is only imported by the daemon.
+
+# The unix socket the daemon listens on, if none is given
+DEFAULT_SOCKET = str(
+    Path(tempfile.gettempdir(), f"terraform-module-generator-{os.getuid()}.sock")
+)
+
+
+class DaemonError(Exception):
+    """
+    Raised when the daemon can not be reached, or rejected the request.
+    """
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    An http connection to a server listening on a unix socket.
+    """
+
+    def __init__(self, socket_path: str, timeout: typing.Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request(
+    socket_path: str,
+    method: str,
+    path: str,
+    body: typing.Optional[typing.Any] = None,
+) -> typing.Any:
+    """
+    Send a request to the daemon and return the json body of its response.  There is no
+    timeout, a generation can take as long as it needs.
+    """
+    connection = UnixHTTPConnection(socket_path)
+    try:
+        connection.request(
+            method,
+            path,
+            body=json.dumps(body).encode() if body is not None else None,
+            headers={"Content-Type": "application/json"},
+        )
+        response = connection.getresponse()
+        payload = json.loads(response.read() or b"null")
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise DaemonError(
+            f"No daemon is listening on {socket_path}, it can be started with daemon.py"
+        ) from e
+    finally:
+        connection.close()
+
+    if response.status != 200:
+        raise DaemonError(
+            payload.get("error") if isinstance(payload, dict) else payload
+        )
+
+    return payload
+
+
+def generate(
+    socket_path: str, manifest: typing.List[dict], cwd: typing.Optional[str] = None
+) -> typing.List[dict]:
+    """
+    Ask the daemon to generate all the entries of the manifest, in the batch manifest
+    format.  The relative paths of the entries are relative to cwd, the current
+    directory if not set.  Return the outcome of each entry, in the batch summary format.
+    """
+    return request(
+        socket_path,
+        "POST",
+        "/generate",
+        {"cwd": cwd or os.getcwd(), "manifest": manifest},
+    )
+
+
+@click.group()
+@click.option(
+    "--socket",
+    "socket_path",
+    help="The unix socket the daemon listens on.",
+    envvar="TERRAFORM_MODULE_GENERATOR_SOCKET",
+    default=DEFAULT_SOCKET,
+    show_default=True,
+)
+@click.pass_context
+def main(ctx: click.Context, socket_path: str) -> None:
+    """
+    Send generation requests to a running daemon, which keeps the generator and the
+    provider schemas loaded between the requests.
+    """
+    ctx.obj = socket_path
+
+
+@main.command("generate")
+@click.option(
+    "--summary-file",
+    help="A file in which the outcome of the generation of each entry should be written, as json.",
+    required=False,
+)
+@click.argument(
+    "manifest",
+    required=True,
+)
+@click.pass_obj
+def generate_command(
+    socket_path: str, summary_file: typing.Optional[str], manifest: str
+) -> None:
+    """
+    Generate all the modules described in the manifest, a yaml file in the same format
+    as the batch manifest.
+    """
+    try:
+        results = generate(socket_path, yaml.safe_load(Path(manifest).read_text()))
+    except DaemonError as e:
+        raise click.ClickException(str(e))
+
+    for result in results:
+        entry = result["entry"]
+        status = "OK" if result["success"] else "FAILED"
+        provider = "/".join([entry["namespace"], entry["type"], entry["version"]])
+        click.echo(
+            f"{status:<7} {provider:<50} "
+            f"{'v1' if entry['v1'] else 'v2'} {result['duration']:8.2f}s "
+            f"{result['module_path'] or ''}"
+        )
+
+    if summary_file is not None:
+        Path(summary_file).write_text(json.dumps(results, indent=2))
+
+    failures = [result for result in results if not result["success"]]
+    if failures:
+        raise click.ClickException(
+            f"Failed to generate {len(failures)} out of {len(results)} modules"
+        )
+
+
+@main.command()
+@click.pass_obj
+def status(socket_path: str) -> None:
+    """
+    Show the state of the daemon and of its caches.
+    """
+    try:
+        click.echo(json.dumps(request(socket_path, "GET", "/status"), indent=2))
+    except DaemonError as e:
+        raise click.ClickException(str(e))
+
+
+@main.command()
+@click.pass_obj
+def stop(socket_path: str) -> None:
+    """
+    Stop the daemon, once the current request is done.
+    """
+    try:
+        request(socket_path, "POST", "/shutdown")
+    except DaemonError as e:
+        raise click.ClickException(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import http.server
+import json
+import logging
+import os
+import shutil
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+import typing
+from dataclasses import asdict, replace
+from pathlib import Path
+
+import click
+
+from terraform_module_generator import batch, client
+from terraform_module_generator.cli import get_provider_store
+from terraform_module_generator.module_cache import (
+    MAX_MODULES,
+    MAX_SCHEMAS,
+    ModuleCache,
+)
+from terraform_module_generator.schema.helpers import cache
+from terraform_module_generator.store import ProviderStore
+
+LOGGER = logging.getLogger(__name__)
+
+# The paths of the entries which are relative to the directory of the client
+ENTRY_PATHS = [
+    "output_dir",
+    "copyright_header_from_template_file",
+    "schema_file",
+    "report",
+]
+
+
+class GeneratorDaemon:
+    """
+    A long running generator, keeping the generator loaded and the provider schemas and
+    parsed modules in memory between the generations.  The generations are done one
+    after the other, sharing the same working dir, as the entries of a batch for the
+    same provider.
+    """
+
+    def __init__(
+        self,
+        working_dir: str,
+        provider_mirror: typing.Optional[str] = None,
+        provider_store: typing.Optional[ProviderStore] = None,
+        module_cache: typing.Optional[ModuleCache] = None,
+    ) -> None:
+        self.working_dir = working_dir
+        self.provider_mirror = provider_mirror
+        self.provider_store = provider_store
+        self.module_cache = module_cache or ModuleCache()
+        self.started = time.time()
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def generate(
+        self, raw_manifest: typing.Any, cwd: str
+    ) -> typing.List[batch.BatchResult]:
+        """
+        Generate all the entries of the manifest, in the batch manifest format.  Their
+        relative paths are relative to cwd.
+        """
+        entries = [
+            replace(
+                entry,
+                **{
+                    name: str(Path(cwd, getattr(entry, name)))
+                    for name in ENTRY_PATHS
+                    if getattr(entry, name) is not None
+                },
+            )
+            for entry in batch.parse_manifest(raw_manifest, "of the request")
+        ]
+
+        with self.lock:
+            self.requests += 1
+            try:
+                return batch.generate_entries(
+                    entries,
+                    self.working_dir,
+                    self.provider_mirror,
+                    self.provider_store,
+                    self.module_cache,
+                )
+            finally:
+                cache.log_cache_info()
+
+    def get_status(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "pid": os.getpid(),
+            "uptime": time.time() - self.started,
+            "requests": self.requests,
+            "working_dir": self.working_dir,
+            "module_cache": self.module_cache.get_info(),
+        }
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    The api of the daemon, see the client module:
+     - GET /status: the state of the daemon and of its caches.
+     - POST /generate: generate the entries of the manifest, {"cwd": ..., "manifest": [...]}.
+     - POST /shutdown: stop the daemon.
+    """
+
+    server: "DaemonServer"
+
+    def send_json(self, status: int, payload: typing.Any) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path != "/status":
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        self.send_json(200, self.server.daemon.get_status())
+
+    def do_POST(self) -> None:
+        if self.path == "/shutdown":
+            self.send_json(200, None)
+            # The server waits for the current request to be done before stopping
+            threading.Thread(target=self.server.shutdown).start()
+            return
+
+        if self.path != "/generate":
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        try:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            results = self.server.daemon.generate(body["manifest"], body["cwd"])
+        except (ValueError, TypeError, KeyError) as e:
+            self.send_json(400, {"error": f"Invalid generation request: {e}"})
+            return
+
+        self.send_json(200, [asdict(result) for result in results])
+
+    def address_string(self) -> str:
+        return self.server.socket_path
+
+    def log_message(self, format: str, *args: typing.Any) -> None:
+        LOGGER.debug(format % args)
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """
+    An http server listening on a unix socket, only accessible to the current user.
+    The requests are handled one after the other.
+    """
+
+    def __init__(self, socket_path: str, daemon: GeneratorDaemon) -> None:
+        self.socket_path = socket_path
+        self.daemon = daemon
+        remove_stale_socket(socket_path)
+        super().__init__(socket_path, RequestHandler)
+
+    def server_bind(self) -> None:
+        # The socket is only created once it is restricted to the current user
+        old_umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(old_umask)
+
+    def server_close(self) -> None:
+        super().server_close()
+        Path(self.socket_path).unlink(missing_ok=True)
+
+
+def remove_stale_socket(socket_path: str) -> None:
+    """
+    Remove the socket left over by a daemon which didn't stop properly.  Raise a
+    RuntimeError if another daemon is still listening on it.
+    """
+    if not Path(socket_path).exists():
+        return
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except ConnectionRefusedError:
+            LOGGER.info(f"Removing the stale socket {socket_path}")
+            Path(socket_path).unlink()
+            return
+
+    raise RuntimeError(f"Another daemon is already listening on {socket_path}")
+
+
+@click.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    help="The unix socket the daemon should listen on.",
+    envvar="TERRAFORM_MODULE_GENERATOR_SOCKET",
+    default=client.DEFAULT_SOCKET,
+    show_default=True,
+)
+@click.option(
+    "--cache-dir",
+    help=(
+        "A directory in which provider binaries should be downloaded an installed, and not cleaned up afterward.  "
+        "The parsed provider schemas are cached there as well, so that they don't need to be fetched again."
+    ),
+    required=False,
+)
+@click.option(
+    "--provider-mirror",
+    help=(
+        "A directory laid out as a terraform filesystem mirror (packed or unpacked), the providers are installed "
+        "from it instead of being downloaded from the registry."
+    ),
+    required=False,
+)
+@click.option(
+    "--provider-store",
+    help=(
+        "A directory in which the provider archives and binaries are stored, by content, and shared by all the "
+        "generations using it.  Defaults to the providers directory of the cache dir, if any."
+    ),
+    required=False,
+)
+@click.option(
+    "--provider-store-max-size",
+    help="The size (i.e. 2G, 512M) above which the least recently used providers are evicted from the provider store.",
+    required=False,
+)
+@click.option(
+    "--max-schemas",
+    help="The amount of provider schemas kept in memory between the generations.",
+    type=click.IntRange(min=1),
+    default=MAX_SCHEMAS,
+)
+@click.option(
+    "--max-modules",
+    help="The amount of parsed modules kept in memory between the generations.",
+    type=click.IntRange(min=1),
+    default=MAX_MODULES,
+)
+def main(
+    socket_path: str,
+    cache_dir: typing.Optional[str],
+    provider_mirror: typing.Optional[str],
+    provider_store: typing.Optional[str],
+    provider_store_max_size: typing.Optional[str],
+    max_schemas: int,
+    max_modules: int,
+) -> None:
+    """
+    Serve the generation requests sent with client.py, until it is stopped.
+    """
+    working_dir = cache_dir or tempfile.mkdtemp()
+    daemon = GeneratorDaemon(
+        working_dir,
+        provider_mirror,
+        get_provider_store(provider_store, cache_dir, provider_store_max_size),
+        ModuleCache(max_schemas, max_modules),
+    )
+
+    try:
+        server = DaemonServer(socket_path, daemon)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"Listening on {socket_path}")
+    try:
+        with server:
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if cache_dir is None:
+            shutil.rmtree(working_dir)
+
+
+if __name__ == "__main__":
+    main()
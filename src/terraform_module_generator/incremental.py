@@ -0,0 +1,282 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import hashlib
+import json
+import logging
+import shutil
+import tempfile
+import typing
+from dataclasses import dataclass
+from pathlib import Path
+
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.helpers.utils import inmanta_safe_name
+from inmanta_module_factory.inmanta import DummyModuleElement
+
+from terraform_module_generator import schema
+from terraform_module_generator.schema.helpers.parallel import RenderedModuleElement
+from terraform_module_generator.schema_cache import dump_schema
+
+LOGGER = logging.getLogger(__name__)
+
+# The file, at the root of the generated module, in which the generation manifest is saved
+MANIFEST_FILE = ".terraform_module_generator.json"
+
+# The version of the generated model, it must be bumped whenever the model generated
+# for the same schema and options changes, so that all the resources are generated again
+OUTPUT_FORMAT_VERSION = 1
+
+
+def get_resource_fingerprint(resource_schema: typing.Any) -> str:
+    """
+    Get a fingerprint of the schema of a resource, if it doesn't change, the resource
+    will be generated the exact same way.
+    """
+    return hashlib.sha256(dump_schema(resource_schema)).hexdigest()
+
+
+def get_options_fingerprint(*options: typing.Any) -> str:
+    """
+    Get a fingerprint of all the options used to generate a module, if any of them
+    changes, all the resources have to be generated again.
+    """
+    return hashlib.sha256(
+        json.dumps([OUTPUT_FORMAT_VERSION, *options]).encode("utf-8")
+    ).hexdigest()
+
+
+def dump_module_element(module_element: RenderedModuleElement) -> dict:
+    return {
+        "name": module_element.name,
+        "path": module_element.path,
+        "ordering_key": module_element.ordering_key,
+        "imports": sorted(module_element.get_imports()),
+        "content": module_element.content,
+    }
+
+
+def load_module_element(raw: dict) -> RenderedModuleElement:
+    return RenderedModuleElement(
+        name=raw["name"],
+        path=raw["path"],
+        ordering_key=raw["ordering_key"],
+        imports=set(raw["imports"]),
+        content=raw["content"],
+    )
+
+
+@dataclass()
+class ResourceManifest:
+    """
+    What we need to know about a resource to decide whether it should be generated
+    again, and to generate the resources sub-module if it shouldn't.
+
+    :attr fingerprint: The fingerprint of the schema of the resource.
+    :attr module_elements: The elements the resource added to the resources sub-module.
+    """
+
+    fingerprint: str
+    module_elements: typing.List[RenderedModuleElement]
+
+
+@dataclass()
+class GenerationManifest:
+    """
+    The manifest saved in a generated module, describing how it was generated.
+
+    :attr module: The name of the generated module.
+    :attr options: The fingerprint of the options used to generate the module.
+    :attr resources: The manifest of each resource of the module.
+    """
+
+    module: str
+    options: str
+    resources: typing.Dict[str, ResourceManifest]
+
+    def save(self, module_path: Path) -> None:
+        raw = {
+            "module": self.module,
+            "options": self.options,
+            "resources": {
+                name: {
+                    "fingerprint": resource.fingerprint,
+                    "module_elements": [
+                        dump_module_element(module_element)
+                        for module_element in resource.module_elements
+                    ],
+                }
+                for name, resource in sorted(self.resources.items())
+            },
+        }
+        Path(module_path, MANIFEST_FILE).write_text(json.dumps(raw, indent=1))
+
+    @classmethod
+    def load(cls, module_path: Path) -> typing.Optional["GenerationManifest"]:
+        """
+        Load the manifest saved in the generated module, if there is any and it can
+        be read.
+        """
+        manifest_file = Path(module_path, MANIFEST_FILE)
+        if not manifest_file.exists():
+            return None
+
+        try:
+            raw = json.loads(manifest_file.read_text())
+            return GenerationManifest(
+                module=raw["module"],
+                options=raw["options"],
+                resources={
+                    name: ResourceManifest(
+                        fingerprint=resource["fingerprint"],
+                        module_elements=[
+                            load_module_element(module_element)
+                            for module_element in resource["module_elements"]
+                        ],
+                    )
+                    for name, resource in raw["resources"].items()
+                },
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            LOGGER.warning(f"Ignoring unreadable manifest {manifest_file}: {e}")
+            return None
+
+
+def find_module(output_dir: str, name: str) -> typing.Optional[Path]:
+    """
+    Find the module with the given name, previously generated in the output dir.
+    """
+    for manifest_file in sorted(Path(output_dir).glob(f"*/{MANIFEST_FILE}")):
+        manifest = GenerationManifest.load(manifest_file.parent)
+        if manifest is not None and manifest.module == name:
+            return manifest_file.parent
+
+    return None
+
+
+def build_module(
+    terraform_module: schema.Module,
+    module_builder: InmantaModuleBuilder,
+    previous: typing.Optional[GenerationManifest] = None,
+) -> typing.Tuple[typing.Dict[str, ResourceManifest], typing.Set[str]]:
+    """
+    Add all the elements of the module to the module builder, one resource after the
+    other.  The resources whose fingerprint didn't change since the previous
+    generation are not parsed, only the elements they added to the resources
+    sub-module are added back to the module builder.
+
+    Return the manifest of each resource, and the name of the resources which were
+    built again.
+    """
+    if terraform_module.shared_nested_blocks is not None:
+        raise ValueError(
+            "The module can not be generated incrementally when sharing the nested blocks"
+        )
+
+    terraform_module.build_base(module_builder)
+
+    resources: typing.Dict[str, ResourceManifest] = dict()
+    built: typing.Set[str] = set()
+    for name, resource_schema in terraform_module.resource_schemas.items():
+        fingerprint = get_resource_fingerprint(resource_schema)
+        resource = previous.resources.get(name) if previous is not None else None
+        if resource is None or resource.fingerprint != fingerprint:
+            resource = ResourceManifest(
+                fingerprint=fingerprint,
+                module_elements=[
+                    RenderedModuleElement.from_module_element(module_element)
+                    for module_element in terraform_module.add_resource(
+                        name, module_builder
+                    )
+                ],
+            )
+            built.add(name)
+        else:
+            for module_element in resource.module_elements:
+                module_builder.add_module_element(module_element)
+
+        resources[name] = resource
+
+    return resources, built
+
+
+def write_model_files(
+    module_builder: InmantaModuleBuilder,
+    model_dir: Path,
+    copyright_header_tmpl: typing.Optional[str] = None,
+) -> typing.List[Path]:
+    """
+    Write all the files of the module builder in the model dir, leaving untouched the
+    ones whose content didn't change.  Return the files which were written.
+    """
+    model_files = module_builder._model_files
+    for file_key in list(model_files.keys()):
+        # Same as the module builder does, each parent of a file should exist
+        parts = file_key.split("::")
+        for i in range(2, len(parts)):
+            if "::".join(parts[:i]) not in model_files:
+                model_files["::".join(parts[:i])] = [DummyModuleElement(parts[:i])]
+
+    written: typing.List[Path] = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for file_key in list(model_files.keys()):
+            file_path = module_builder.generate_model_file(
+                Path(tmp_dir),
+                file_key,
+                force=True,
+                copyright_header_template=copyright_header_tmpl,
+            )
+            if file_path is None:
+                continue
+
+            target_path = model_dir / file_path.relative_to(tmp_dir)
+            if (
+                target_path.exists()
+                and target_path.read_bytes() == file_path.read_bytes()
+            ):
+                continue
+
+            target_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(file_path, target_path)
+            written.append(target_path)
+
+    return written
+
+
+def regenerate_model(
+    module_path: Path,
+    terraform_module: schema.Module,
+    module_builder: InmantaModuleBuilder,
+    previous: GenerationManifest,
+    copyright_header_tmpl: typing.Optional[str] = None,
+) -> typing.Tuple[GenerationManifest, typing.Set[str]]:
+    """
+    Generate again, in place, the model of a module previously generated.  Only the
+    resources whose schema changed are generated again, the sub-modules of the other
+    ones are left untouched.
+
+    Return the new manifest of the module, and the name of the resources which were
+    added, removed or generated again.
+    """
+    resources, built = build_module(terraform_module, module_builder, previous)
+    removed = set(previous.resources.keys()) - set(resources.keys())
+
+    model_dir = module_path / "model"
+    for name in built | removed:
+        # The resource might not have the same sub-modules anymore
+        shutil.rmtree(model_dir / "resources" / inmanta_safe_name(name), True)
+
+    written = write_model_files(module_builder, model_dir, copyright_header_tmpl)
+    LOGGER.info(
+        f"Generated {len(built)} resources out of {len(resources)} ({len(removed)} "
+        f"removed), {len(written)} files written"
+    )
+
+    manifest = GenerationManifest(
+        module=previous.module,
+        options=previous.options,
+        resources=resources,
+    )
+    return manifest, built | removed
@@ -3,47 +3,150 @@
     :contact: code@inmanta.com
     :license: Inmanta EULA
 """
+import heapq
 import logging
-import re
+import typing
 from pathlib import Path
 
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.helpers import const
+from inmanta_module_factory.inmanta.module_element import ModuleElement
+
 import inmanta.module
+from terraform_module_generator import tracing
 
 LOGGER = logging.getLogger(__name__)
 
 
-test_project_compile = re.compile(r"project.compile\((.*)\)")
+def get_submodule_sizes(module: inmanta.module.Module) -> typing.Dict[str, int]:
+    """
+    Get the size of the model file of each of the module's sub-modules, for a module
+    whose sub-modules are not all in a module builder, i.e. updated in place.  It grows
+    with the amount of entities and attributes the compiler has to go through when
+    importing it.
+    """
+    sizes: typing.Dict[str, int] = dict()
+    for sub_module in module.get_all_submodules():
+        parts = sub_module.split("::")[1:]
+        model_file = Path(module.model_dir, *parts).with_suffix(".cf")
+        if not model_file.is_file():
+            model_file = Path(module.model_dir, *parts, "_init.cf")
+        sizes[sub_module] = model_file.stat().st_size
+
+    return sizes
 
 
-def upgrade_module_tests(module: inmanta.module.Module) -> None:
+def shard_submodules(
+    sizes: typing.Dict[str, int], shards: int
+) -> typing.List[typing.List[str]]:
     """
-    This function can be called on an existing module, to upgrade its basic test
-    case to a slightly more advanced one.  This new test will import all of the
-    module's sub-modules instead of the top one only.
+    Split the sub-modules in at most the given amount of shards of about the same
+    size.  The largest sub-modules are placed first, each in the smallest shard so
+    far, so that the shards stay balanced whatever the amount of sub-modules.
     """
-    basic_test_path = Path(module.path, "tests/test_basics.py")
-    if not basic_test_path.exists():
-        raise RuntimeError(
-            f"Failed to find an existing test file at {str(basic_test_path)}"
-        )
+    heap: typing.List[typing.Tuple[int, int, typing.List[str]]] = [
+        (0, i, []) for i in range(min(shards, len(sizes)))
+    ]
+    for sub_module, size in sorted(sizes.items(), key=lambda item: (-item[1], item[0])):
+        shard_size, i, sub_modules = heapq.heappop(heap)
+        sub_modules.append(sub_module)
+        heapq.heappush(heap, (shard_size + size, i, sub_modules))
+
+    return [
+        sorted(sub_modules) for _, _, sub_modules in sorted(heap, key=lambda x: x[1])
+    ]
+
+
+def get_advanced_test_files(module_path: str) -> typing.List[Path]:
+    """
+    Get all the advanced test cases previously written in the module, sharded or not.
+    """
+    return sorted(Path(module_path, "tests").glob("test_advanced*.py"))
+
+
+def add_submodules(
+    sub_modules: typing.Dict[str, int],
+    model_files: typing.Mapping[str, typing.Sequence[ModuleElement]],
+) -> None:
+    """
+    Add the sub-modules of the model files of a module builder to the sub-modules of
+    the module, along with the amount of elements they contain.  The parents of each
+    sub-module are part of the module as well, the module builder creates them when
+    writing the files.
+    """
+    for file_key, module_elements in model_files.items():
+        sub_modules[file_key] = sub_modules.get(file_key, 0) + len(module_elements)
+        parts = file_key.split("::")
+        for i in range(1, len(parts)):
+            sub_modules.setdefault("::".join(parts[:i]), 1)
+
 
-    test_case_template = basic_test_path.read_text()
-    LOGGER.debug(f"Using existing test as template: \n{test_case_template}")
+def render_module_tests(
+    module_builder: InmantaModuleBuilder,
+    sub_modules: typing.Dict[str, int],
+    shards: int = 1,
+    copyright_header_tmpl: typing.Optional[str] = None,
+) -> typing.Dict[str, str]:
+    """
+    Render the advanced test cases of the module, which import all of the module's
+    sub-modules instead of the top one only.  Return the content of each test file,
+    by file name.
 
-    sub_modules = module.get_all_submodules()
-    LOGGER.debug(f"Found {len(sub_modules)} sub modules")
-    import_list = "\nimport ".join(sub_modules)
+    If more than one shard is requested, the sub-modules are split in that many test
+    cases of about the same size, test_advanced_<shard>.py, each compiling its own
+    sub-modules, so that they can be run in parallel.
+    """
+    if shards > 1:
+        test_cases = {
+            f"test_advanced_{i}.py": shard
+            for i, shard in enumerate(shard_submodules(sub_modules, shards))
+        }
+    else:
+        test_cases = {"test_advanced.py": sorted(sub_modules.keys())}
 
-    current_compiled_model_match = test_project_compile.search(test_case_template)
-    assert current_compiled_model_match is not None
-    current_compiled_model = current_compiled_model_match.group(1)
-    advanced_test_case = test_case_template.replace(
-        current_compiled_model, f'"""import {import_list}"""'
+    file_header = (
+        module_builder._module.file_header(copyright_header_tmpl)
+        + "\n"
+        + "from pytest_inmanta.plugin import Project\n\n\n"
     )
+    file_footer = const.GENERATED_FILE_FOOTER if module_builder.allow_watermark else ""
+
+    rendered: typing.Dict[str, str] = dict()
+    for file_name, imported_modules in test_cases.items():
+        import_list = "\n".join(f"import {name}" for name in imported_modules)
+        rendered[file_name] = (
+            file_header
+            + "def test_advanced(project: Project) -> None:\n"
+            + f'    project.compile("""{import_list}""")\n'
+            + file_footer
+        )
+
+    return rendered
+
+
+def write_module_tests(
+    module_builder: InmantaModuleBuilder,
+    module_path: str,
+    sub_modules: typing.Dict[str, int],
+    shards: int = 1,
+    copyright_header_tmpl: typing.Optional[str] = None,
+) -> typing.List[Path]:
+    """
+    Write the advanced test cases of the module next to its basic test case, and
+    return their paths.  See render_module_tests.
+    """
+    with tracing.span("write module tests", module=module_path, shards=shards):
+        LOGGER.debug(f"Found {len(sub_modules)} sub modules")
+        test_paths: typing.List[Path] = []
+        for file_name, test_case in render_module_tests(
+            module_builder, sub_modules, shards, copyright_header_tmpl
+        ).items():
+            test_path = Path(module_path, "tests", file_name)
+            if test_path.exists():
+                raise RuntimeError(f"There is already a file at {test_path}")
 
-    advanced_test_case_path = basic_test_path.parent / "test_advanced.py"
-    if advanced_test_case_path.exists():
-        raise RuntimeError(f"There is already a file at {advanced_test_case_path}")
+            LOGGER.debug(f"Writing extended test case to {test_path}")
+            test_path.write_text(test_case)
+            test_paths.append(test_path)
 
-    LOGGER.debug(f"Writing extended test case to {advanced_test_case_path}")
-    advanced_test_case_path.write_text(advanced_test_case)
+        return test_paths
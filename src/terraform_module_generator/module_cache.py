@@ -0,0 +1,108 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import logging
+import typing
+from pathlib import Path
+
+from terraform_module_generator import schema
+from terraform_module_generator.schema.helpers import cty
+from terraform_module_generator.schema.helpers.cache import LRUCache
+
+LOGGER = logging.getLogger(__name__)
+
+# The amount of provider schemas and parsed modules kept in memory by default
+MAX_SCHEMAS = 8
+MAX_MODULES = 4
+
+SchemaKey = typing.Tuple[str, str, str, typing.Optional[str], int, int]
+ModuleKey = typing.Tuple[
+    SchemaKey, bool, typing.Tuple[str, ...], typing.Tuple[str, ...], bool
+]
+
+
+class ModuleCache:
+    """
+    The provider schemas and the parsed modules kept in memory by a long running
+    process, so that generating the same module again doesn't need to load the provider
+    schema nor to parse it.
+
+    The provider schemas can be used for any generation.  The parsed modules can only be
+    used to build the whole module in memory again: they hold the tree of all the
+    resources, but might have released the schemas the resources are parsed from.
+    """
+
+    def __init__(
+        self, max_schemas: int = MAX_SCHEMAS, max_modules: int = MAX_MODULES
+    ) -> None:
+        self.schemas: LRUCache[SchemaKey, typing.Any] = LRUCache(
+            max_schemas, self.on_evict
+        )
+        self.modules: LRUCache[ModuleKey, schema.Module] = LRUCache(
+            max_modules, self.on_evict
+        )
+
+    def on_evict(self, key: typing.Any, value: typing.Any) -> None:
+        """
+        The attributes types of an evicted schema or module can not be told apart from
+        the ones of the cached modules, all of them are dropped from the type caches,
+        the cached modules keep the ones they use.
+        """
+        cty.clear_type_caches()
+
+    @staticmethod
+    def schema_key(
+        namespace: str, type: str, version: str, schema_file: typing.Optional[str]
+    ) -> SchemaKey:
+        """
+        Terraform ignores the case of the namespace and the type.  When the schema is
+        read from a file, it is read again whenever the file changes.
+        """
+        if schema_file is None:
+            return (namespace.lower(), type.lower(), version, None, 0, 0)
+
+        stat = Path(schema_file).stat()
+        return (
+            namespace.lower(),
+            type.lower(),
+            version,
+            str(Path(schema_file).resolve()),
+            stat.st_mtime_ns,
+            stat.st_size,
+        )
+
+    @staticmethod
+    def module_key(
+        schema_key: SchemaKey,
+        share_nested_blocks: bool,
+        include: typing.Optional[typing.Sequence[str]],
+        exclude: typing.Optional[typing.Sequence[str]],
+        plugin_config: bool,
+    ) -> ModuleKey:
+        return (
+            schema_key,
+            share_nested_blocks,
+            tuple(include or ()),
+            tuple(exclude or ()),
+            plugin_config,
+        )
+
+    def get_info(self) -> typing.Dict[str, typing.Any]:
+        """
+        Get the content of the cache and how often it was used, as json serializable
+        values.
+        """
+        return {
+            "schemas": {
+                "hits": self.schemas.info.hits,
+                "misses": self.schemas.info.misses,
+                "keys": ["/".join(key[:3]) for key in self.schemas.keys()],
+            },
+            "modules": {
+                "hits": self.modules.info.hits,
+                "misses": self.modules.info.misses,
+                "keys": ["/".join(key[0][:3]) for key in self.modules.keys()],
+            },
+        }
@@ -0,0 +1,145 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import asyncio
+import concurrent.futures
+import logging
+import time
+import typing
+from dataclasses import dataclass, field
+
+LOGGER = logging.getLogger(__name__)
+
+# The amount of items which can wait between two stages, once it is reached, the
+# previous stage waits for the next one to catch up
+QUEUE_SIZE = 2
+
+
+@dataclass()
+class Stage:
+    """
+    A stage of a pipeline, processing each item in turn.
+
+    :attr name: The name of the stage, used in the logs.
+    :attr func: The function processing a single item, and returning the input of the
+        next stage.  It is called in the executor of the stage.
+    :attr jobs: The amount of items the stage can process at the same time.
+    :attr executor: The executor the function is called in.  If none is given, a thread
+        pool of jobs threads is used.
+    :attr busy_time: The time spent processing the items, summed over all the jobs.
+    """
+
+    name: str
+    func: typing.Callable[[typing.Any], typing.Any]
+    jobs: int = 1
+    executor: typing.Optional[concurrent.futures.Executor] = None
+    busy_time: float = field(default=0.0, init=False)
+
+
+class PipelineError(Exception):
+    """
+    Raised in place of the result of an item, when one of the stages failed to process
+    it.
+    """
+
+    def __init__(self, stage: str, error: BaseException) -> None:
+        super().__init__(f"Stage {stage} failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+async def run_stages(
+    items: typing.Sequence[typing.Any],
+    stages: typing.Sequence[Stage],
+    queue_size: int = QUEUE_SIZE,
+) -> typing.List[typing.Any]:
+    """
+    Pass each item through all the stages, in order.  Each stage processes up to its
+    amount of jobs items at the same time, while the other stages process the items
+    before and after them: the next item is fetched while the current one is being
+    built.  At most queue_size items wait between two stages, so that a fast stage
+    doesn't run far ahead of a slow one.
+
+    Return the output of the last stage for each item, in the order of the items.  If
+    any stage failed to process an item, its result is a PipelineError, and it is not
+    passed to the next stages.
+    """
+    loop = asyncio.get_running_loop()
+    queues: typing.List[asyncio.Queue] = [
+        asyncio.Queue(maxsize=queue_size) for _ in stages
+    ]
+    results: typing.Dict[int, typing.Any] = dict()
+    executors = [
+        stage.executor
+        or concurrent.futures.ThreadPoolExecutor(
+            max_workers=stage.jobs, thread_name_prefix=stage.name
+        )
+        for stage in stages
+    ]
+
+    async def work(i: int) -> None:
+        stage, queue = stages[i], queues[i]
+        while True:
+            index, value = await queue.get()
+            start = time.monotonic()
+            try:
+                value = await loop.run_in_executor(executors[i], stage.func, value)
+            except Exception as e:
+                LOGGER.debug(f"Stage {stage.name} failed on item {index}: {e}")
+                results[index] = PipelineError(stage.name, e)
+            else:
+                stage.busy_time += time.monotonic() - start
+                if i + 1 < len(stages):
+                    # Waits for the next stage when too many items are pending
+                    await queues[i + 1].put((index, value))
+                else:
+                    results[index] = value
+            finally:
+                queue.task_done()
+
+    workers = [
+        asyncio.create_task(work(i))
+        for i, stage in enumerate(stages)
+        for _ in range(stage.jobs)
+    ]
+    try:
+        for index, item in enumerate(items):
+            await queues[0].put((index, item))
+
+        # An item is only marked as done by a stage once it is in the queue of the next
+        # one, the queues are then empty once they are all joined in order
+        for queue in queues:
+            await queue.join()
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        for stage, executor in zip(stages, executors):
+            if stage.executor is None:
+                executor.shutdown()
+
+    return [results[index] for index in range(len(items))]
+
+
+def run_pipeline(
+    items: typing.Sequence[typing.Any],
+    stages: typing.Sequence[Stage],
+    queue_size: int = QUEUE_SIZE,
+) -> typing.List[typing.Any]:
+    """
+    Run all the items through the stages, see run_stages.  The time each stage spent
+    processing the items is logged once they are all done, the total duration should
+    be close to the one of the busiest stage.
+    """
+    start = time.monotonic()
+    results = asyncio.run(run_stages(items, stages, queue_size))
+    LOGGER.info(
+        f"Processed {len(items)} items in {time.monotonic() - start:.2f}s ("
+        + ", ".join(
+            f"{stage.name}: {stage.busy_time / stage.jobs:.2f}s" for stage in stages
+        )
+        + ")"
+    )
+    return results
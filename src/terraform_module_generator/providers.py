@@ -0,0 +1,301 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import hashlib
+import logging
+import os
+import platform
+import tempfile
+import typing
+import zipfile
+from pathlib import Path
+
+import requests
+from inmanta_plugins.terraform.tf.exceptions import InstallerException
+from inmanta_plugins.terraform.tf.terraform_provider_installer import (
+    BASE_URL,
+    ProviderInstaller,
+)
+from requests.adapters import HTTPAdapter
+
+from terraform_module_generator.store import ProviderStore, StoredProvider
+
+LOGGER = logging.getLogger(__name__)
+
+# The hostname of the providers in the filesystem mirrors, same as terraform, the
+# providers are always fetched from the public registry
+REGISTRY_HOSTNAME = "registry.terraform.io"
+
+# The amount of providers downloaded at the same time by the batch generation
+PREFETCH_JOBS = 8
+
+Provider = typing.Tuple[str, str, str]
+
+
+def get_platform() -> str:
+    """
+    Get the platform the providers should be built for, i.e. linux_amd64, the same
+    way the provider installer does.
+    """
+    arch = platform.machine()
+    if arch == "x86_64":
+        arch = "amd64"
+    return f"{platform.system().lower()}_{arch}"
+
+
+def get_session(connections: int = PREFETCH_JOBS) -> requests.Session:
+    """
+    Get a session which can keep the given amount of connections open to each of the
+    hosts the providers are downloaded from.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=connections)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_checksum(path: Path) -> str:
+    sha256_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024**2), b""):
+            sha256_hash.update(chunk)
+    return sha256_hash.hexdigest()
+
+
+class RegistryProviderInstaller(ProviderInstaller):
+    """
+    Same as the provider installer, but sending all the requests through the given
+    session, so that the connections are reused, and writing the downloaded archive
+    atomically, so that an interrupted download never leaves a partial archive behind.
+    An archive which is already at the download path is only reused if it matches the
+    checksum published by the registry.
+    """
+
+    def __init__(
+        self, namespace: str, type: str, version: str, session: requests.Session
+    ) -> None:
+        super().__init__(namespace, type, version)
+        self.session = session
+
+    def resolve(self) -> None:
+        response = self.session.get(
+            f"{BASE_URL}/{self.namespace}/{self.type}", timeout=10
+        )
+        response.raise_for_status()
+        if self.version not in response.json().get("versions", []):
+            raise InstallerException(
+                f"Provided version '{self.version}' is not available for this provider"
+            )
+
+        system, arch = get_platform().split("_", 1)
+        response = self.session.get(
+            f"{BASE_URL}/{self.namespace}/{self.type}/{self.version}/download/{system}/{arch}",
+            timeout=10,
+        )
+        response.raise_for_status()
+        data = response.json()
+        self._download_url = data.get("download_url")
+        self._filename = data.get("filename")
+        self._shasum = data.get("shasum", None)
+
+    def download(self, download_path: typing.Optional[str] = None) -> str:
+        if download_path is None:
+            return super().download(download_path)
+
+        download_location = Path(download_path)
+        if (
+            self._shasum is not None
+            and download_location.is_file()
+            and get_checksum(download_location) == self.shasum
+        ):
+            self._download_path = download_path
+            return self.download_path
+
+        download_location.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=download_location.parent, prefix=f".{download_location.name}."
+        )
+        try:
+            sha256_hash = hashlib.sha256()
+            with os.fdopen(fd, "wb") as f, self.session.get(
+                self.download_url, stream=True, timeout=10
+            ) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size=1024**2):
+                    sha256_hash.update(chunk)
+                    f.write(chunk)
+
+            checksum = sha256_hash.hexdigest()
+            if self._shasum is not None and checksum != self.shasum:
+                raise InstallerException(
+                    f"Downloaded file has a bad hash: {checksum} (expected {self.shasum})"
+                )
+
+            os.replace(tmp_path, download_location)
+        finally:
+            Path(tmp_path).unlink(missing_ok=True)
+
+        self._download_path = download_path
+        return self.download_path
+
+
+class ArchiveProviderInstaller(ProviderInstaller):
+    """
+    A provider installer for an archive which is already on disk, it is never resolved
+    nor downloaded.
+    """
+
+    def __init__(self, namespace: str, type: str, version: str, archive: str) -> None:
+        super().__init__(namespace, type, version)
+        self._download_path = archive
+
+    def install(self, install_location: str, force: bool = False) -> str:
+        """
+        Install the binary of the archive, unless it is already installed.
+        """
+        binary_file, binary_name = self.install_dry_run(install_location)
+        with zipfile.ZipFile(self.download_path, "r") as zip:
+            size = zip.getinfo(binary_name).file_size
+
+        binary_path = Path(binary_file)
+        if binary_path.is_file() and binary_path.stat().st_size == size:
+            return binary_file
+
+        # The binary might be a hard link to a blob of the store, it should not be
+        # overwritten in place
+        if force:
+            binary_path.unlink(missing_ok=True)
+        return super().install(install_location, force)
+
+
+def find_in_mirror(
+    mirror: str, namespace: str, type: str, version: str
+) -> typing.Optional[Path]:
+    """
+    Find the provider in a directory laid out as a terraform filesystem mirror.  Return
+    the archive of the provider for the packed layout
+    (registry.terraform.io/<namespace>/<type>/terraform-provider-<type>_<version>_<platform>.zip)
+    or its binary for the unpacked layout
+    (registry.terraform.io/<namespace>/<type>/<version>/<platform>/terraform-provider-<type>*).
+    """
+    # Terraform ignores the case of the namespace and the type
+    provider_dir = next(
+        (
+            path
+            for path in Path(mirror, REGISTRY_HOSTNAME).glob("*/*")
+            if [path.parent.name.lower(), path.name.lower()]
+            == [namespace.lower(), type.lower()]
+        ),
+        None,
+    )
+    if provider_dir is None:
+        return None
+
+    target = get_platform()
+    archive = provider_dir / f"terraform-provider-{type}_{version}_{target}.zip"
+    if archive.is_file():
+        return archive
+
+    binaries = sorted(
+        provider_dir.glob(f"{version}/{target}/terraform-provider-{type}*")
+    )
+    return binaries[0] if binaries else None
+
+
+def store_provider(
+    store: ProviderStore,
+    namespace: str,
+    type: str,
+    version: str,
+    archive: str,
+    install_dir: str,
+    move: bool = False,
+) -> str:
+    """
+    Add the archive of the provider and its binary to the store, then install the
+    binary in the install dir, and return its path.
+    """
+    archive_digest = store.put(Path(archive), move)
+    with tempfile.TemporaryDirectory(dir=store.tmp_dir) as tmp_dir:
+        binary = ArchiveProviderInstaller(
+            namespace, type, version, str(store.blob_path(archive_digest))
+        ).install(tmp_dir, force=True)
+        binary_digest = store.put(Path(binary), move=True)
+
+    store.set(
+        namespace,
+        type,
+        version,
+        StoredProvider(archive_digest, binary_digest, Path(binary).name),
+    )
+    store.evict(keep=[archive_digest, binary_digest])
+
+    installed = store.install(namespace, type, version, install_dir)
+    if installed is None:
+        raise InstallerException(
+            f"The provider {namespace}/{type} {version} was removed from the store "
+            "while being installed"
+        )
+    return installed
+
+
+def install_provider(
+    namespace: str,
+    type: str,
+    version: str,
+    working_dir: str,
+    mirror: typing.Optional[str] = None,
+    session: typing.Optional[requests.Session] = None,
+    store: typing.Optional[ProviderStore] = None,
+) -> str:
+    """
+    Install the provider binary in the working dir, and return its path.  If a mirror
+    is given, the provider is installed from it, the registry is never contacted.
+    Otherwise, the provider archive is downloaded from the registry, unless it was
+    already downloaded in the working dir and matches the checksum published by the
+    registry.  The requests to the registry are sent through the session, if one is
+    given.
+
+    If a store is given, the binary is installed from it when it is there, otherwise the
+    provider is added to it once it is downloaded.
+    """
+    if store is not None:
+        installed = store.install(namespace, type, version, working_dir)
+        if installed is not None:
+            return installed
+
+    if mirror is not None:
+        mirrored = find_in_mirror(mirror, namespace, type, version)
+        if mirrored is None:
+            raise InstallerException(
+                f"The provider {namespace}/{type} {version} for {get_platform()} can "
+                f"not be found in the mirror {mirror}"
+            )
+        if mirrored.suffix != ".zip":
+            return str(mirrored)
+        if store is not None:
+            return store_provider(
+                store, namespace, type, version, str(mirrored), working_dir
+            )
+        archive = str(mirrored)
+    else:
+        archive = str(Path(working_dir, f"{namespace}-{type}-{version}"))
+        if store is not None:
+            # The archive is downloaded next to the blobs, to be moved in the store
+            archive = str(store.tmp_dir / f"{namespace}-{type}-{version}.{os.getpid()}")
+        installer = RegistryProviderInstaller(
+            namespace, type, version, session or get_session(1)
+        )
+        installer.resolve()
+        installer.download(archive)
+        if store is not None:
+            return store_provider(
+                store, namespace, type, version, archive, working_dir, move=True
+            )
+
+    return ArchiveProviderInstaller(namespace, type, version, archive).install(
+        working_dir, force=True
+    )
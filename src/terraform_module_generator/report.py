@@ -0,0 +1,315 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import contextlib
+import json
+import logging
+import re
+import typing
+from dataclasses import asdict, dataclass, field, fields, replace
+from pathlib import Path
+
+from inmanta_module_factory.helpers.utils import inmanta_entity_name, inmanta_safe_name
+from inmanta_module_factory.inmanta.module_element import ModuleElement
+
+from terraform_module_generator import tracing
+from terraform_module_generator.schema.helpers.parallel import RenderedModuleElement
+
+LOGGER = logging.getLogger(__name__)
+
+# The first word of each kind of element, relations are the only ones not starting
+# with a keyword
+ELEMENT_KINDS = {
+    "entity": "entities",
+    "index": "indexes",
+    "implementation": "implementations",
+    "implement": "implementations",
+}
+
+# The name of the entity an element of the resources sub-module is about, i.e.
+# "entity AwsS3Bucket extends ...", "AwsS3Bucket.tags [0:] -- ..."
+ELEMENT_ENTITY = re.compile(
+    r"^(?:entity |index |implement |implementation \w+ for )?(?:\w+::)*(\w+)"
+)
+
+# The attributes of an entity are listed in its docstring
+ENTITY_ATTRIBUTE = re.compile(r"^    :attr ", re.MULTILINE)
+
+# The amount of resources listed in the summary of the report
+SUMMARY_SIZE = 5
+
+
+def render(module_element: ModuleElement) -> str:
+    if isinstance(module_element, RenderedModuleElement):
+        return module_element.content
+    return str(module_element)
+
+
+@dataclass()
+class ResourceMetrics:
+    """
+    The size of the module elements generated for a resource.
+
+    :attr entities: The amount of entities.
+    :attr attributes: The amount of attributes of those entities.
+    :attr relations: The amount of relations between those entities.
+    :attr indexes: The amount of indexes.
+    :attr implementations: The amount of implementations, and of implement
+        statements.
+    :attr depth: The depth of the deepest sub-module of the resource, each nested block
+        and each structure in the attributes adds a level.
+    :attr lines: The amount of lines of the generated elements.
+    :attr build_time: The time spent building the resource, in seconds.
+    """
+
+    entities: int = 0
+    attributes: int = 0
+    relations: int = 0
+    indexes: int = 0
+    implementations: int = 0
+    depth: int = 0
+    lines: int = 0
+    build_time: float = 0.0
+
+    def add_module_element(self, content: str) -> None:
+        """
+        Add a module element of the resource, rendered.
+        """
+        if not content:
+            # The dummy elements of the files without any element
+            return
+
+        kind = ELEMENT_KINDS.get(content.split(" ", 1)[0], "relations")
+        setattr(self, kind, getattr(self, kind) + 1)
+        if kind == "entities":
+            self.attributes += len(ENTITY_ATTRIBUTE.findall(content))
+        self.lines += content.count("\n")
+
+    def add(self, other: "ResourceMetrics") -> None:
+        """
+        Add the metrics of another resource to these ones, the depth is the deepest
+        of both.
+        """
+        for metric in fields(self):
+            value = getattr(other, metric.name)
+            if metric.name == "depth":
+                self.depth = max(self.depth, value)
+            else:
+                setattr(self, metric.name, getattr(self, metric.name) + value)
+
+    def diff(self, previous: "ResourceMetrics") -> typing.Dict[str, float]:
+        """
+        Get the change of each metric which changed since the previous report.
+        """
+        return {
+            metric.name: getattr(self, metric.name) - getattr(previous, metric.name)
+            for metric in fields(self)
+            if getattr(self, metric.name) != getattr(previous, metric.name)
+        }
+
+
+@dataclass()
+class GenerationReport:
+    """
+    A report of the size of each resource of a generated module.
+
+    :attr module: The name of the generated module.
+    :attr version: The version of the provider the module was generated for.
+    :attr resources: The metrics of each resource.
+    :attr previous: The report of the previous generation of the module, if any, this
+        report is compared to it when it is saved.
+    """
+
+    module: str
+    version: str
+    resources: typing.Dict[str, ResourceMetrics] = field(default_factory=dict)
+    previous: typing.Optional["GenerationReport"] = field(default=None, repr=False)
+
+    def totals(self) -> ResourceMetrics:
+        totals = ResourceMetrics()
+        for metrics in self.resources.values():
+            totals.add(metrics)
+        return totals
+
+    def add_model_files(
+        self,
+        model_files: typing.Mapping[str, typing.Sequence[ModuleElement]],
+        resource_names: typing.Iterable[str],
+    ) -> None:
+        """
+        Add the elements of the given resources, from the files of a module builder.
+        The elements of each resource are the ones in its own sub-module, and the ones
+        it added to the resources sub-module.  The elements shared by the resources
+        are not part of any of them.
+        """
+        resources_file = "::".join([self.module, "resources"])
+        by_safe_name: typing.Dict[str, ResourceMetrics] = dict()
+        by_entity_name: typing.Dict[str, ResourceMetrics] = dict()
+        for name in resource_names:
+            by_safe_name[inmanta_safe_name(name)] = by_entity_name[
+                inmanta_entity_name(name)
+            ] = self.resources.setdefault(name, ResourceMetrics())
+
+        metrics: typing.Optional[ResourceMetrics]
+        for file_key, module_elements in model_files.items():
+            if file_key == resources_file:
+                for module_element in module_elements:
+                    content = render(module_element)
+                    match = ELEMENT_ENTITY.match(content)
+                    metrics = by_entity_name.get(match.group(1)) if match else None
+                    if metrics is not None:
+                        metrics.add_module_element(content)
+                continue
+
+            parts = file_key.split("::")
+            if parts[:2] != [self.module, "resources"] or len(parts) < 3:
+                continue
+
+            metrics = by_safe_name.get(parts[2])
+            if metrics is None:
+                continue
+
+            metrics.depth = max(metrics.depth, len(parts) - 3)
+            for module_element in module_elements:
+                metrics.add_module_element(render(module_element))
+
+    def add_unchanged_resources(self, resource_names: typing.Iterable[str]) -> None:
+        """
+        Add the resources which were not built again, as they were in the previous
+        report.  No time was spent building them.
+        """
+        missing = 0
+        for name in resource_names:
+            if self.previous is not None and name in self.previous.resources:
+                self.resources[name] = replace(
+                    self.previous.resources[name], build_time=0.0
+                )
+            else:
+                missing += 1
+
+        if missing:
+            LOGGER.warning(
+                f"{missing} resources were not built again and are not part of the "
+                "previous report, they are missing from the report"
+            )
+
+    def add_trace_events(self, events: typing.Iterable[tracing.TraceEvent]) -> None:
+        """
+        Add to each resource the time spent building it, from the events recorded
+        while the module was built.
+        """
+        for event in events:
+            if event["cat"] == "build" and event["name"] in self.resources:
+                self.resources[event["name"]].build_time += event["dur"] / 1e6
+
+    def diff(self, previous: "GenerationReport") -> dict:
+        """
+        Compare this report to a previous one, of the same module.  The resources
+        whose build time is the only change are not part of the changed ones, it is
+        never the same.
+        """
+        changed: typing.Dict[str, typing.Dict[str, float]] = dict()
+        for name, metrics in self.resources.items():
+            if name not in previous.resources:
+                continue
+            changes = metrics.diff(previous.resources[name])
+            changes.pop("build_time", None)
+            if changes:
+                changed[name] = changes
+
+        return {
+            "version": previous.version,
+            "added": sorted(set(self.resources) - set(previous.resources)),
+            "removed": sorted(set(previous.resources) - set(self.resources)),
+            "changed": dict(sorted(changed.items())),
+            "totals": self.totals().diff(previous.totals()),
+        }
+
+    def save(self, path: Path) -> None:
+        raw = {
+            "module": self.module,
+            "version": self.version,
+            "totals": asdict(self.totals()),
+            "resources": {
+                name: asdict(metrics)
+                for name, metrics in sorted(self.resources.items())
+            },
+        }
+        if self.previous is not None:
+            raw["diff"] = self.diff(self.previous)
+        path.write_text(json.dumps(raw, indent=1))
+
+    @classmethod
+    def load(cls, path: Path) -> typing.Optional["GenerationReport"]:
+        """
+        Load a report saved by a previous generation, if there is any and it can be
+        read.
+        """
+        if not path.exists():
+            return None
+
+        try:
+            raw = json.loads(path.read_text())
+            return GenerationReport(
+                module=raw["module"],
+                version=raw["version"],
+                resources={
+                    name: ResourceMetrics(**metrics)
+                    for name, metrics in raw["resources"].items()
+                },
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            LOGGER.warning(f"Ignoring unreadable report {path}: {e}")
+            return None
+
+    def log_summary(self) -> None:
+        totals = self.totals()
+        LOGGER.info(
+            f"Generated {len(self.resources)} resources: {totals.entities} entities, "
+            f"{totals.attributes} attributes, {totals.relations} relations, "
+            f"{totals.lines} lines"
+        )
+        largest = sorted(
+            self.resources.items(), key=lambda item: item[1].lines, reverse=True
+        )
+        for name, metrics in largest[:SUMMARY_SIZE]:
+            LOGGER.info(
+                f"  {name}: {metrics.entities} entities, {metrics.lines} lines, "
+                f"depth {metrics.depth}, built in {metrics.build_time:.3f}s"
+            )
+
+
+@contextlib.contextmanager
+def record_report(
+    path: Path, module: str, version: str
+) -> typing.Iterator[GenerationReport]:
+    """
+    Build the report of the generation of a module, in the body of this context, and
+    save it to the given file, along with its diff to the report previously saved
+    there.  The time spent building each resource is taken from the trace events
+    recorded in the body of this context, the tracing is enabled if it isn't yet.
+    """
+    previous = GenerationReport.load(path)
+    if previous is not None and previous.module != module:
+        LOGGER.warning(
+            f"Not comparing the report to the one of the module {previous.module}"
+        )
+        previous = None
+
+    report = GenerationReport(module, version, previous=previous)
+    started_tracing = not tracing.is_tracing()
+    if started_tracing:
+        tracing.start_tracing()
+    first_event = len(tracing.get_events())
+    try:
+        yield report
+    finally:
+        events = tracing.get_events()[first_event:]
+        if started_tracing:
+            tracing.stop_tracing()
+
+    report.add_trace_events(events)
+    report.save(path)
+    report.log_summary()
@@ -4,31 +4,52 @@
     :license: Inmanta EULA
 """
 import abc
+import sys
 import typing
 
 from inmanta_module_factory import builder, inmanta
 from inmanta_module_factory.helpers.utils import inmanta_safe_name
 
 from terraform_module_generator.schema import mocks
+from terraform_module_generator.schema.helpers import cty
 from terraform_module_generator.schema.helpers.cache import cache_method_result
 
 
 class Attribute:
+    __slots__ = (
+        "path",
+        "name",
+        "description",
+        "description_kind",
+        "required",
+        "optional",
+        "computed",
+        "deprecated",
+        "type",
+        "__weakref__",
+    )
+
     __attribute_types: typing.Dict[
         str, typing.Tuple[typing.Callable[[typing.Any], bool], typing.Type["Attribute"]]
     ] = dict()
+    __sorted_attribute_types: typing.Optional[
+        typing.List[
+            typing.Tuple[typing.Callable[[typing.Any], bool], typing.Type["Attribute"]]
+        ]
+    ] = None
 
     def __init__(self, path: typing.List[str], schema: typing.Any) -> None:
+        # A lot of attributes have the same names, descriptions and types, we keep a
+        # single instance of each of them, and no reference to the source schema
         self.path = path
-        self.name: str = schema.name
-        self.description: str = schema.description
+        self.name: str = sys.intern(schema.name)
+        self.description: str = sys.intern(schema.description)
         self.description_kind: str = schema.description_kind
         self.required: bool = schema.required
         self.optional: bool = schema.optional
         self.computed: bool = schema.computed
         self.deprecated: bool = schema.deprecated
-
-        self._source_attribute = schema
+        self.type: bytes = cty.intern_type(schema.type)
 
     @abc.abstractmethod
     def inmanta_attribute_type(
@@ -74,6 +95,32 @@ class Attribute:
         # By default we consider the attribute to be serializable all by itself
         return f"{entity_reference}.{self.get_attribute(module_builder).name}"
 
+    @cache_method_result
+    def get_serialized_field(self, module_builder: builder.InmantaModuleBuilder) -> str:
+        """
+        Return the entry of this attribute in the field table of its entity, read by the
+        config attributes plugin.  Same as get_serialized_attribute_expression, by
+        default the attribute is serializable all by itself.
+        """
+        return f"{self.name}={self.get_attribute(module_builder).name}"
+
+    def get_structure(self) -> typing.Tuple[typing.Any, ...]:
+        """
+        Return a tuple holding everything the generated model depends on for this attribute.
+        Two attributes with the same structure are converted in the exact same way.
+        """
+        return (
+            type(self).__name__,
+            self.name,
+            self.type,
+            self.description,
+            self.description_kind,
+            self.required,
+            self.optional,
+            self.computed,
+            self.deprecated,
+        )
+
     def as_nested_block(self) -> mocks.NestedBlockMock:
         """
         If supported by the attribute type, return a NestedBlock object, similar to the one we would
@@ -106,6 +153,7 @@ class Attribute:
             )
 
         cls.__attribute_types[index] = (condition, cls)
+        Attribute.__sorted_attribute_types = None
 
     @classmethod
     def get_attribute_types(
@@ -114,20 +162,32 @@ class Attribute:
         typing.Tuple[typing.Callable[[typing.Any], bool], typing.Type["Attribute"]]
     ]:
         """
-        Get all the registered attribute types, ordered by index.
+        Get all the registered attribute types, ordered by index.  The order is only
+        computed again when a new type is registered.
         """
-        return [
-            x[1]
-            for x in sorted(
-                ((key, value) for key, value in cls.__attribute_types.items()),
-                key=lambda x: x[0],
-            )
-        ]
+        if Attribute.__sorted_attribute_types is None:
+            Attribute.__sorted_attribute_types = [
+                x[1]
+                for x in sorted(
+                    ((key, value) for key, value in cls.__attribute_types.items()),
+                    key=lambda x: x[0],
+                )
+            ]
+
+        return Attribute.__sorted_attribute_types
 
     @classmethod
     def build_attribute(
         cls, path: typing.List[str], attribute: typing.Any
     ) -> "Attribute":
+        try:
+            # Parse the type once, all the conditions will then get it from the cache
+            cty.parse_type(attribute.type)
+        except ValueError as e:
+            raise ValueError(
+                f"Couldn't find a matching type for attribute {attribute}"
+            ) from e
+
         for condition, attribute_type in cls.get_attribute_types():
             if condition(attribute):
                 return attribute_type(path, attribute)
@@ -9,14 +9,17 @@ from inmanta_module_factory import inmanta
 from inmanta_module_factory.builder import InmantaModuleBuilder
 
 from terraform_module_generator.schema.attributes.base import Attribute, attribute
+from terraform_module_generator.schema.helpers import cty
 
 
 def is_bool(attribute: Any) -> bool:
-    return attribute.type.decode("utf-8") in ["bool", '"bool"']
+    return cty.parse_type(attribute.type).kind == "bool"
 
 
 @attribute(index="abc-boolean-z", condition=is_bool)
 class BooleanAttribute(Attribute):
+    __slots__ = ()
+
     def inmanta_attribute_type(
         self, module_builder: InmantaModuleBuilder
     ) -> inmanta.InmantaType:
@@ -3,20 +3,19 @@
     :contact: code@inmanta.com
     :license: Inmanta EULA
 """
-import re
 import typing
 
 from inmanta_module_factory import builder, inmanta
 
 from terraform_module_generator.schema import mocks
 from terraform_module_generator.schema.attributes.base import Attribute
+from terraform_module_generator.schema.helpers import cty
 from terraform_module_generator.schema.helpers.cache import cache_method_result
 from terraform_module_generator.schema.mocks import AttributeMock
 
 
 class CollectionAttribute(Attribute):
-    legacy_regex: re.Pattern[str]
-    regex: re.Pattern[str]
+    __slots__ = ("inner_type",)
 
     def __init__(self, path: typing.List[str], schema: typing.Any) -> None:
         super().__init__(path, schema)
@@ -37,23 +36,14 @@ class CollectionAttribute(Attribute):
         nested_block_mock.max_items = 0  # No upper bound
         return nested_block_mock
 
-    @classmethod
-    def get_inner_type_expression(cls, schema: typing.Any) -> bytes:
-        t = schema.type.decode("utf-8")
-        legacy_match = cls.legacy_regex.fullmatch(t)
-        if legacy_match:
-            return legacy_match.group(1).strip().encode("utf-8")
-
-        match = cls.regex.fullmatch(t)
-        if match:
-            return match.group(1).strip().encode("utf-8")
-
-        raise ValueError(f"Failed to match type: {t}")
-
     @classmethod
     def get_inner_type(cls, path: typing.List[str], schema: typing.Any) -> Attribute:
+        element = cty.parse_type(schema.type).element
+        if element is None:
+            raise ValueError(f"Type {schema.type!r} is not a collection")
+
         mock = AttributeMock(
             name=schema.name,
-            type=cls.get_inner_type_expression(schema),
+            type=element.raw,
         )
         return Attribute.build_attribute(path, mock)
@@ -3,27 +3,22 @@
     :contact: code@inmanta.com
     :license: Inmanta EULA
 """
-import re
 from typing import Any
 
 from terraform_module_generator.schema import mocks
+from terraform_module_generator.schema.helpers import cty
 
 from .base import attribute
 from .collection import CollectionAttribute
 
 
 def is_list(attribute: Any) -> bool:
-    t = attribute.type.decode("utf-8")
-    return (
-        ListAttribute.legacy_regex.fullmatch(t) is not None
-        or ListAttribute.regex.fullmatch(t) is not None
-    )
+    return cty.parse_type(attribute.type).kind == "list"
 
 
 @attribute(index="abc-list-z", condition=is_list)
 class ListAttribute(CollectionAttribute):
-    legacy_regex = re.compile(r'\["list",(.+)\]')
-    regex = re.compile(r"list\((.+)\)")
+    __slots__ = ()
 
     def as_nested_block(self) -> mocks.NestedBlockMock:
         nested_block = super().as_nested_block()
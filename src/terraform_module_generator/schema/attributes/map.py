@@ -3,12 +3,12 @@
     :contact: code@inmanta.com
     :license: Inmanta EULA
 """
-import re
 import typing
 
 from inmanta_module_factory import builder, inmanta
 
 from terraform_module_generator.schema import mocks
+from terraform_module_generator.schema.helpers import cty
 from terraform_module_generator.schema.helpers.cache import cache_method_result
 
 from .base import attribute
@@ -16,17 +16,12 @@ from .collection import CollectionAttribute
 
 
 def is_map(attribute: typing.Any) -> bool:
-    t = attribute.type.decode("utf-8")
-    return (
-        MapAttribute.legacy_regex.fullmatch(t) is not None
-        or MapAttribute.regex.fullmatch(t) is not None
-    )
+    return cty.parse_type(attribute.type).kind == "map"
 
 
 @attribute(index="abc-map-z", condition=is_map)
 class MapAttribute(CollectionAttribute):
-    legacy_regex = re.compile(r'\["map",(.+)\]')
-    regex = re.compile(r"map\((.+)\)")
+    __slots__ = ()
 
     @cache_method_result
     def inmanta_attribute_type(
@@ -9,14 +9,17 @@ from inmanta_module_factory import inmanta
 from inmanta_module_factory.builder import InmantaModuleBuilder
 
 from terraform_module_generator.schema.attributes.base import Attribute, attribute
+from terraform_module_generator.schema.helpers import cty
 
 
 def is_number(attribute: Any) -> bool:
-    return attribute.type.decode("utf-8") in ["number", '"number"']
+    return cty.parse_type(attribute.type).kind == "number"
 
 
 @attribute(index="abc-number-z", condition=is_number)
 class NumberAttribute(Attribute):
+    __slots__ = ()
+
     def inmanta_attribute_type(
         self, module_builder: InmantaModuleBuilder
     ) -> inmanta.InmantaType:
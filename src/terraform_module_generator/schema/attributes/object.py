@@ -3,12 +3,11 @@
     :contact: code@inmanta.com
     :license: Inmanta EULA
 """
-import json
-import re
 import typing
 
 from inmanta_module_factory import builder, inmanta
 
+from terraform_module_generator.schema.helpers import cty
 from terraform_module_generator.schema.mocks.attribute import AttributeMock
 
 from .base import Attribute, attribute
@@ -16,17 +15,12 @@ from .structure import StructureAttribute
 
 
 def is_object(attribute: typing.Any) -> bool:
-    t = attribute.type.decode("utf-8")
-    return (
-        ObjectAttribute.legacy_regex.fullmatch(t) is not None
-        or ObjectAttribute.regex.fullmatch(t) is not None
-    )
+    return cty.parse_type(attribute.type).kind == "object"
 
 
 @attribute(index="abc-object-z", condition=is_object)
 class ObjectAttribute(StructureAttribute):
-    legacy_regex = re.compile(r'\["object",(.+)\]')
-    regex = re.compile(r"object\((.+)\)")
+    __slots__ = ()
 
     def inmanta_attribute_type(
         self, module_builder: builder.InmantaModuleBuilder
@@ -37,15 +31,17 @@ class ObjectAttribute(StructureAttribute):
     def get_inner_attributes(
         cls, path: typing.List[str], schema: typing.Any
     ) -> typing.List[Attribute]:
-        raw_inner_attributes_expression = cls.get_inner_attributes_expression(schema)
-        inner_attributes_expression: dict = json.loads(raw_inner_attributes_expression)
+        inner_attributes = cty.parse_type(schema.type).attributes
+        if inner_attributes is None:
+            raise ValueError(f"Type {schema.type!r} is not an object")
+
         return [
             Attribute.build_attribute(
                 path,
                 AttributeMock(
-                    type=json.dumps(value).strip().encode("utf-8"),
+                    type=value.raw,
                     name=key,
                 ),
             )
-            for key, value in inner_attributes_expression.items()
+            for key, value in inner_attributes.items()
         ]
@@ -3,13 +3,13 @@
     :contact: code@inmanta.com
     :license: Inmanta EULA
 """
-import re
 import typing
 from typing import Any
 
 from inmanta_module_factory import builder
 
 from terraform_module_generator.schema import mocks
+from terraform_module_generator.schema.helpers import cty
 from terraform_module_generator.schema.helpers.cache import cache_method_result
 
 from .base import attribute
@@ -17,17 +17,12 @@ from .collection import CollectionAttribute
 
 
 def is_set(attribute: Any) -> bool:
-    t = attribute.type.decode("utf-8")
-    return (
-        SetAttribute.legacy_regex.fullmatch(t) is not None
-        or SetAttribute.regex.fullmatch(t) is not None
-    )
+    return cty.parse_type(attribute.type).kind == "set"
 
 
 @attribute(index="abc-set-z", condition=is_set)
 class SetAttribute(CollectionAttribute):
-    legacy_regex = re.compile(r'\["set",(.+)\]')
-    regex = re.compile(r"set\((.+)\)")
+    __slots__ = ()
 
     @cache_method_result
     def get_serialized_attribute_expression(
@@ -48,6 +43,10 @@ class SetAttribute(CollectionAttribute):
         else:
             return sorted_list
 
+    @cache_method_result
+    def get_serialized_field(self, module_builder: builder.InmantaModuleBuilder) -> str:
+        return super().get_serialized_field(module_builder) + ":sorted"
+
     def as_nested_block(self) -> mocks.NestedBlockMock:
         nested_block = super().as_nested_block()
         nested_block.nesting = 3  # SET
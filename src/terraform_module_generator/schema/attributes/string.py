@@ -9,14 +9,17 @@ from inmanta_module_factory import inmanta
 from inmanta_module_factory.builder import InmantaModuleBuilder
 
 from terraform_module_generator.schema.attributes.base import Attribute, attribute
+from terraform_module_generator.schema.helpers import cty
 
 
 def is_string(attribute: Any) -> bool:
-    return attribute.type.decode("utf-8") in ["string", '"string"']
+    return cty.parse_type(attribute.type).kind == "string"
 
 
 @attribute(index="abc-string-z", condition=is_string)
 class StringAttribute(Attribute):
+    __slots__ = ()
+
     def inmanta_attribute_type(
         self, module_builder: InmantaModuleBuilder
     ) -> inmanta.InmantaType:
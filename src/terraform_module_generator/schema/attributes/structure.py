@@ -4,7 +4,7 @@
     :license: Inmanta EULA
 """
 import abc
-import re
+import sys
 import typing
 
 from inmanta_module_factory.helpers.utils import inmanta_safe_name
@@ -14,13 +14,12 @@ from terraform_module_generator.schema.attributes.base import Attribute
 
 
 class StructureAttribute(Attribute):
-    legacy_regex: re.Pattern[str]
-    regex: re.Pattern[str]
+    __slots__ = ("inner_attributes",)
 
     def __init__(self, path: typing.List[str], schema: typing.Any) -> None:
         Attribute.__init__(self, path, schema)
         self.inner_attributes = self.get_inner_attributes(
-            path + [inmanta_safe_name(self.name)], schema
+            path + [sys.intern(inmanta_safe_name(self.name))], schema
         )
 
     def as_nested_block(self) -> mocks.NestedBlockMock:
@@ -28,7 +27,9 @@ class StructureAttribute(Attribute):
             type_name=self.name,
             block=mocks.BlockMock(
                 version=0,
-                attributes=[attr._source_attribute for attr in self.inner_attributes],
+                # The inner attributes are already built, they can be used as they
+                # are, there is no need to build them again from their source
+                attributes=list(self.inner_attributes),
                 block_types=[],
                 description=self.description,
                 description_kind=self.description_kind,
@@ -39,19 +40,6 @@ class StructureAttribute(Attribute):
             max_items=1,
         )
 
-    @classmethod
-    def get_inner_attributes_expression(cls, schema: typing.Any) -> str:
-        t = schema.type.decode("utf-8")
-        legacy_match = cls.legacy_regex.fullmatch(t)
-        if legacy_match:
-            return legacy_match.group(1)
-
-        match = cls.regex.fullmatch(t)
-        if match:
-            return match.group(1)
-
-        raise ValueError(f"Failed to match type: {t}")
-
     @classmethod
     @abc.abstractmethod
     def get_inner_attributes(
@@ -3,12 +3,11 @@
     :contact: code@inmanta.com
     :license: Inmanta EULA
 """
-import json
-import re
 import typing
 
 from inmanta_module_factory import builder, inmanta
 
+from terraform_module_generator.schema.helpers import cty
 from terraform_module_generator.schema.mocks.attribute import AttributeMock
 
 from .base import Attribute, attribute
@@ -16,17 +15,12 @@ from .structure import StructureAttribute
 
 
 def is_tuple(attribute: typing.Any) -> bool:
-    t = attribute.type.decode("utf-8")
-    return (
-        TupleAttribute.legacy_regex.fullmatch(t) is not None
-        or TupleAttribute.regex.fullmatch(t) is not None
-    )
+    return cty.parse_type(attribute.type).kind == "tuple"
 
 
 @attribute(index="abc-tuple-z", condition=is_tuple)
 class TupleAttribute(StructureAttribute):
-    legacy_regex = re.compile(r'\["tuple",(.+)\]')
-    regex = re.compile(r"tuple\((.+)\)")
+    __slots__ = ()
 
     def inmanta_attribute_type(
         self, module_builder: builder.InmantaModuleBuilder
@@ -37,15 +31,17 @@ class TupleAttribute(StructureAttribute):
     def get_inner_attributes(
         cls, path: typing.List[str], schema: typing.Any
     ) -> typing.List[Attribute]:
-        raw_inner_attributes_expression = cls.get_inner_attributes_expression(schema)
-        inner_attributes_expression: list = json.loads(raw_inner_attributes_expression)
+        inner_elements = cty.parse_type(schema.type).elements
+        if inner_elements is None:
+            raise ValueError(f"Type {schema.type!r} is not a tuple")
+
         return [
             Attribute.build_attribute(
                 path,
                 AttributeMock(
                     name=f"attr{i}",
-                    type=json.dumps(value).strip().encode("utf-8"),
+                    type=value.raw,
                 ),
             )
-            for i, value in enumerate(inner_attributes_expression)
+            for i, value in enumerate(inner_elements)
         ]
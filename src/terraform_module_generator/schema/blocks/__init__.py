@@ -9,4 +9,5 @@ from .list import *  # noqa: F401, F403
 from .map import *  # noqa: F401, F403
 from .nested_block import nested_block  # noqa: F401
 from .set import *  # noqa: F401, F403
+from .shared import SharedNestedBlocks  # noqa: F401
 from .single import *  # noqa: F401, F403
@@ -3,6 +3,8 @@
     :contact: code@inmanta.com
     :license: Inmanta EULA
 """
+import hashlib
+import sys
 import textwrap
 import typing
 
@@ -19,14 +21,28 @@ if typing.TYPE_CHECKING:
 
 
 class Block:
+    __slots__ = (
+        "name",
+        "path",
+        "attributes",
+        "nested_blocks",
+        "description",
+        "description_kind",
+        "deprecated",
+        "plugin_config",
+        "__weakref__",
+    )
+
     def __init__(self, name: str, path: typing.List[str], schema: typing.Any) -> None:
-        self.name = name
+        self.name = sys.intern(name)
         self.path = path
 
         nested_blocks: typing.List[mocks.NestedBlockMock] = []
         self.attributes: typing.List[Attribute] = []
 
-        for attribute in Block.get_attributes(path + [inmanta_safe_name(name)], schema):
+        # All the attributes and nested blocks of this block share the same path
+        inner_path = path + [sys.intern(inmanta_safe_name(name))]
+        for attribute in Block.get_attributes(inner_path, schema):
             # For each of the attributes of this block, instead of simply considering
             # them as attributes, we first check if some of them could be converted to
             # entities.  This is only the case if the attribute type is a structure, or
@@ -39,14 +55,61 @@ class Block:
                 self.attributes.append(attribute)
 
         self.nested_blocks = Block.get_nested_blocks(
-            path + [inmanta_safe_name(name)],
+            inner_path,
             schema,
             additional_block_types=nested_blocks,
         )
-        self.description: str = schema.description
+        self.description: str = sys.intern(schema.description)
         self.description_kind: str = schema.description_kind
         self.deprecated: bool = schema.deprecated
 
+        # When set, the attributes of the config block are serialized by a plugin
+        self.plugin_config = False
+
+    def use_plugin_config(self) -> None:
+        """
+        Serialize the config block of this block, and of all its nested blocks, with one
+        call to the config attributes plugin of the module, instead of a dict expression.
+        This has to be done before any of them is built.
+        """
+        self.plugin_config = True
+        for nested_block in self.nested_blocks:
+            nested_block.use_plugin_config()
+
+    def move(self, path: typing.List[str]) -> None:
+        """
+        Change the path where the elements of this block, and of all its nested blocks,
+        are placed in the module.  This has to be done before any of them is built.
+        """
+        self.path = path
+        for nested_block in self.nested_blocks:
+            nested_block.move(path + [inmanta_safe_name(self.name)])
+
+    @cache_method_result
+    def get_structure_digest(self) -> str:
+        """
+        Return a digest of everything the generated model depends on for this block, its
+        attributes and its nested blocks.  The path of the block is not part of it, two
+        blocks with the same digest can then be represented by the same entity.
+        """
+        structure = (
+            type(self).__name__,
+            self.name,
+            self.description,
+            self.description_kind,
+            self.deprecated,
+            [attribute.get_structure() for attribute in self.attributes],
+            [
+                (
+                    nested_block.get_structure_digest(),
+                    nested_block.min_items,
+                    nested_block.max_items,
+                )
+                for nested_block in self.nested_blocks
+            ],
+        )
+        return hashlib.sha256(repr(structure).encode("utf-8")).hexdigest()
+
     @cache_method_result
     def get_entity(
         self, module_builder: builder.InmantaModuleBuilder
@@ -55,7 +118,7 @@ class Block:
             name=inmanta_entity_name(self.name),
             path=self.path,
             description=self.description,
-            parents=[const.BASE_ENTITY],
+            parents=[const.get_base_entities(module_builder, self.path[0]).base_entity],
         )
         module_builder.add_module_element(entity)
 
@@ -79,6 +142,28 @@ class Block:
         module_builder: builder.InmantaModuleBuilder,
         imports: typing.Set[str],
     ) -> typing.Dict[str, str]:
+        config_attributes = [
+            attribute for attribute in self.attributes if attribute.computed is False
+        ]
+        if self.plugin_config and config_attributes:
+            module_name = self.path[0]
+            const.get_config_attributes_plugin(module_builder, module_name)
+            imports.add(module_name)
+            fields = ",".join(
+                attribute.get_serialized_field(module_builder)
+                for attribute in config_attributes
+            )
+            return {
+                "name": "null",
+                "attributes": (
+                    f"{module_name}::{const.CONFIG_ATTRIBUTES_PLUGIN_NAME}"
+                    f'(self, "{fields}")'
+                ),
+                "deprecated": str(self.deprecated).lower(),
+                "nesting_mode": '"single"',
+                "parent": "null",
+            }
+
         attributes = "\n".join(
             [
                 f'"{attribute.name}": {attribute.get_serialized_attribute_expression("self", module_builder, imports)},'
@@ -111,7 +196,7 @@ class Block:
         config_block += ")"
         config_block = (
             "self."
-            + const.BASE_ENTITY_CONFIG_BLOCK_RELATION.name
+            + const.BASE_ENTITY_CONFIG_BLOCK_RELATION_NAME
             + " = "
             + config_block
         )
@@ -119,6 +204,33 @@ class Block:
         implementation_body = "# Building the config block for this entity\n"
         implementation_body += config_block
 
+        shared_blocks = [
+            nested_block
+            for nested_block in self.nested_blocks
+            if nested_block.shared_block is not None
+        ]
+        if shared_blocks:
+            # The entities of the shared blocks don't know to which entity they are
+            # attached, we need to tell them
+            implementation_body += (
+                "\n\n# Attaching the shared nested blocks to this entity"
+            )
+        for nested_block in shared_blocks:
+            relation = nested_block.get_entity_relation(module_builder)
+            parent = nested_block.get_parent_relation(module_builder).name
+            if relation.is_single:
+                implementation_body += (
+                    f"\nif self.{relation.name} is defined:\n"
+                    f"    self.{relation.name}.{parent} = self\n"
+                    "end"
+                )
+            else:
+                implementation_body += (
+                    f"\nfor child in self.{relation.name}:\n"
+                    f"    child.{parent} = self\n"
+                    "end"
+                )
+
         implementation = inmanta.Implementation(
             name="config",
             path=self.path + [inmanta_safe_name(self.name)],
@@ -148,11 +260,19 @@ class Block:
         if not computed_attributes:
             return None
 
-        config_block = const.BASE_ENTITY_CONFIG_BLOCK_RELATION.name
-        implementation_body = "\n".join(
-            f'self.{attribute.get_attribute(module_builder).name} = self.{config_block}._state["{attribute.name}"]'
-            for attribute in computed_attributes
-        )
+        config_block = const.BASE_ENTITY_CONFIG_BLOCK_RELATION_NAME
+        if self.plugin_config:
+            # Plugins can not set the attributes of an entity, the state is only looked
+            # up once
+            implementation_body = f"state = self.{config_block}._state\n" + "\n".join(
+                f'self.{attribute.get_attribute(module_builder).name} = state["{attribute.name}"]'
+                for attribute in computed_attributes
+            )
+        else:
+            implementation_body = "\n".join(
+                f'self.{attribute.get_attribute(module_builder).name} = self.{config_block}._state["{attribute.name}"]'
+                for attribute in computed_attributes
+            )
 
         implementation = inmanta.Implementation(
             name="state",
@@ -198,8 +318,13 @@ class Block:
     def get_attributes(
         path: typing.List[str], block: typing.Any
     ) -> typing.List[Attribute]:
+        # When the block comes from a structure attribute, its attributes have
+        # already been built, we don't build them a second time.
         return [
-            Attribute.build_attribute(path, attribute) for attribute in block.attributes
+            attribute
+            if isinstance(attribute, Attribute)
+            else Attribute.build_attribute(path, attribute)
+            for attribute in block.attributes
         ]
 
     @staticmethod
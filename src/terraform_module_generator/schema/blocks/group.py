@@ -19,6 +19,8 @@ def is_group(schema: Any) -> bool:
 
 @nested_block(index="abc-group-z", condition=is_group)
 class GroupNestedBlock(NestedBlock):
+    __slots__ = ()
+
     @cache_method_result
     def get_config_block_attributes(
         self, module_builder: builder.InmantaModuleBuilder, imports: typing.Set[str]
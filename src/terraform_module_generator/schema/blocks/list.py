@@ -19,6 +19,8 @@ def is_block_list(schema: Any) -> bool:
 
 @nested_block(index="abc-list-z", condition=is_block_list)
 class ListNestedBlock(NestedBlock):
+    __slots__ = ()
+
     @cache_method_result
     def get_list_index_attribute(
         self, module_builder: builder.InmantaModuleBuilder
@@ -50,7 +52,7 @@ class ListNestedBlock(NestedBlock):
             path=self.get_entity(module_builder).path,
             entity=self.get_entity(module_builder),
             fields=[
-                self.get_entity_relation(module_builder).peer,
+                self.get_parent_relation(module_builder),
                 self.get_list_index_attribute(module_builder),
             ],
             description="This index ensure that each element of the config tree is unique",
@@ -19,6 +19,8 @@ def is_block_map(schema: Any) -> bool:
 
 @nested_block(index="abc-map-z", condition=is_block_map)
 class MapNestedBlock(NestedBlock):
+    __slots__ = ()
+
     @cache_method_result
     def get_map_key_attribute(
         self, module_builder: builder.InmantaModuleBuilder
@@ -50,7 +52,7 @@ class MapNestedBlock(NestedBlock):
             path=self.get_entity(module_builder).path,
             entity=self.get_entity(module_builder),
             fields=[
-                self.get_entity_relation(module_builder).peer,
+                self.get_parent_relation(module_builder),
                 self.get_map_key_attribute(module_builder),
             ],
             description="This index ensure that each element of the config tree is unique",
@@ -4,7 +4,7 @@
     :license: Inmanta EULA
 """
 import typing
-from typing import Any, Callable, Dict, List, Tuple, Type, TypeVar
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar
 
 from inmanta_module_factory import builder, inmanta
 from inmanta_module_factory.helpers.utils import inmanta_safe_name
@@ -18,32 +18,96 @@ class NestedBlock(block.Block):
     __nested_block_types: Dict[
         str, Tuple[Callable[[Any], bool], Type["NestedBlock"]]
     ] = dict()
+    __sorted_nested_block_types: Optional[
+        List[Tuple[Callable[[Any], bool], Type["NestedBlock"]]]
+    ] = None
+
+    __slots__ = ("min_items", "max_items", "shared_block")
 
     def __init__(self, path: List[str], schema: Any) -> None:
         super().__init__(schema.type_name, path, schema.block)
         self.min_items: int = schema.min_items
         self.max_items: int = schema.max_items  # Zero for no upper bound
 
+        # When the nested blocks are shared, the nested block defining the entity used
+        # for all the nested blocks with the same structure as this one
+        self.shared_block: Optional["NestedBlock"] = None
+
+    def get_entity(
+        self, module_builder: builder.InmantaModuleBuilder
+    ) -> inmanta.Entity:
+        if self.shared_block is not None and self.shared_block is not self:
+            return self.shared_block.get_entity(module_builder)
+
+        return super().get_entity(module_builder)
+
     @cache_method_result
     def get_entity_relation(
         self, module_builder: builder.InmantaModuleBuilder
     ) -> inmanta.EntityRelation:
         entity = self.get_entity(module_builder)
+        if self.shared_block is None:
+            peer = inmanta.EntityRelation(
+                name="_parent",
+                path=entity.path,
+                cardinality=(1, 1),
+                entity=entity,
+            )
+        else:
+            # The shared entity can not have a relation back to each of its parents,
+            # the relation is only defined on the parent side.
+            peer = inmanta.EntityRelation(
+                name="",
+                path=entity.path,
+                cardinality=(0, None),
+            )
+            peer.attach_entity(entity)
+
         relation = inmanta.EntityRelation(
             name=inmanta_safe_name(self.name),
             path=entity.path,  # Will be overwritten
             cardinality=(self.min_items, self.max_items or None),
             description=self.description,
-            peer=inmanta.EntityRelation(
-                name="_parent",
-                path=entity.path,
-                cardinality=(1, 1),
-                entity=entity,
-            ),
+            peer=peer,
         )
 
         return relation
 
+    @cache_method_result
+    def get_parent_relation(
+        self, module_builder: builder.InmantaModuleBuilder
+    ) -> inmanta.EntityRelation:
+        """
+        Get the relation from the entity of this block to the entity of its parent.  When
+        the block is shared, its parent can be any config based entity.
+        """
+        if self.shared_block is None:
+            return self.get_entity_relation(module_builder).peer
+
+        if self.shared_block is not self:
+            return self.shared_block.get_parent_relation(module_builder)
+
+        entity = self.get_entity(module_builder)
+        peer = inmanta.EntityRelation(
+            name="",
+            path=entity.path,
+            cardinality=(0, None),
+        )
+        peer.attach_entity(
+            const.get_base_entities(module_builder, self.path[0]).base_entity
+        )
+        relation = inmanta.EntityRelation(
+            name="_parent",
+            path=entity.path,
+            cardinality=(1, 1),
+            description="The entity this block is attached to.",
+            peer=peer,
+            entity=entity,
+        )
+        module_builder.add_module_element(relation)
+
+        return relation
+
     @cache_method_result
     def get_config_block_attributes(
         self,
@@ -52,14 +116,14 @@ class NestedBlock(block.Block):
     ) -> typing.Dict[str, str]:
         attributes = super().get_config_block_attributes(module_builder, imports)
 
-        relation_to_parent = self.get_entity_relation(module_builder).peer
+        relation_to_parent = self.get_parent_relation(module_builder)
 
         attributes["name"] = f'"{self.name}"'
         attributes["parent"] = (
             "self."
             + relation_to_parent.name
             + "."
-            + const.BASE_ENTITY_CONFIG_BLOCK_RELATION.name
+            + const.BASE_ENTITY_CONFIG_BLOCK_RELATION_NAME
         )
         return attributes
 
@@ -70,14 +134,20 @@ class NestedBlock(block.Block):
         index = inmanta.Index(
             path=self.get_entity(module_builder).path,
             entity=self.get_entity(module_builder),
-            fields=[self.get_entity_relation(module_builder).peer],
+            fields=[self.get_parent_relation(module_builder)],
             description="This index ensure that each element of the config tree is unique",
         )
         module_builder.add_module_element(index)
         return index
 
     def add_to_module(self, module_builder: builder.InmantaModuleBuilder) -> None:
+        if self.shared_block is not None and self.shared_block is not self:
+            # The entity of this block is the one of the shared block
+            self.shared_block.add_to_module(module_builder)
+            return
+
         super().add_to_module(module_builder)
+        self.get_parent_relation(module_builder)
         self.get_entity_index(module_builder)
 
     @classmethod
@@ -91,21 +161,26 @@ class NestedBlock(block.Block):
             )
 
         cls.__nested_block_types[index] = (condition, cls)
+        NestedBlock.__sorted_nested_block_types = None
 
     @classmethod
     def get_nested_block_types(
         cls,
     ) -> List[Tuple[Callable[[Any], bool], Type["NestedBlock"]]]:
         """
-        Get all the registered nested block types, ordered by index.
+        Get all the registered nested block types, ordered by index.  The order is only
+        computed again when a new type is registered.
         """
-        return [
-            x[1]
-            for x in sorted(
-                ((key, value) for key, value in cls.__nested_block_types.items()),
-                key=lambda x: x[0],
-            )
-        ]
+        if NestedBlock.__sorted_nested_block_types is None:
+            NestedBlock.__sorted_nested_block_types = [
+                x[1]
+                for x in sorted(
+                    ((key, value) for key, value in cls.__nested_block_types.items()),
+                    key=lambda x: x[0],
+                )
+            ]
+
+        return NestedBlock.__sorted_nested_block_types
 
     @classmethod
     def build_nested_block(cls, path: List[str], nested_block: Any) -> "NestedBlock":
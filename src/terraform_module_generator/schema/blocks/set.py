@@ -19,6 +19,8 @@ def is_block_set(schema: Any) -> bool:
 
 @nested_block(index="abc-set-z", condition=is_block_set)
 class SetNestedBlock(NestedBlock):
+    __slots__ = ()
+
     @cache_method_result
     def get_config_block_attributes(
         self,
@@ -0,0 +1,61 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+from typing import Dict, List
+
+from inmanta_module_factory.helpers.utils import inmanta_safe_name
+
+from .block import Block
+from .nested_block import NestedBlock
+
+
+class SharedNestedBlocks:
+    """
+    Registry of the nested blocks shared by all the blocks of a module.  Many providers
+    repeat the same nested blocks (timeouts, tags, ...) in a lot of resources.  Instead
+    of generating an entity for each of them, all the nested blocks with the same structure
+    use the entity of the first one that was registered, which is moved in its own
+    sub-module, under the path of the registry.
+
+    The entity of a shared nested block has a unidirectional relation to its parent,
+    the entity of the parent block is responsible for setting it.
+    """
+
+    def __init__(self, path: List[str]) -> None:
+        self.path = path
+        self.shared_blocks: Dict[str, NestedBlock] = dict()
+        self.shared_blocks_paths: Dict[str, str] = dict()
+
+    def get_shared_block_path(
+        self, nested_block: NestedBlock, digest: str
+    ) -> List[str]:
+        """
+        Get the path where a new shared nested block should be placed.  The digest of the
+        block is part of it, so that different blocks with the same name don't collide.
+        """
+        for length in (8, 16, len(digest)):
+            name = f"{inmanta_safe_name(nested_block.name)}_{digest[:length]}"
+            if self.shared_blocks_paths.setdefault(name, digest) == digest:
+                return self.path + [name]
+
+        raise ValueError(f"Can not find a free path for shared block {digest}")
+
+    def share(self, block: Block) -> None:
+        """
+        Share all the nested blocks of the given block, and of its nested blocks.  This
+        has to be done before any of the elements of the block is built.
+        """
+        for nested_block in block.nested_blocks:
+            digest = nested_block.get_structure_digest()
+            shared_block = self.shared_blocks.get(digest)
+            if shared_block is None:
+                # First time we see this structure, this block will hold the entity
+                # for all the others
+                shared_block = nested_block
+                self.shared_blocks[digest] = shared_block
+                shared_block.move(self.get_shared_block_path(shared_block, digest))
+                self.share(shared_block)
+
+            nested_block.shared_block = shared_block
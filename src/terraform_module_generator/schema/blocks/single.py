@@ -14,4 +14,4 @@ def is_single(schema: Any) -> bool:
 
 @nested_block(index="abc-single-z", condition=is_single)
 class SingleNestedBlock(NestedBlock):
-    pass
+    __slots__ = ()
@@ -3,7 +3,9 @@
     :contact: code@inmanta.com
     :license: Inmanta EULA
 """
-from inmanta_module_factory import inmanta
+from inmanta_module_factory import builder, inmanta
+
+from terraform_module_generator.schema.helpers.cache import cache_method_result
 
 STD_PURGEABLE_RESOURCE = inmanta.Entity(
     name="PurgeableResource",
@@ -23,57 +25,141 @@ TERRAFORM_PROVIDER_ENTITY = inmanta.Entity(
     path=["terraform"],
 )
 
-BASE_ENTITY = inmanta.Entity(
-    name="ConfigBasedEntity",
-    path=["__config__"],
-    description="This is the base entity for all entities that should be serialized as config blocks.",
-)
-BASE_ENTITY_CONFIG_BLOCK_RELATION = inmanta.EntityRelation(
-    name="_config_block",
-    path=BASE_ENTITY.path,
-    cardinality=(1, 1),
-    description="Relation to the config block used internally to generate the config tree.",
-    entity=BASE_ENTITY,
-    peer=inmanta.EntityRelation(
-        name="",
-        path=BASE_ENTITY.path,
-        cardinality=(0, None),
-        entity=TERRAFORM_CONFIG_BLOCK_ENTITY,
-    ),
-)
+BASE_ENTITY_CONFIG_BLOCK_RELATION_NAME = "_config_block"
+BASE_RESOURCE_ENTITY_INMANTA_ID_NAME = "_inmanta_id"
+BASE_RESOURCE_ENTITY_IMPORT_ID_NAME = "_import_id"
+BASE_RESOURCE_ENTITY_TERRAFORM_RESOURCE_RELATION_NAME = "_resource"
 
-BASE_RESOURCE_ENTITY = inmanta.Entity(
-    name="BaseResource",
-    path=BASE_ENTITY.path,
-    description="This is the base entity for all resources in this module.",
-    parents=[STD_PURGEABLE_RESOURCE],
-)
-BASE_RESOURCE_ENTITY_INMANTA_ID = inmanta.Attribute(
-    name="_inmanta_id",
-    inmanta_type=inmanta.InmantaStringType,
-    optional=False,
-    default=None,
-    description="This is the unique identifier of the resource",
-    entity=BASE_RESOURCE_ENTITY,
-)
-BASE_RESOURCE_ENTITY_IMPORT_ID = inmanta.Attribute(
-    name="_import_id",
-    inmanta_type=inmanta.InmantaStringType,
-    optional=True,
-    default="null",
-    description="This attribute can be used to import an existing resource into the orchestrator.",
-    entity=BASE_RESOURCE_ENTITY,
-)
-BASE_RESOURCE_ENTITY_TERRAFORM_RESOURCE_RELATION = inmanta.EntityRelation(
-    name="_resource",
-    path=BASE_RESOURCE_ENTITY.path,
-    cardinality=(1, 1),
-    description="This is the relation to the terraform resource entity.",
-    entity=BASE_RESOURCE_ENTITY,
-    peer=inmanta.EntityRelation(
-        name="",
-        path=BASE_RESOURCE_ENTITY.path,
-        cardinality=(0, None),
-        entity=TERRAFORM_RESOURCE_ENTITY,
-    ),
+CONFIG_ATTRIBUTES_PLUGIN_NAME = "config_attributes"
+CONFIG_ATTRIBUTES_PLUGIN_CONTENT = """
+attributes = {}
+for field in fields.split(","):
+    name, _, attribute = field.partition("=")
+    attribute, _, serialization = attribute.partition(":")
+    value = getattr(entity, attribute)
+    if serialization == "sorted" and value is not None and not isinstance(value, Unknown):
+        value = sorted(value)
+    attributes[name] = value
+return attributes
+""".strip(
+    "\n"
 )
+
+
+class BaseEntities:
+    """
+    The entities defined at the root of each generated module.  The elements built for
+    the module attach themselves to those entities, we then need a new set of them for
+    each module builder.
+    """
+
+    def __init__(self, module_name: str) -> None:
+        self.base_entity = inmanta.Entity(
+            name="ConfigBasedEntity",
+            path=[module_name],
+            description="This is the base entity for all entities that should be serialized as config blocks.",
+        )
+        self.base_entity_config_block_relation = inmanta.EntityRelation(
+            name=BASE_ENTITY_CONFIG_BLOCK_RELATION_NAME,
+            path=self.base_entity.path,
+            cardinality=(1, 1),
+            description="Relation to the config block used internally to generate the config tree.",
+            entity=self.base_entity,
+            peer=inmanta.EntityRelation(
+                name="",
+                path=self.base_entity.path,
+                cardinality=(0, None),
+            ),
+        )
+        self.base_entity_config_block_relation.peer.attach_entity(
+            TERRAFORM_CONFIG_BLOCK_ENTITY
+        )
+
+        self.base_resource_entity = inmanta.Entity(
+            name="BaseResource",
+            path=self.base_entity.path,
+            description="This is the base entity for all resources in this module.",
+            parents=[STD_PURGEABLE_RESOURCE],
+        )
+        self.base_resource_entity_inmanta_id = inmanta.Attribute(
+            name=BASE_RESOURCE_ENTITY_INMANTA_ID_NAME,
+            inmanta_type=inmanta.InmantaStringType,
+            optional=False,
+            default=None,
+            description="This is the unique identifier of the resource",
+            entity=self.base_resource_entity,
+        )
+        self.base_resource_entity_import_id = inmanta.Attribute(
+            name=BASE_RESOURCE_ENTITY_IMPORT_ID_NAME,
+            inmanta_type=inmanta.InmantaStringType,
+            optional=True,
+            default="null",
+            description="This attribute can be used to import an existing resource into the orchestrator.",
+            entity=self.base_resource_entity,
+        )
+        self.base_resource_entity_terraform_resource_relation = inmanta.EntityRelation(
+            name=BASE_RESOURCE_ENTITY_TERRAFORM_RESOURCE_RELATION_NAME,
+            path=self.base_resource_entity.path,
+            cardinality=(1, 1),
+            description="This is the relation to the terraform resource entity.",
+            entity=self.base_resource_entity,
+            peer=inmanta.EntityRelation(
+                name="",
+                path=self.base_resource_entity.path,
+                cardinality=(0, None),
+            ),
+        )
+        self.base_resource_entity_terraform_resource_relation.peer.attach_entity(
+            TERRAFORM_RESOURCE_ENTITY
+        )
+
+
+@cache_method_result
+def get_config_attributes_plugin(
+    module_builder: builder.InmantaModuleBuilder, module_name: str
+) -> inmanta.Plugin:
+    """
+    Get the plugin serializing the attributes of any config based entity of the module
+    with the given name, for this module builder.  The entities call it with their
+    field table, built with the module, so that the compiler doesn't have to evaluate a
+    dict expression for each of them.
+    """
+    plugin = inmanta.Plugin(
+        name=CONFIG_ATTRIBUTES_PLUGIN_NAME,
+        arguments=[
+            inmanta.PluginArgument(
+                name="entity",
+                inmanta_type=get_base_entities(module_builder, module_name).base_entity,
+                description="The entity whose attributes should be serialized.",
+            ),
+            inmanta.PluginArgument(
+                name="fields",
+                inmanta_type="string",
+                description=(
+                    "The field table of the entity, a comma separated list of "
+                    "<terraform name>=<entity attribute>, suffixed with :sorted for "
+                    "the sets."
+                ),
+            ),
+        ],
+        return_type=inmanta.PluginArgument(
+            name="",
+            inmanta_type="dict",
+            description="The attributes of the config block of the entity.",
+        ),
+        content=CONFIG_ATTRIBUTES_PLUGIN_CONTENT,
+        description="Serialize the attributes of the config block of an entity.",
+    )
+    plugin.add_import("from inmanta.execute.util import Unknown")
+    module_builder.add_plugin(plugin)
+    return plugin
+
+
+@cache_method_result
+def get_base_entities(
+    module_builder: builder.InmantaModuleBuilder, module_name: str
+) -> BaseEntities:
+    """
+    Get the base entities of the module with the given name, for this module builder.
+    """
+    return BaseEntities(module_name)
@@ -3,25 +3,284 @@
     :contact: code@inmanta.com
     :license: Inmanta EULA
 """
-from typing import Callable, TypeVar
+import collections
+import functools
+import logging
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from inmanta_module_factory.builder import InmantaModuleBuilder
+
+LOGGER = logging.getLogger(__name__)
 
 F = TypeVar("F", bound=Callable)
 
 
+@dataclass()
+class CacheInfo:
+    """
+    The amount of calls of a cached method which were served from the cache (hits) and
+    the ones which actually called the method (misses).
+    """
+
+    hits: int = 0
+    misses: int = 0
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A mapping holding at most max_size values, the least recently used ones are dropped
+    when new ones are added, and passed to on_evict if it is set.
+    """
+
+    def __init__(
+        self, max_size: int, on_evict: Optional[Callable[[K, V], None]] = None
+    ) -> None:
+        self.max_size = max_size
+        self.on_evict = on_evict
+        self.info = CacheInfo()
+        self._values: "collections.OrderedDict[K, V]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            value = self._values.get(key)
+            if value is None:
+                self.info.misses += 1
+                return None
+
+            self.info.hits += 1
+            self._values.move_to_end(key)
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        evicted: List[Tuple[K, V]] = []
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_size:
+                evicted.append(self._values.popitem(last=False))
+
+        if self.on_evict is not None:
+            for evicted_key, evicted_value in evicted:
+                self.on_evict(evicted_key, evicted_value)
+
+    def keys(self) -> List[K]:
+        with self._lock:
+            return list(self._values.keys())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class Identity:
+    """
+    Wrapper making an unhashable argument (i.e. a set of imports) usable in a cache key.
+    It compares by identity, and keeps the argument alive as long as the key exists, so
+    that its id can not be reused by another object.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: object) -> None:
+        self.value = value
+
+    def __hash__(self) -> int:
+        return id(self.value)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Identity) and other.value is self.value
+
+
+# The results of all the calls which received a module builder, per id of the module
+# builder.  They are dropped with the module builder, or when its cache is released.
+_builder_caches: Dict[int, Dict[Hashable, Any]] = dict()
+
+# The results of all the calls which didn't receive any module builder, per object
+_object_caches: "weakref.WeakKeyDictionary[object, Dict[Hashable, Any]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# The module builders whose cache can also be used by another module builder
+_parent_builders: "weakref.WeakKeyDictionary[InmantaModuleBuilder, InmantaModuleBuilder]" = (
+    weakref.WeakKeyDictionary()
+)
+
+_cache_info: Dict[str, CacheInfo] = dict()
+
+MISSING = object()
+EMPTY: Dict[Hashable, Any] = dict()
+
+
+def freeze(value: object) -> Hashable:
+    if type(value).__hash__ is None:
+        return Identity(value)
+
+    return value
+
+
+def get_cache_key(
+    func: Callable, args: Tuple[Any, ...], kwargs: Dict[str, Any]
+) -> Tuple[Optional[InmantaModuleBuilder], Tuple[Hashable, ...]]:
+    """
+    Get the module builder the call is scoped to, if any, and the key of the call in
+    the cache of this scope.  The module builder itself is not part of the key.
+    """
+    module_builder: Optional[InmantaModuleBuilder] = None
+    key: List[Hashable] = [func]
+    for arg in args:
+        if module_builder is None and isinstance(arg, InmantaModuleBuilder):
+            module_builder = arg
+        else:
+            key.append(freeze(arg))
+
+    for name, value in sorted(kwargs.items()):
+        if module_builder is None and isinstance(value, InmantaModuleBuilder):
+            module_builder = value
+        else:
+            key.append((name, freeze(value)))
+
+    return module_builder, tuple(key)
+
+
+def get_builder_cache(module_builder: InmantaModuleBuilder) -> Dict[Hashable, Any]:
+    results = _builder_caches.get(id(module_builder))
+    if results is None:
+        results = _builder_caches[id(module_builder)] = dict()
+        weakref.finalize(module_builder, _builder_caches.pop, id(module_builder), None)
+
+    return results
+
+
+def get_parent_result(module_builder: InmantaModuleBuilder, key: Hashable) -> Any:
+    """
+    Get the result cached for the given key by any of the parents of the module builder,
+    or MISSING if none of them has it.
+    """
+    parent = _parent_builders.get(module_builder)
+    while parent is not None:
+        result = _builder_caches.get(id(parent), EMPTY).get(key, MISSING)
+        if result is not MISSING:
+            return result
+
+        parent = _parent_builders.get(parent)
+
+    return MISSING
+
+
 def cache_method_result(func: F) -> F:
     """
-    Decorator for objects methods.  When added to a method, the method body
-    will only be called once, and the response object will be attached to the
-    object.  If the method is called a second time, the result is taken from
-    the value stored on the object.
+    Decorator for objects methods.  When added to a method, the method body is only
+    called once for each set of arguments, the following calls with the same arguments
+    get the same result.  Arguments which are not hashable are compared by identity.
+
+    The results of the calls receiving a module builder are scoped to this module
+    builder: the same object can be used to fill in several module builders, each of them
+    gets its own entities.  They can be released with release_cache.  The results of the
+    calls without module builder are attached to the object, they shouldn't reference it.
     """
-    func_name = func.__name__
-    func_result_attribute = f"__{func_name}_result"
+    info = _cache_info.setdefault(func.__qualname__, CacheInfo())
+
+    def call(self: object, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> object:
+        module_builder, key = get_cache_key(func, (self, *args), kwargs)
+        if module_builder is None:
+            key = key[:1] + key[2:]  # The object is already the scope
+            results = _object_caches.get(self)
+            if results is None:
+                results = _object_caches[self] = dict()
+        else:
+            results = get_builder_cache(module_builder)
+
+        result = results.get(key, MISSING)
+        if result is MISSING and module_builder is not None:
+            result = get_parent_result(module_builder, key)
+
+        if result is not MISSING:
+            info.hits += 1
+            return result
+
+        info.misses += 1
+        result = results[key] = func(self, *args, **kwargs)
+        return result
 
+    @functools.wraps(func)
     def cache(self, *args, **kwargs) -> object:
-        if not hasattr(self, func_result_attribute):
-            setattr(self, func_result_attribute, func(self, *args, **kwargs))
+        if kwargs or len(args) != 1:
+            return call(self, args, kwargs)
 
-        return getattr(self, func_result_attribute)
+        # Most of the methods only receive the module builder, any live object whose id
+        # is in the builder caches is a module builder
+        result = _builder_caches.get(id(args[0]), EMPTY).get((func, self), MISSING)
+        if result is MISSING:
+            return call(self, args, kwargs)
+
+        info.hits += 1
+        return result
 
     return cache  # type: ignore
+
+
+def inherit_cache(
+    module_builder: InmantaModuleBuilder, parent: InmantaModuleBuilder
+) -> None:
+    """
+    Make all the results cached for the parent module builder available to the calls
+    made with the given module builder.  The elements which were already added to the
+    parent module builder are then not added again to this one.  The new results are
+    only cached for the given module builder.
+    """
+    _parent_builders[module_builder] = parent
+
+
+def release_cache(module_builder: InmantaModuleBuilder) -> None:
+    """
+    Drop all the results cached for the given module builder.
+    """
+    _builder_caches.pop(id(module_builder), None)
+    _parent_builders.pop(module_builder, None)
+
+
+def get_cache_info() -> Dict[str, CacheInfo]:
+    """
+    Get the hits and misses of each cached method, since the start of the process or
+    the last reset.
+    """
+    return {
+        name: CacheInfo(hits=info.hits, misses=info.misses)
+        for name, info in _cache_info.items()
+    }
+
+
+def reset_cache_info() -> None:
+    for info in _cache_info.values():
+        info.hits = 0
+        info.misses = 0
+
+
+def log_cache_info() -> None:
+    """
+    Log, in debug, the hits and misses of all the cached methods which were called.
+    """
+    for name, info in sorted(_cache_info.items()):
+        if info.hits or info.misses:
+            LOGGER.debug(f"{name}: {info.hits} hits, {info.misses} misses")
@@ -0,0 +1,273 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import functools
+import json
+import typing
+
+from terraform_module_generator.schema.helpers.cache import LRUCache
+
+PRIMITIVE_TYPES = ("string", "number", "bool", "dynamic")
+COLLECTION_TYPES = ("list", "set", "map")
+STRUCTURE_TYPES = ("object", "tuple")
+
+WHITESPACES = " \t\n\r"
+
+
+class CtyType:
+    """
+    A parsed cty type expression, as found in the type of the attributes of a provider
+    schema.  The raw attribute contains the exact expression this type was parsed from,
+    it can be used to build mock attributes of this type without serializing it again.
+
+    :attr kind: The kind of type, one of PRIMITIVE_TYPES, COLLECTION_TYPES or STRUCTURE_TYPES.
+    :attr raw: The expression this type was parsed from.
+    :attr element: For collections, the type of the elements of the collection.
+    :attr attributes: For objects, the type of each attribute of the object.
+    :attr elements: For tuples, the type of each element of the tuple.
+    """
+
+    __slots__ = ("kind", "raw", "element", "attributes", "elements")
+
+    def __init__(
+        self,
+        kind: str,
+        raw: bytes,
+        *,
+        element: typing.Optional["CtyType"] = None,
+        attributes: typing.Optional[typing.Dict[str, "CtyType"]] = None,
+        elements: typing.Optional[typing.List["CtyType"]] = None,
+    ) -> None:
+        self.kind = kind
+        self.raw = raw
+        self.element = element
+        self.attributes = attributes
+        self.elements = elements
+
+    def __repr__(self) -> str:
+        return f"CtyType({self.raw.decode('utf-8')})"
+
+
+class CtyTypeParser:
+    """
+    Single pass parser for cty type expressions.  It supports both the legacy json
+    form (i.e. '["list",["object",{"a":"string"}]]') and the function-like form
+    (i.e. 'list(object({"a":string}))'), and any mix of those.  Each sub-expression is
+    parsed once, and registered in the parsed types cache under its raw expression.
+    """
+
+    def __init__(self, expression: str, parsed_types: LRUCache[bytes, CtyType]) -> None:
+        self.expression = expression
+        self.parsed_types = parsed_types
+
+    def error(self, position: int, message: str) -> ValueError:
+        return ValueError(
+            f"Failed to parse type {self.expression} at position {position}: {message}"
+        )
+
+    def skip_whitespaces(self, position: int) -> int:
+        while (
+            position < len(self.expression) and self.expression[position] in WHITESPACES
+        ):
+            position += 1
+
+        return position
+
+    def expect(self, position: int, char: str) -> int:
+        position = self.skip_whitespaces(position)
+        if not self.expression.startswith(char, position):
+            raise self.error(position, f"expected {repr(char)}")
+
+        return position + 1
+
+    def parse_string(self, position: int) -> typing.Tuple[str, int]:
+        position = self.skip_whitespaces(position)
+        if not self.expression.startswith('"', position):
+            raise self.error(position, "expected a string")
+
+        return json.decoder.scanstring(self.expression, position + 1)  # type: ignore
+
+    def parse_identifier(self, position: int) -> typing.Tuple[str, int]:
+        end = position
+        while end < len(self.expression) and (
+            self.expression[end].isalnum() or self.expression[end] == "_"
+        ):
+            end += 1
+
+        if end == position:
+            raise self.error(position, "expected a type")
+
+        return self.expression[position:end], end
+
+    def parse_attributes(
+        self, position: int
+    ) -> typing.Tuple[typing.Dict[str, CtyType], int]:
+        attributes: typing.Dict[str, CtyType] = dict()
+        position = self.expect(position, "{")
+        if self.expression.startswith("}", self.skip_whitespaces(position)):
+            return attributes, self.skip_whitespaces(position) + 1
+
+        while True:
+            name, position = self.parse_string(position)
+            position = self.expect(position, ":")
+            attributes[name], position = self.parse_type(position)
+            position = self.skip_whitespaces(position)
+            if self.expression.startswith("}", position):
+                return attributes, position + 1
+
+            position = self.expect(position, ",")
+
+    def parse_elements(self, position: int) -> typing.Tuple[typing.List[CtyType], int]:
+        elements: typing.List[CtyType] = []
+        position = self.expect(position, "[")
+        if self.expression.startswith("]", self.skip_whitespaces(position)):
+            return elements, self.skip_whitespaces(position) + 1
+
+        while True:
+            element, position = self.parse_type(position)
+            elements.append(element)
+            position = self.skip_whitespaces(position)
+            if self.expression.startswith("]", position):
+                return elements, position + 1
+
+            position = self.expect(position, ",")
+
+    def parse_arguments(
+        self, kind: str, start: int, position: int, closing: str
+    ) -> typing.Tuple[CtyType, int]:
+        """
+        Parse the arguments of a collection or structure type, the opening bracket
+        has already been consumed, the closing one will be.
+        """
+        if kind in COLLECTION_TYPES:
+            element, position = self.parse_type(position)
+            position = self.expect(position, closing)
+            return self.build(kind, start, position, element=element), position
+
+        if kind == "object":
+            attributes, position = self.parse_attributes(position)
+            position = self.skip_whitespaces(position)
+            if self.expression.startswith(",", position):
+                # The optional attributes of the object, they don't change the way
+                # we represent it, we simply skip them.
+                _, position = self.parse_elements_names(position + 1)
+
+            position = self.expect(position, closing)
+            return self.build(kind, start, position, attributes=attributes), position
+
+        if kind == "tuple":
+            elements, position = self.parse_elements(position)
+            position = self.expect(position, closing)
+            return self.build(kind, start, position, elements=elements), position
+
+        raise self.error(start, f"unknown type {kind}")
+
+    def parse_elements_names(
+        self, position: int
+    ) -> typing.Tuple[typing.List[str], int]:
+        names: typing.List[str] = []
+        position = self.expect(position, "[")
+        if self.expression.startswith("]", self.skip_whitespaces(position)):
+            return names, self.skip_whitespaces(position) + 1
+
+        while True:
+            name, position = self.parse_string(position)
+            names.append(name)
+            position = self.skip_whitespaces(position)
+            if self.expression.startswith("]", position):
+                return names, position + 1
+
+            position = self.expect(position, ",")
+
+    def parse_type(self, position: int) -> typing.Tuple[CtyType, int]:
+        position = self.skip_whitespaces(position)
+        if position >= len(self.expression):
+            raise self.error(position, "unexpected end of expression")
+
+        start = position
+        char = self.expression[position]
+        if char == '"':
+            # Legacy form of a primitive type
+            kind, position = self.parse_string(position)
+            return self.build_primitive(kind, start, position), position
+
+        if char == "[":
+            # Legacy form of a collection or structure type
+            kind, position = self.parse_string(position + 1)
+            position = self.expect(position, ",")
+            return self.parse_arguments(kind, start, position, "]")
+
+        kind, position = self.parse_identifier(position)
+        if self.expression.startswith("(", self.skip_whitespaces(position)):
+            # Function-like form of a collection or structure type
+            position = self.skip_whitespaces(position) + 1
+            return self.parse_arguments(kind, start, position, ")")
+
+        return self.build_primitive(kind, start, position), position
+
+    def build_primitive(self, kind: str, start: int, end: int) -> CtyType:
+        if kind not in PRIMITIVE_TYPES:
+            raise self.error(start, f"unknown type {kind}")
+
+        return self.build(kind, start, end)
+
+    def build(self, kind: str, start: int, end: int, **kwargs: typing.Any) -> CtyType:
+        raw = self.expression[start:end].encode("utf-8")
+        cty_type = self.parsed_types.get(raw)
+        if cty_type is None:
+            cty_type = CtyType(kind, raw, **kwargs)
+            self.parsed_types.put(raw, cty_type)
+
+        return cty_type
+
+    def parse(self) -> CtyType:
+        cty_type, position = self.parse_type(0)
+        if self.skip_whitespaces(position) != len(self.expression):
+            raise self.error(position, "unexpected trailing characters")
+
+        return cty_type
+
+
+# The amount of types and raw expressions kept in the caches below, more than the
+# distinct types of the largest providers
+MAX_CACHED_TYPES = 2**16
+
+# The types and sub-types we parsed, indexed by their raw expression, so that the
+# same sub-type is shared by all the types containing it
+PARSED_TYPES: LRUCache[bytes, CtyType] = LRUCache(MAX_CACHED_TYPES)
+
+
+@functools.lru_cache(maxsize=MAX_CACHED_TYPES)
+def parse_type(raw: bytes) -> CtyType:
+    """
+    Parse the raw type expression of an attribute.  The result is cached, parsing the
+    same expression, or any sub-expression of an expression that was already parsed,
+    simply returns the cached type.
+    """
+    cty_type = PARSED_TYPES.get(raw)
+    if cty_type is None:
+        cty_type = CtyTypeParser(raw.decode("utf-8").strip(), PARSED_TYPES).parse()
+        PARSED_TYPES.put(raw, cty_type)
+
+    return cty_type
+
+
+@functools.lru_cache(maxsize=MAX_CACHED_TYPES)
+def intern_type(raw: bytes) -> bytes:
+    """
+    Get the single instance of the given raw type expression shared by all the
+    attributes of this type: the cache returns the first instance it got.
+    """
+    return raw
+
+
+def clear_type_caches() -> None:
+    """
+    Drop all the cached types, the parsed modules keep the ones they use.  The types
+    parsed afterward are not shared with the ones parsed before.
+    """
+    parse_type.cache_clear()
+    intern_type.cache_clear()
+    PARSED_TYPES.clear()
@@ -0,0 +1,129 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import contextlib
+import logging
+import os
+import typing
+
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.inmanta.module_element import ModuleElement
+
+LOGGER = logging.getLogger(__name__)
+
+T = typing.TypeVar("T")
+
+# Below this amount of resources per worker, the cost of starting the worker and
+# of sending the schema to it is higher than what we gain by using it.
+MIN_RESOURCES_PER_WORKER = 100
+
+# Each worker gets several shards, so that a worker that got the smaller resources
+# can pick up more work instead of waiting for the others to finish.
+SHARDS_PER_WORKER = 4
+
+
+def get_worker_count(resource_count: int) -> int:
+    """
+    Get the amount of workers that should be used to build the given amount of resources.
+    """
+    return max(1, min(os.cpu_count() or 1, resource_count // MIN_RESOURCES_PER_WORKER))
+
+
+def split_in_shards(
+    items: typing.Sequence[T], shards: int
+) -> typing.List[typing.List[T]]:
+    """
+    Split the items in at most the requested amount of shards, of similar sizes.  The
+    items keep their order, the first shard contains the first items, and so on.
+    """
+    shard_size, remainder = divmod(len(items), shards)
+    result: typing.List[typing.List[T]] = []
+    start = 0
+    for i in range(shards):
+        end = start + shard_size + (1 if i < remainder else 0)
+        if end > start:
+            result.append(list(items[start:end]))
+        start = end
+
+    return result
+
+
+class RenderedModuleElement(ModuleElement):
+    """
+    A module element which has already been rendered.  It holds everything the
+    module builder needs to write the element in its file, and nothing else, so that
+    it can cheaply be sent from the process that built it to the one writing the module.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: typing.List[str],
+        ordering_key: str,
+        imports: typing.Set[str],
+        content: str,
+    ) -> None:
+        # The parent constructor is not called, it would register a logger for each
+        # element in the logging module, which keeps it forever.  The rendered elements
+        # are never validated, they don't need their own logger.
+        self.name = name
+        self.path = path
+        self.description = None
+        self.imports = imports
+        self._forced_ordering_key: typing.Optional[str] = ordering_key
+        self._logger = LOGGER
+        self.content = content
+
+    @classmethod
+    def from_module_element(
+        cls, module_element: ModuleElement
+    ) -> "RenderedModuleElement":
+        if not module_element.validate():
+            raise ValueError(f"The validation of {repr(module_element)} failed")
+
+        return RenderedModuleElement(
+            name=module_element.name,
+            path=module_element.path,
+            ordering_key=module_element.ordering_key,
+            imports=module_element.get_imports(),
+            content=str(module_element),
+        )
+
+    def _ordering_key(self) -> str:
+        raise NotImplementedError("The ordering key is always forced")
+
+    def _get_derived_imports(self) -> typing.Set[str]:
+        return set()
+
+    def __str__(self) -> str:
+        return self.content
+
+
+@contextlib.contextmanager
+def record_module_elements(
+    module_builder: InmantaModuleBuilder,
+) -> typing.Iterator[typing.List[ModuleElement]]:
+    """
+    Record the module elements added to the module builder in this context, in the
+    order they are added.  The elements which were already in the builder, or which are
+    taken from a cache without being added again, are not part of the record.
+    """
+    recorded: typing.List[ModuleElement] = []
+    patched = "add_module_element" in vars(module_builder)
+    add_module_element = module_builder.add_module_element
+
+    def record(module_element: ModuleElement) -> None:
+        add_module_element(module_element)
+        recorded.append(module_element)
+
+    module_builder.add_module_element = record  # type: ignore
+    try:
+        yield recorded
+    finally:
+        if patched:
+            # The builder was already recorded by an outer context
+            module_builder.add_module_element = add_module_element  # type: ignore
+        else:
+            del module_builder.add_module_element
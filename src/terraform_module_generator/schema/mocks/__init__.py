@@ -6,3 +6,5 @@
 from .attribute import AttributeMock  # noqa: F401
 from .block import BlockMock  # noqa: F401
 from .nested_block import NestedBlockMock  # noqa: F401
+from .provider_schema import ProviderSchemaMock  # noqa: F401
+from .schema import SchemaMock  # noqa: F401
@@ -5,8 +5,10 @@
 """
 from dataclasses import dataclass
 
+from .base import DATACLASS_OPTIONS
 
-@dataclass()
+
+@dataclass(**DATACLASS_OPTIONS)
 class AttributeMock:
     """
     Mock object for https://github.com/inmanta/inmanta-tfplugin/blob
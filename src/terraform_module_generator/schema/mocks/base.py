@@ -0,0 +1,13 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import sys
+import typing
+
+# The mocks are built for each attribute and nested block of the schemas which are
+# not received from a provider, we don't give them a dict when it is supported.
+DATACLASS_OPTIONS: typing.Dict[str, typing.Any] = (
+    {"slots": True} if sys.version_info >= (3, 10) else {}
+)
@@ -6,21 +6,28 @@
 import typing
 from dataclasses import dataclass
 
+from .base import DATACLASS_OPTIONS
+
 if typing.TYPE_CHECKING:
+    from terraform_module_generator.schema.attributes.base import Attribute
+
     from .attribute import AttributeMock
     from .nested_block import NestedBlockMock
 
 
-@dataclass()
+@dataclass(**DATACLASS_OPTIONS)
 class BlockMock:
     """
     Mock object for https://github.com/inmanta/inmanta-tfplugin/blob
         /7269bc7d28d751b5dc110161dae29a6209c3fb63/docs/tf_grpc_plugin
         /proto/inmanta_tfplugin/tfplugin5.proto#L81
+
+    The attributes can also be attributes objects that have already been built,
+    in which case they are used as they are.
     """
 
     version: int
-    attributes: typing.List["AttributeMock"]
+    attributes: typing.List[typing.Union["AttributeMock", "Attribute"]]
     block_types: typing.List["NestedBlockMock"]
     description: str
     description_kind: str
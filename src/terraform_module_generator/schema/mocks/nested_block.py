@@ -6,11 +6,13 @@
 import typing
 from dataclasses import dataclass
 
+from .base import DATACLASS_OPTIONS
+
 if typing.TYPE_CHECKING:
     from .block import BlockMock
 
 
-@dataclass()
+@dataclass(**DATACLASS_OPTIONS)
 class NestedBlockMock:
     """
     Mock object for https://github.com/inmanta/inmanta-tfplugin/blob
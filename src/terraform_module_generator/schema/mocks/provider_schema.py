@@ -0,0 +1,26 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import typing
+from dataclasses import dataclass
+
+from .base import DATACLASS_OPTIONS
+
+if typing.TYPE_CHECKING:
+    from .schema import SchemaMock
+
+
+@dataclass(**DATACLASS_OPTIONS)
+class ProviderSchemaMock:
+    """
+    Mock object for the GetProviderSchema.Response message defined in
+        https://github.com/inmanta/inmanta-tfplugin/blob
+        /7269bc7d28d751b5dc110161dae29a6209c3fb63/docs/tf_grpc_plugin
+        /proto/inmanta_tfplugin/tfplugin5.proto
+    """
+
+    provider: "SchemaMock"
+    resource_schemas: typing.Mapping[str, "SchemaMock"]
+    data_source_schemas: typing.Mapping[str, "SchemaMock"]
@@ -3,11 +3,18 @@
     :contact: code@inmanta.com
     :license: Inmanta EULA
 """
-from typing import Any
+import concurrent.futures
+import fnmatch
+import typing
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from inmanta_module_factory import builder, inmanta
+from inmanta_module_factory.inmanta.module_element import ModuleElement
 
-from terraform_module_generator.schema import const
+from terraform_module_generator import tracing
+from terraform_module_generator.schema import const, mocks
+from terraform_module_generator.schema.blocks import SharedNestedBlocks
+from terraform_module_generator.schema.helpers import parallel
 from terraform_module_generator.schema.helpers.cache import cache_method_result
 
 from .data_source import DataSource
@@ -17,34 +24,137 @@ from .resource import Resource
 
 class Module:
     def __init__(
-        self, name: str, schema: Any, namespace: str, type: str, version: str
+        self,
+        name: str,
+        schema: Any,
+        namespace: str,
+        type: str,
+        version: str,
+        share_nested_blocks: bool = False,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+        plugin_config: bool = False,
     ) -> None:
+        """
+        :param share_nested_blocks: When set, all the nested blocks with the same
+            structure are represented by a single entity, in the shared sub-module.
+        :param include: If set, only the resources and data sources whose name matches
+            one of those glob patterns are part of the module.
+        :param exclude: The resources and data sources whose name matches one of those
+            glob patterns are not part of the module.
+        :param plugin_config: When set, the config block of each entity is serialized
+            by a single call to a plugin of the module, using a field table built with
+            the module, instead of a dict expression evaluated by the compiler.
+        """
         self.name = name
+        self.namespace = namespace
+        self.type = type
+        self.version = version
+        self.provider_schema = schema.provider
         self.provider = Provider(
             "provider", [name], schema.provider, namespace, type, version
         )
-        self.resources = [
-            Resource(key, [name, "resources"], s, self.provider)
-            for key, s in schema.resource_schemas.items()
-        ]
-        self.data_sources = [
-            DataSource(key, [name, "data_sources"], d, self.provider)
-            for key, d in schema.data_source_schemas.items()
-        ]
+        self.plugin_config = plugin_config
+        if plugin_config:
+            self.provider.block.use_plugin_config()
+
+        self.shared_nested_blocks: Optional[SharedNestedBlocks] = None
+        if share_nested_blocks:
+            self.shared_nested_blocks = SharedNestedBlocks([name, "shared"])
+            self.shared_nested_blocks.share(self.provider.block)
+
+        self.resource_schemas: typing.Mapping[str, Any] = filter_schemas(
+            schema.resource_schemas, include, exclude
+        )
+        self.data_source_schemas: typing.Mapping[str, Any] = filter_schemas(
+            schema.data_source_schemas, include, exclude
+        )
+        self._resources: Optional[List[Resource]] = None
+        self._data_sources: Optional[List[DataSource]] = None
+
+    @property
+    def is_parsed(self) -> bool:
+        """
+        Whether the resources were already parsed, in this process.
+        """
+        return self._resources is not None
+
+    @property
+    def resources(self) -> List[Resource]:
+        """
+        The resources are only parsed when they are accessed for the first time, so
+        that they can be parsed in other processes when the module is built in parallel.
+        """
+        if self._resources is None:
+            with tracing.span("parse resources"):
+                self._resources = [
+                    self.build_resource(key) for key in self.resource_schemas
+                ]
+            if self.shared_nested_blocks is not None:
+                for resource in self._resources:
+                    self.shared_nested_blocks.share(resource.block)
+
+        return self._resources
+
+    def build_resource(self, name: str) -> Resource:
+        """
+        Parse the schema of a single resource.
+        """
+        resource_schema = self.resource_schemas[name]
+        if resource_schema is None:
+            raise RuntimeError(
+                f"The schema of the resource {name} has been released, it can not be "
+                "parsed anymore"
+            )
+
+        with tracing.span(name, "parse"):
+            resource = Resource(
+                name, [self.name, "resources"], resource_schema, self.provider
+            )
+        if self.plugin_config:
+            resource.block.use_plugin_config()
+        return resource
+
+    @property
+    def data_sources(self) -> List[DataSource]:
+        if self._data_sources is None:
+            self._data_sources = [
+                DataSource(key, [self.name, "data_sources"], d, self.provider)
+                for key, d in self.data_source_schemas.items()
+            ]
+            if self.plugin_config:
+                for data_source in self._data_sources:
+                    data_source.block.use_plugin_config()
+            if self.shared_nested_blocks is not None:
+                for data_source in self._data_sources:
+                    self.shared_nested_blocks.share(data_source.block)
+
+        return self._data_sources
+
+    def release_schemas(self) -> None:
+        """
+        Parse all the resources and data sources, then drop all the references to the
+        provider schema, only the parsed tree is kept.  The module can then only be
+        built from the parsed tree, serially, the resources can not be parsed one by one
+        anymore.
+        """
+        self.resources
+        self.data_sources
+        self.provider_schema = None
+        self.resource_schemas = dict.fromkeys(self.resource_schemas.keys())
+        self.data_source_schemas = dict.fromkeys(self.data_source_schemas.keys())
 
     @cache_method_result
     def get_base_entity(
         self, module_builder: builder.InmantaModuleBuilder
     ) -> inmanta.Entity:
-        entity = const.BASE_ENTITY
-        relation = const.BASE_ENTITY_CONFIG_BLOCK_RELATION
-
-        # We don't simply replace the path as it is reused in other objects
-        entity.path.clear()
-        entity.path.append(self.name)
+        base_entities = const.get_base_entities(module_builder, self.name)
+        entity = base_entities.base_entity
 
         module_builder.add_module_element(entity)
-        module_builder.add_module_element(relation)
+        module_builder.add_module_element(
+            base_entities.base_entity_config_block_relation
+        )
 
         return entity
 
@@ -52,22 +162,214 @@ class Module:
     def get_base_resource(
         self, module_builder: builder.InmantaModuleBuilder
     ) -> inmanta.Entity:
-        entity = const.BASE_RESOURCE_ENTITY
-        relation = const.BASE_RESOURCE_ENTITY_TERRAFORM_RESOURCE_RELATION
-
-        # We don't simply replace the path as it is reused in other objects
-        entity.path.clear()
-        entity.path.append(self.name)
+        base_entities = const.get_base_entities(module_builder, self.name)
+        entity = base_entities.base_resource_entity
 
         module_builder.add_module_element(entity)
-        module_builder.add_module_element(relation)
+        module_builder.add_module_element(
+            base_entities.base_resource_entity_terraform_resource_relation
+        )
 
         return entity
 
-    def build(self, module_builder: builder.InmantaModuleBuilder) -> None:
+    def build_base(self, module_builder: builder.InmantaModuleBuilder) -> None:
+        """
+        Add to the module builder all the elements which don't belong to any resource:
+        the base entities and the provider.
+        """
         self.get_base_entity(module_builder)
         self.get_base_resource(module_builder)
 
         self.provider.add_to_module(module_builder)
-        for resource in self.resources:
+        if self.plugin_config:
+            # The resources add it as well when they use it, we add it here so that it
+            # is part of the module whichever resources are built
+            const.get_config_attributes_plugin(module_builder, self.name)
+
+        if self.resource_schemas:
+            # This is part of the provider, but it is only emitted by the resources.  We
+            # emit it here so that it doesn't depend on which resources are built, the
+            # workers building the resources will emit it as well but we will drop it
+            # when merging their output into the module.
+            self.provider.get_resource_relation(module_builder)
+
+    def add_resource(
+        self, name: str, module_builder: builder.InmantaModuleBuilder
+    ) -> List[ModuleElement]:
+        """
+        Parse a single resource and add it to the module builder.  Return the elements
+        it added to the resources sub-module, all the other ones are placed in the own
+        sub-module of the resource.
+        """
+        resource = self.build_resource(name)
+        with tracing.span(name, "build"), parallel.record_module_elements(
+            module_builder
+        ) as module_elements:
             resource.add_to_module(module_builder)
+        return [
+            module_element
+            for module_element in module_elements
+            if module_element.path == [self.name, "resources"]
+        ]
+
+    def build(
+        self,
+        module_builder: builder.InmantaModuleBuilder,
+        workers: int = 1,
+        release_schemas: bool = False,
+    ) -> None:
+        """
+        Add all the elements of this module to the module builder.  If workers are
+        requested, the resources are parsed and converted in parallel, by a pool of
+        worker processes.  The output is the same as if they had been converted one by
+        one.
+
+        :param module_builder: The builder the module elements should be added to.
+        :param workers: The amount of worker processes to use to build the resources,
+            0 to pick it based on the amount of resources.  By default, the resources
+            are built in this process.
+        :param release_schemas: When the resources are parsed in this process, release
+            the provider schema once they are parsed, before converting them.
+        """
+        if workers == 0:
+            workers = parallel.get_worker_count(len(self.resource_schemas))
+
+        if release_schemas and workers <= 1:
+            self.release_schemas()
+
+        with parallel.record_module_elements(module_builder) as base_elements:
+            self.build_base(module_builder)
+
+        if workers <= 1 or self.is_parsed:
+            for resource in self.resources:
+                with tracing.span(resource.name, "build"):
+                    resource.add_to_module(module_builder)
+            return
+
+        shards = parallel.split_in_shards(
+            list(self.resource_schemas.items()),
+            workers * parallel.SHARDS_PER_WORKER,
+        )
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    build_traced_resources if tracing.is_tracing() else build_resources,
+                    self.name,
+                    self.provider_schema,
+                    shard,
+                    self.namespace,
+                    self.type,
+                    self.version,
+                    self.shared_nested_blocks is not None,
+                    self.plugin_config,
+                )
+                for shard in shards
+            ]
+
+            # The shared nested blocks can be emitted by the provider and by any of the
+            # workers, we only keep one of each of them
+            shared_elements = {
+                (module_element.path_string, str(module_element))
+                for module_element in base_elements
+                if module_element.path[:2] == [self.name, "shared"]
+            }
+
+            # We merge the shards in order, so that the elements are added to the
+            # module builder in the same order as if the module was built serially
+            for future in futures:
+                if tracing.is_tracing():
+                    module_elements, events = future.result()
+                    tracing.add_events(events)
+                else:
+                    module_elements = future.result()
+
+                for module_element in module_elements:
+                    if module_element.path[:2] == [self.name, "shared"]:
+                        key = (module_element.path_string, str(module_element))
+                        if key in shared_elements:
+                            continue
+                        shared_elements.add(key)
+
+                    module_builder.add_module_element(module_element)
+
+
+def filter_schemas(
+    schemas: typing.Mapping[str, Any],
+    include: Optional[Sequence[str]] = None,
+    exclude: Optional[Sequence[str]] = None,
+) -> typing.Mapping[str, Any]:
+    """
+    Select the schemas whose name matches any of the include patterns, and none of the
+    exclude patterns.  Only the selected schemas are accessed, so that the other ones
+    are never loaded if the mapping loads them lazily.
+    """
+    if not include and not exclude:
+        return schemas
+
+    selected: Dict[str, Any] = dict()
+    for name in schemas.keys():
+        if include and not any(fnmatch.fnmatchcase(name, p) for p in include):
+            continue
+
+        if exclude and any(fnmatch.fnmatchcase(name, p) for p in exclude):
+            continue
+
+        selected[name] = schemas[name]
+
+    return selected
+
+
+def build_resources(
+    name: str,
+    provider_schema: Any,
+    resource_schemas: List[Tuple[str, Any]],
+    namespace: str,
+    type: str,
+    version: str,
+    share_nested_blocks: bool = False,
+    plugin_config: bool = False,
+) -> List[parallel.RenderedModuleElement]:
+    """
+    Build a module containing only the provided resources, and return all the elements
+    that were emitted for them, already rendered.  The elements that are shared by all
+    the resources (the base entities and the provider) are not returned, the shared
+    nested blocks are, as any of them might only be used by those resources.
+    """
+    module = Module(
+        name=name,
+        schema=mocks.ProviderSchemaMock(
+            provider=provider_schema,
+            resource_schemas=dict(resource_schemas),
+            data_source_schemas=dict(),
+        ),
+        namespace=namespace,
+        type=type,
+        version=version,
+        share_nested_blocks=share_nested_blocks,
+        plugin_config=plugin_config,
+    )
+    module_builder = builder.InmantaModuleBuilder(inmanta.Module(name))
+    with parallel.record_module_elements(module_builder) as module_elements:
+        module.build(module_builder, workers=1)
+
+    return [
+        parallel.RenderedModuleElement.from_module_element(module_element)
+        for module_element in module_elements
+        if module_element.path[:2] in ([name, "resources"], [name, "shared"])
+    ]
+
+
+def build_traced_resources(
+    *args: Any,
+) -> Tuple[List[parallel.RenderedModuleElement], List[tracing.TraceEvent]]:
+    """
+    Same as build_resources, but also return the trace events recorded while building
+    the resources.
+    """
+    tracing.start_tracing()
+    try:
+        module_elements = build_resources(*args)
+    finally:
+        events = tracing.stop_tracing()
+
+    return module_elements, events
@@ -71,11 +71,13 @@ class Provider(Schema):
                 name="",
                 path=self.block.get_entity(module_builder).path,
                 cardinality=(0, None),
-                entity=const.TERRAFORM_PROVIDER_ENTITY,
             ),
             entity=self.block.get_entity(module_builder),
             description="This is a relation to the provider entity from the terraform module.  For internal usage.",
         )
+        # The relation is unidirectional, it should not be attached to the entity of
+        # the terraform module, which is shared by all the module builders
+        relation.peer.attach_entity(const.TERRAFORM_PROVIDER_ENTITY)
         module_builder.add_module_element(relation)
         return relation
 
@@ -83,6 +85,9 @@ class Provider(Schema):
     def get_resource_relation(
         self, module_builder: builder.InmantaModuleBuilder
     ) -> inmanta.EntityRelation:
+        base_resource_entity = const.get_base_entities(
+            module_builder, self.path[0]
+        ).base_resource_entity
         relation = inmanta.EntityRelation(
             name="_resources",
             path=self.block.get_entity(module_builder).path,
@@ -91,9 +96,9 @@ class Provider(Schema):
             description="This is a relation to all the resources in this module deployed using this provider.",
             peer=inmanta.EntityRelation(
                 name="_provider",
-                path=const.BASE_RESOURCE_ENTITY.path,
+                path=base_resource_entity.path,
                 cardinality=(1, 1),
-                entity=const.BASE_RESOURCE_ENTITY,
+                entity=base_resource_entity,
                 description=(
                     "This is the a relation to the provider entity defined in this module "
                     "that should be used to deploy this resource."
@@ -126,7 +131,7 @@ class Provider(Schema):
                 type="{self.type}",
                 version="{self.provider_version}",
                 alias=self.{self.get_provider_alias_attribute(module_builder).name},
-                root_config=self.{const.BASE_ENTITY_CONFIG_BLOCK_RELATION.name},
+                root_config=self.{const.BASE_ENTITY_CONFIG_BLOCK_RELATION_NAME},
                 auto_agent=self.{self.get_provider_auto_agent_attribute(module_builder).name},
                 manual_config=false,
             )
@@ -31,7 +31,8 @@ class Resource(Schema):
 
         # The parents attribute of the entity is a sequence, we are not supposed to update
         # it.  We do it anyway because going around it would be too complicated.
-        entity.parents.append(const.BASE_RESOURCE_ENTITY)  # type: ignore
+        base_entities = const.get_base_entities(module_builder, self.path[0])
+        entity.parents.append(base_entities.base_resource_entity)  # type: ignore
         return entity
 
     @cache_method_result
@@ -41,7 +42,11 @@ class Resource(Schema):
         index = inmanta.Index(
             path=self.get_entity(module_builder).path,
             entity=self.get_entity(module_builder),
-            fields=[const.BASE_RESOURCE_ENTITY_INMANTA_ID],
+            fields=[
+                const.get_base_entities(
+                    module_builder, self.path[0]
+                ).base_resource_entity_inmanta_id
+            ],
             description="This index ensure that each resource is unique",
         )
         module_builder.add_module_element(index)
@@ -52,11 +57,11 @@ class Resource(Schema):
         self, module_builder: builder.InmantaModuleBuilder
     ) -> inmanta.Implementation:
         implementation_body = f"""
-            self.{const.BASE_RESOURCE_ENTITY_TERRAFORM_RESOURCE_RELATION.name} = terraform::Resource(
+            self.{const.BASE_RESOURCE_ENTITY_TERRAFORM_RESOURCE_RELATION_NAME} = terraform::Resource(
                 type="{self.name}",
-                name=self.{const.BASE_RESOURCE_ENTITY_INMANTA_ID.name},
-                terraform_id=self.{const.BASE_RESOURCE_ENTITY_IMPORT_ID.name},
-                root_config=self.{const.BASE_ENTITY_CONFIG_BLOCK_RELATION.name},
+                name=self.{const.BASE_RESOURCE_ENTITY_INMANTA_ID_NAME},
+                terraform_id=self.{const.BASE_RESOURCE_ENTITY_IMPORT_ID_NAME},
+                root_config=self.{const.BASE_ENTITY_CONFIG_BLOCK_RELATION_NAME},
                 manual_config=false,
                 provider=self.{self.provider.get_resource_relation(module_builder).peer.name}.{self.provider.get_terraform_provider_relation(module_builder).name},
                 purged=self.purged,
@@ -0,0 +1,251 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import logging
+import os
+import struct
+import tempfile
+import typing
+from pathlib import Path
+
+import msgpack
+
+from terraform_module_generator.schema import mocks
+
+LOGGER = logging.getLogger(__name__)
+
+# The version of the format of the cache files, it must be bumped whenever the way the
+# schemas are dumped changes, so that the files written by older versions are ignored
+CACHE_FORMAT_VERSION = 1
+
+# Every cache file starts with this magic value, followed by the size of the
+# index (big endian unsigned long long), the index itself and then the body.
+CACHE_FILE_MAGIC = b"TFGSCH%02d" % CACHE_FORMAT_VERSION
+CACHE_FILE_HEADER = struct.Struct(">8sQ")
+
+
+def dump_attribute(attribute: typing.Any) -> list:
+    return [
+        attribute.name,
+        attribute.type,
+        attribute.description,
+        attribute.required,
+        attribute.optional,
+        attribute.computed,
+        attribute.sensitive,
+        attribute.description_kind,
+        attribute.deprecated,
+    ]
+
+
+def load_attribute(raw: list) -> mocks.AttributeMock:
+    return mocks.AttributeMock(*raw)
+
+
+def dump_block(block: typing.Any) -> list:
+    return [
+        block.version,
+        [dump_attribute(attribute) for attribute in block.attributes],
+        [dump_nested_block(nested_block) for nested_block in block.block_types],
+        block.description,
+        block.description_kind,
+        block.deprecated,
+    ]
+
+
+def load_block(raw: list) -> mocks.BlockMock:
+    version, attributes, block_types, description, description_kind, deprecated = raw
+    return mocks.BlockMock(
+        version=version,
+        attributes=[load_attribute(attribute) for attribute in attributes],
+        block_types=[load_nested_block(nested_block) for nested_block in block_types],
+        description=description,
+        description_kind=description_kind,
+        deprecated=deprecated,
+    )
+
+
+def dump_nested_block(nested_block: typing.Any) -> list:
+    return [
+        nested_block.type_name,
+        dump_block(nested_block.block),
+        nested_block.nesting,
+        nested_block.min_items,
+        nested_block.max_items,
+    ]
+
+
+def load_nested_block(raw: list) -> mocks.NestedBlockMock:
+    type_name, block, nesting, min_items, max_items = raw
+    return mocks.NestedBlockMock(
+        type_name=type_name,
+        block=load_block(block),
+        nesting=nesting,
+        min_items=min_items,
+        max_items=max_items,
+    )
+
+
+def dump_schema(schema: typing.Any) -> bytes:
+    return msgpack.packb([schema.version, dump_block(schema.block)], use_bin_type=True)
+
+
+def load_schema(raw: bytes) -> mocks.SchemaMock:
+    version, block = msgpack.unpackb(raw, raw=False)
+    return mocks.SchemaMock(version=version, block=load_block(block))
+
+
+class CachedSchemas(typing.Mapping[str, mocks.SchemaMock]):
+    """
+    Read-only mapping of schemas stored in a cache file.  Only the index is kept
+    in memory, each schema is read from the file and decoded when it is accessed.
+    """
+
+    # The average size of an attribute in the encoded schemas, measured on synthetic
+    # providers
+    ATTRIBUTE_SIZE = 110
+
+    def __init__(
+        self, path: Path, body_offset: int, index: typing.Dict[str, typing.List[int]]
+    ) -> None:
+        self.path = path
+        self.body_offset = body_offset
+        self.index = index
+
+    def get_size(self, key: str) -> int:
+        """
+        Get the size of the encoded schema, without reading it.
+        """
+        return self.index[key][1]
+
+    def __getitem__(self, key: str) -> mocks.SchemaMock:
+        offset, length = self.index[key]
+        with open(self.path, "rb") as f:
+            f.seek(self.body_offset + offset)
+            return load_schema(f.read(length))
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+def load_cache_file(path: Path) -> mocks.ProviderSchemaMock:
+    """
+    Load the provider schema stored in the given cache file.  Only the provider schema
+    and the index are read, the resource and data source schemas are read lazily.
+    """
+    with open(path, "rb") as f:
+        magic, index_length = CACHE_FILE_HEADER.unpack(f.read(CACHE_FILE_HEADER.size))
+        if magic != CACHE_FILE_MAGIC:
+            raise ValueError(f"Unexpected magic value: {magic!r}")
+
+        index = msgpack.unpackb(f.read(index_length), raw=False)
+        body_offset = CACHE_FILE_HEADER.size + index_length
+
+        provider_offset, provider_length = index["provider"]
+        f.seek(body_offset + provider_offset)
+        provider = load_schema(f.read(provider_length))
+
+    return mocks.ProviderSchemaMock(
+        provider=provider,
+        resource_schemas=CachedSchemas(path, body_offset, index["resource_schemas"]),
+        data_source_schemas=CachedSchemas(
+            path, body_offset, index["data_source_schemas"]
+        ),
+    )
+
+
+def dump_cache_file(path: Path, schema: typing.Any) -> None:
+    """
+    Store the provider schema in the given cache file.  The schema can be the object
+    received from the provider or any object with the same attributes.
+    """
+    body: typing.List[bytes] = []
+    body_length = 0
+
+    def append(schema: typing.Any) -> typing.List[int]:
+        nonlocal body_length
+        raw = dump_schema(schema)
+        body.append(raw)
+        body_length += len(raw)
+        return [body_length - len(raw), len(raw)]
+
+    index = {
+        "provider": append(schema.provider),
+        "resource_schemas": {
+            key: append(value) for key, value in schema.resource_schemas.items()
+        },
+        "data_source_schemas": {
+            key: append(value) for key, value in schema.data_source_schemas.items()
+        },
+    }
+    raw_index = msgpack.packb(index, use_bin_type=True)
+
+    # Write to a temporary file first, so that concurrent readers never
+    # see a partially written cache file.
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent))
+    with os.fdopen(fd, "wb") as f:
+        f.write(CACHE_FILE_HEADER.pack(CACHE_FILE_MAGIC, len(raw_index)))
+        f.write(raw_index)
+        for raw in body:
+            f.write(raw)
+
+    os.replace(tmp_path, path)
+
+
+class SchemaCache:
+    """
+    A persistent cache for provider schemas.  Each schema is stored in its own file,
+    named after the provider namespace, type and version and the version of the cache
+    format.  The file contains an index of the offset of each resource and data
+    source schema, so that they can be loaded lazily, one at a time.
+    """
+
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = Path(cache_dir, "schemas")
+
+    def path(self, namespace: str, type: str, version: str) -> Path:
+        return self.cache_dir / (
+            f"{namespace}-{type}-{version}-v{CACHE_FORMAT_VERSION}.msgpack"
+        )
+
+    def get(
+        self, namespace: str, type: str, version: str
+    ) -> typing.Optional[mocks.ProviderSchemaMock]:
+        """
+        Load the schema of the given provider from the cache, returns None if it is
+        not there, or if the cache file can not be read.
+        """
+        path = self.path(namespace, type, version)
+        if not path.is_file():
+            return None
+
+        try:
+            provider_schema = load_cache_file(path)
+        except (
+            OSError,
+            ValueError,
+            KeyError,
+            struct.error,
+            msgpack.UnpackException,
+        ) as e:
+            LOGGER.warning(f"Ignoring invalid schema cache file at {path}: {e}")
+            return None
+
+        LOGGER.debug(f"Loaded schema of {namespace}/{type} {version} from {path}")
+        return provider_schema
+
+    def put(self, namespace: str, type: str, version: str, schema: typing.Any) -> Path:
+        """
+        Store the schema of the given provider in the cache.  The schema can be the
+        object received from the provider or any object with the same attributes.
+        """
+        path = self.path(namespace, type, version)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        dump_cache_file(path, schema)
+        LOGGER.debug(f"Stored schema of {namespace}/{type} {version} in {path}")
+        return path
@@ -0,0 +1,382 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import json
+import logging
+import re
+import typing
+
+from terraform_module_generator.schema import mocks
+
+LOGGER = logging.getLogger(__name__)
+
+# The values of the nesting modes of the nested blocks, in the provider schema
+NESTING_MODES = {"single": 1, "list": 2, "set": 3, "map": 4, "group": 5}
+
+# The values of the description kinds, in the provider schema
+DESCRIPTION_KINDS = {"plain": 0, "markdown": 1}
+
+# The size of the chunks in which schema dumps are read
+CHUNK_SIZE = 1024**2
+
+NON_WHITESPACE = re.compile(rb"[^ \t\n\r]")
+SCALAR_END = re.compile(rb"[ \t\n\r,\]}]")
+STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+
+# The tokens which matter to find the end of an object or array: the strings, which
+# can contain brackets, and the brackets.  A string whose end is not in the buffer yet
+# only matches its opening quote.
+CONTAINER_TOKENS = re.compile(
+    rb'("[^"\\]*(?:\\.[^"\\]*)*")|(")|([\[{])|([\]}])', re.DOTALL
+)
+STRING_TOKEN, PARTIAL_STRING_TOKEN, OPENING_TOKEN, CLOSING_TOKEN = range(1, 5)
+
+
+def load_nested_type(raw: dict) -> typing.Any:
+    """
+    Convert the nested type of an attribute (attributes of providers using the protocol
+    version 6) into the equivalent cty type.
+    """
+    object_type = [
+        "object",
+        {name: load_attribute_type(value) for name, value in raw["attributes"].items()},
+    ]
+    nesting_mode = raw.get("nesting_mode", "single")
+    if nesting_mode in ["single", "group"]:
+        return object_type
+
+    return [nesting_mode, object_type]
+
+
+def load_attribute_type(raw: dict) -> typing.Any:
+    if "nested_type" in raw:
+        return load_nested_type(raw["nested_type"])
+
+    return raw["type"]
+
+
+def load_attribute(name: str, raw: dict) -> mocks.AttributeMock:
+    return mocks.AttributeMock(
+        name=name,
+        # Same compact form as the types received from the providers
+        type=json.dumps(load_attribute_type(raw), separators=(",", ":")).encode(),
+        description=raw.get("description", ""),
+        required=raw.get("required", False),
+        optional=raw.get("optional", False),
+        computed=raw.get("computed", False),
+        sensitive=raw.get("sensitive", False),
+        description_kind=DESCRIPTION_KINDS[raw.get("description_kind", "plain")],
+        deprecated=raw.get("deprecated", False),
+    )
+
+
+def load_block(raw: dict, version: int = 0) -> mocks.BlockMock:
+    return mocks.BlockMock(
+        version=version,
+        attributes=[
+            load_attribute(name, attribute)
+            for name, attribute in raw.get("attributes", {}).items()
+        ],
+        block_types=[
+            load_nested_block(name, nested_block)
+            for name, nested_block in raw.get("block_types", {}).items()
+        ],
+        description=raw.get("description", ""),
+        description_kind=DESCRIPTION_KINDS[raw.get("description_kind", "plain")],
+        deprecated=raw.get("deprecated", False),
+    )
+
+
+def load_nested_block(name: str, raw: dict) -> mocks.NestedBlockMock:
+    return mocks.NestedBlockMock(
+        type_name=name,
+        block=load_block(raw["block"]),
+        nesting=NESTING_MODES[raw["nesting_mode"]],
+        min_items=raw.get("min_items", 0),
+        max_items=raw.get("max_items", 0),
+    )
+
+
+def load_schema(raw: dict) -> mocks.SchemaMock:
+    version = raw.get("version", 0)
+    return mocks.SchemaMock(version=version, block=load_block(raw["block"], version))
+
+
+def matches_provider(key: str, namespace: str, type: str) -> bool:
+    """
+    Check whether the key of a provider in a schema dump designates the given provider.
+    The keys are the source addresses of the providers (i.e. registry.terraform.io/
+    hashicorp/local), the namespace and type are compared case insensitively, as
+    terraform does.
+    """
+    source = f"{namespace}/{type}".lower()
+    return key.lower() == source or key.lower().endswith(f"/{source}")
+
+
+def provider_not_found(
+    keys: typing.Iterable[str], namespace: str, type: str
+) -> ValueError:
+    return ValueError(
+        f"The schema dump doesn't contain the provider {namespace}/{type}, it contains: "
+        f"{', '.join(sorted(keys)) or 'nothing'}"
+    )
+
+
+class JsonScanner:
+    """
+    Scan a json document from a binary file, without loading it in memory.  Only the
+    part of the document which wasn't consumed yet is kept in the buffer, and the values
+    which are skipped are never decoded.  The values which are read are decoded with
+    the json module.
+    """
+
+    def __init__(self, file: typing.BinaryIO, chunk_size: int = CHUNK_SIZE) -> None:
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = b""
+        self.buffer_offset = 0
+        self.index = 0
+        # When set, the index in the buffer of a value being read, which should be kept
+        self.mark: typing.Optional[int] = None
+
+    @property
+    def position(self) -> int:
+        """
+        The offset in the file of the next byte to consume.
+        """
+        return self.buffer_offset + self.index
+
+    def fill(self) -> None:
+        """
+        Read the next chunk of the file, dropping the part of the buffer which was
+        consumed.  Raise a ValueError if the end of the file is reached.
+        """
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            raise ValueError(f"Unexpected end of the json document at {self.position}")
+
+        drop = self.index if self.mark is None else self.mark
+        self.buffer = self.buffer[drop:] + chunk
+        self.buffer_offset += drop
+        self.index -= drop
+        if self.mark is not None:
+            self.mark = 0
+
+    def search(self, pattern: typing.Pattern[bytes]) -> typing.Match[bytes]:
+        """
+        Move to the next match of the pattern, reading the file as long as needed.  The
+        patterns only match a single byte.
+        """
+        while True:
+            match = pattern.search(self.buffer, self.index)
+            if match is not None:
+                self.index = match.start()
+                return match
+
+            self.index = len(self.buffer)
+            self.fill()
+
+    def peek(self) -> int:
+        """
+        Skip the whitespaces, and return the next byte, without consuming it.
+        """
+        self.search(NON_WHITESPACE)
+        return self.buffer[self.index]
+
+    def expect(self, char: bytes) -> None:
+        if self.peek() != char[0]:
+            raise ValueError(
+                f"Expected {char.decode()} at {self.position} in the json document"
+            )
+        self.index += 1
+
+    def skip_string(self) -> None:
+        if self.peek() != ord('"'):
+            raise ValueError(
+                f"Expected a string at {self.position} in the json document"
+            )
+
+        while True:
+            match = STRING.match(self.buffer, self.index)
+            if match is not None:
+                self.index = match.end()
+                return
+
+            # The end of the string is not in the buffer yet
+            self.fill()
+
+    def skip_value(self) -> typing.Tuple[int, int]:
+        """
+        Skip the next value, and return its offset and length in the file.
+        """
+        char = self.peek()
+        start = self.position
+        if char == ord('"'):
+            self.skip_string()
+        elif char in b"[{":
+            self.skip_container()
+        else:
+            # A number, true, false or null
+            self.search(SCALAR_END)
+
+        return start, self.position - start
+
+    def skip_container(self) -> None:
+        depth = 0
+        while True:
+            for match in CONTAINER_TOKENS.finditer(self.buffer, self.index):
+                token = match.lastindex
+                if token == STRING_TOKEN:
+                    continue
+
+                if token == PARTIAL_STRING_TOKEN:
+                    # The end of the string is not in the buffer yet
+                    self.index = match.start()
+                    break
+
+                depth += 1 if token == OPENING_TOKEN else -1
+                if depth == 0:
+                    self.index = match.end()
+                    return
+            else:
+                self.index = len(self.buffer)
+
+            self.fill()
+
+    def read_value(self) -> typing.Any:
+        """
+        Read and decode the next value.
+        """
+        self.peek()
+        self.mark = self.index
+        try:
+            self.skip_value()
+            return json.loads(self.buffer[self.mark : self.index])
+        finally:
+            self.mark = None
+
+    def iter_object(self) -> typing.Iterator[str]:
+        """
+        Iterate over the keys of the next object.  After receiving a key, the caller
+        should consume its value before getting the next key.
+        """
+        self.expect(b"{")
+        if self.peek() == ord("}"):
+            self.index += 1
+            return
+
+        while True:
+            if self.peek() != ord('"'):
+                raise ValueError(
+                    f"Expected a key at {self.position} in the json document"
+                )
+            key = self.read_value()
+            self.expect(b":")
+            yield key
+
+            char = self.peek()
+            self.index += 1
+            if char == ord("}"):
+                return
+            if char != ord(","):
+                raise ValueError(
+                    f"Expected , or }} at {self.position - 1} in the json document"
+                )
+
+
+class DumpedSchemas(typing.Mapping[str, mocks.SchemaMock]):
+    """
+    Read-only mapping of the schemas in a schema dump.  Only the offset and length of
+    each schema is kept in memory, each schema is read from the file and decoded when
+    it is accessed.
+    """
+
+    # The average size of an attribute in the json schemas, measured on synthetic
+    # providers
+    ATTRIBUTE_SIZE = 200
+
+    def __init__(
+        self, path: str, index: typing.Dict[str, typing.Tuple[int, int]]
+    ) -> None:
+        self.path = path
+        self.index = index
+
+    def get_size(self, key: str) -> int:
+        """
+        Get the size of the json schema, without reading it.
+        """
+        return self.index[key][1]
+
+    def __getitem__(self, key: str) -> mocks.SchemaMock:
+        offset, length = self.index[key]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return load_schema(json.loads(f.read(length)))
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+
+def index_schemas(scanner: JsonScanner) -> typing.Dict[str, typing.Tuple[int, int]]:
+    return {key: scanner.skip_value() for key in scanner.iter_object()}
+
+
+def load_schema_file(
+    schema_file: str, namespace: str, type: str, chunk_size: int = CHUNK_SIZE
+) -> mocks.ProviderSchemaMock:
+    """
+    Load the schema of the given provider from a file containing the output of
+    `terraform providers schema -json`.  The provider doesn't need to be downloaded
+    nor executed.
+
+    The file is scanned once, without being loaded in memory, to find the schema of
+    each resource and data source of the provider.  They are then read from the file
+    one at a time, when they are accessed.
+    """
+    LOGGER.info(f"Loading the schema of {namespace}/{type} from {schema_file}")
+    provider: typing.Optional[mocks.SchemaMock] = None
+    resource_schemas: typing.Dict[str, typing.Tuple[int, int]] = dict()
+    data_source_schemas: typing.Dict[str, typing.Tuple[int, int]] = dict()
+    providers: typing.List[str] = []
+    with open(schema_file, "rb") as f:
+        scanner = JsonScanner(f, chunk_size)
+        for key in scanner.iter_object():
+            if key != "provider_schemas":
+                scanner.skip_value()
+                continue
+
+            for provider_key in scanner.iter_object():
+                providers.append(provider_key)
+                if not matches_provider(provider_key, namespace, type):
+                    scanner.skip_value()
+                    continue
+
+                provider = load_schema({"block": {}})
+                for schema_key in scanner.iter_object():
+                    if schema_key == "provider":
+                        provider = load_schema(scanner.read_value())
+                    elif schema_key == "resource_schemas":
+                        resource_schemas = index_schemas(scanner)
+                    elif schema_key == "data_source_schemas":
+                        data_source_schemas = index_schemas(scanner)
+                    else:
+                        scanner.skip_value()
+
+                # The rest of the document is not needed
+                break
+
+            break
+
+    if provider is None:
+        raise provider_not_found(providers, namespace, type)
+
+    return mocks.ProviderSchemaMock(
+        provider=provider,
+        resource_schemas=DumpedSchemas(schema_file, resource_schemas),
+        data_source_schemas=DumpedSchemas(schema_file, data_source_schemas),
+    )
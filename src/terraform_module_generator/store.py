@@ -0,0 +1,302 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import typing
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import click
+
+from terraform_module_generator.streaming import parse_memory_size
+
+LOGGER = logging.getLogger(__name__)
+
+# The temporary files older than this are left over by an interrupted process, and can
+# be removed by the garbage collection
+STALE_TMP_AGE = 24 * 3600
+
+
+@dataclass()
+class StoredProvider:
+    """
+    The blobs a provider is made of in the store.
+
+    :attr archive: The digest of the archive downloaded from the registry.
+    :attr binary: The digest of the binary extracted from the archive.
+    :attr binary_name: The name of the binary, it should be installed under this name.
+    """
+
+    archive: str
+    binary: str
+    binary_name: str
+
+
+class ProviderStore:
+    """
+    A content-addressed store of the provider archives and binaries.  Each file is
+    stored once, in a blob named after its sha256 digest, whatever the amount of
+    providers and cache dirs using it.  The binaries are installed as hard links to
+    their blob.  The store can be bounded in size, the least recently used blobs are
+    then evicted when it grows above it.
+
+    The store can be used by several processes at the same time, all the files are
+    written atomically.
+    """
+
+    def __init__(self, store_dir: str, max_size: typing.Optional[int] = None) -> None:
+        self.store_dir = Path(store_dir)
+        self.max_size = max_size
+
+    @property
+    def blobs_dir(self) -> Path:
+        return self.store_dir / "blobs"
+
+    @property
+    def refs_dir(self) -> Path:
+        return self.store_dir / "refs"
+
+    @property
+    def tmp_dir(self) -> Path:
+        tmp_dir = self.store_dir / "tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        return tmp_dir
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blobs_dir / digest[:2] / digest
+
+    def ref_path(self, namespace: str, type: str, version: str) -> Path:
+        # Terraform ignores the case of the namespace and the type
+        return self.refs_dir / namespace.lower() / type.lower() / f"{version}.json"
+
+    def put(self, path: Path, move: bool = False) -> str:
+        """
+        Add the file to the store, and return its digest.  If move is set, the file is
+        moved into the store, it should be on the same filesystem.
+        """
+        sha256_hash = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024**2), b""):
+                sha256_hash.update(chunk)
+        digest = sha256_hash.hexdigest()
+
+        blob_path = self.blob_path(digest)
+        if blob_path.is_file():
+            os.utime(blob_path)
+            if move:
+                path.unlink()
+            return digest
+
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        if move:
+            os.replace(path, blob_path)
+        else:
+            fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+            os.close(fd)
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, blob_path)
+
+        LOGGER.debug(f"Stored {path.name} as {digest}")
+        return digest
+
+    def link(self, digest: str, target: Path) -> bool:
+        """
+        Install the blob at the target path, as a hard link, or as a copy if the target
+        is on another filesystem.  Return False if the blob is not in the store.
+        """
+        blob_path = self.blob_path(digest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if target.exists() and os.path.samefile(blob_path, target):
+                os.utime(blob_path)
+                return True
+
+            tmp_path = target.with_name(f".{target.name}.{os.getpid()}")
+            try:
+                os.link(blob_path, tmp_path)
+            except OSError as e:
+                if not blob_path.is_file():
+                    raise FileNotFoundError(blob_path) from e
+                shutil.copy2(blob_path, tmp_path)
+            os.replace(tmp_path, target)
+            os.utime(blob_path)
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    def get(
+        self, namespace: str, type: str, version: str
+    ) -> typing.Optional[StoredProvider]:
+        ref_path = self.ref_path(namespace, type, version)
+        try:
+            return StoredProvider(**json.loads(ref_path.read_text()))
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError) as e:
+            LOGGER.warning(f"Ignoring invalid provider store ref at {ref_path}: {e}")
+            return None
+
+    def set(
+        self, namespace: str, type: str, version: str, provider: StoredProvider
+    ) -> None:
+        ref_path = self.ref_path(namespace, type, version)
+        ref_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        with os.fdopen(fd, "w") as f:
+            json.dump(asdict(provider), f)
+        os.replace(tmp_path, ref_path)
+
+    def install(
+        self, namespace: str, type: str, version: str, install_dir: str
+    ) -> typing.Optional[str]:
+        """
+        Install the binary of the provider in the install dir, and return its path,
+        or None if it is not in the store.
+        """
+        provider = self.get(namespace, type, version)
+        if provider is None:
+            return None
+
+        binary_path = Path(install_dir, provider.binary_name)
+        if not self.link(provider.binary, binary_path):
+            return None
+
+        LOGGER.debug(f"Installed {namespace}/{type} {version} from the provider store")
+        return str(binary_path)
+
+    def blobs(self) -> typing.List[typing.Tuple[float, int, Path]]:
+        """
+        Get the last use time, the size and the path of all the blobs, the least
+        recently used first.
+        """
+        blobs = []
+        for blob_path in self.blobs_dir.glob("*/*"):
+            try:
+                stat = blob_path.stat()
+            except FileNotFoundError:
+                continue
+            blobs.append((stat.st_mtime, stat.st_size, blob_path))
+        return sorted(blobs)
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.blobs())
+
+    def evict(
+        self,
+        max_size: typing.Optional[int] = None,
+        keep: typing.Collection[str] = (),
+    ) -> int:
+        """
+        Remove the least recently used blobs until the store fits in the max size,
+        the store max size if none is given.  The blobs in keep are never removed.
+        Return the amount of bytes freed on disk: the blobs which are still installed
+        somewhere, as hard links, leave the store but their data is kept for the links.
+        """
+        max_size = max_size if max_size is not None else self.max_size
+        if max_size is None:
+            return 0
+
+        blobs = self.blobs()
+        size = sum(size for _, size, _ in blobs)
+        removed = 0
+        freed = 0
+        for _, blob_size, blob_path in blobs:
+            if size - removed <= max_size:
+                break
+            if blob_path.name in keep:
+                continue
+            try:
+                links = blob_path.stat().st_nlink
+                blob_path.unlink()
+            except FileNotFoundError:
+                # Evicted by another process in the meantime
+                links = 0
+            removed += blob_size
+            if links == 1:
+                freed += blob_size
+
+        if freed:
+            LOGGER.info(f"Evicted {freed // 1024**2}MiB from the provider store")
+        return freed
+
+    def gc(self, max_size: typing.Optional[int] = None) -> int:
+        """
+        Evict the least recently used blobs, then remove the refs whose binary was
+        evicted and the temporary files left over by interrupted processes.  Return the
+        amount of bytes freed.
+        """
+        freed = self.evict(max_size)
+
+        for ref_path in self.refs_dir.glob("*/*/*.json"):
+            namespace, type = ref_path.parent.parent.name, ref_path.parent.name
+            provider = self.get(namespace, type, ref_path.stem)
+            if provider is None or not self.blob_path(provider.binary).is_file():
+                ref_path.unlink(missing_ok=True)
+
+        # The temporary dirs are left over by the interrupted installs
+        for tmp_path in self.tmp_dir.iterdir():
+            try:
+                if tmp_path.stat().st_mtime >= time.time() - STALE_TMP_AGE:
+                    continue
+                if tmp_path.is_dir():
+                    freed += sum(
+                        path.stat().st_size
+                        for path in tmp_path.rglob("*")
+                        if path.is_file()
+                    )
+                    shutil.rmtree(tmp_path)
+                else:
+                    freed += tmp_path.stat().st_size
+                    tmp_path.unlink()
+            except FileNotFoundError:
+                # Removed by another process in the meantime
+                continue
+
+        return freed
+
+
+@click.group()
+def main() -> None:
+    """
+    Manage a provider store.
+    """
+
+
+@main.command()
+@click.option(
+    "--store-dir",
+    help="The directory of the provider store.",
+    required=True,
+)
+@click.option(
+    "--max-size",
+    help=(
+        "Evict the least recently used providers until the store is smaller than this size (i.e. 2G, 512M).  "
+        "If not set, only the incomplete providers and the leftover temporary files are removed."
+    ),
+    required=False,
+)
+def gc(store_dir: str, max_size: typing.Optional[str]) -> None:
+    """
+    Remove from the store the least recently used providers, and everything which is
+    not used anymore.
+    """
+    store = ProviderStore(store_dir)
+    freed = store.gc(parse_memory_size(max_size) if max_size is not None else None)
+    click.echo(
+        f"Freed {freed // 1024**2}MiB, the store now takes "
+        f"{store.size() // 1024**2}MiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
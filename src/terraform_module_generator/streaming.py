@@ -0,0 +1,235 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import collections
+import concurrent.futures
+import logging
+import re
+import typing
+from dataclasses import dataclass
+from pathlib import Path
+
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.helpers.utils import inmanta_safe_name
+from inmanta_module_factory.inmanta import DummyModuleElement, EntityRelation
+from inmanta_module_factory.inmanta.module_element import ModuleElement
+
+from terraform_module_generator import inmanta_module_tests, report, schema, tracing
+from terraform_module_generator.schema.helpers import cache
+from terraform_module_generator.schema.helpers.parallel import RenderedModuleElement
+from terraform_module_generator.schema_cache import CachedSchemas
+from terraform_module_generator.schema_json import DumpedSchemas
+
+LOGGER = logging.getLogger(__name__)
+
+# The amount of threads writing the files of the resources
+IO_WORKERS = 4
+
+# The amount of resources whose files can be waiting to be written, once reached,
+# the next resource is only built when the files of the oldest one are written
+MAX_PENDING_WRITES = 2 * IO_WORKERS
+
+# An approximation of the memory used to convert an attribute of the provider schema
+# when the whole module is kept in memory, measured on synthetic providers.
+ESTIMATED_MEMORY_PER_ATTRIBUTE = 16 * 1024
+
+MEMORY_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+MEMORY_SIZE_REGEX = re.compile(r"^\s*(\d+)\s*([KMGT]?)i?B?\s*$", re.IGNORECASE)
+
+
+def parse_memory_size(value: str) -> int:
+    """
+    Parse a memory size, in bytes, or with a binary unit suffix (i.e. 512M, 2GiB).
+    """
+    match = MEMORY_SIZE_REGEX.match(value)
+    if match is None:
+        raise ValueError(f"Invalid memory size: {value}")
+
+    return int(match.group(1)) * MEMORY_SIZE_UNITS[match.group(2).upper()]
+
+
+def count_attributes(block: typing.Any) -> int:
+    return len(block.attributes) + sum(
+        count_attributes(nested_block.block) for nested_block in block.block_types
+    )
+
+
+def estimate_memory(terraform_module: schema.Module) -> int:
+    """
+    Estimate the memory required to build the resources of the module without
+    streaming them.  The schemas read lazily from a file are not loaded, the amount of
+    attributes is estimated from their size in the index of the file.
+    """
+    resource_schemas = terraform_module.resource_schemas
+    if isinstance(resource_schemas, (CachedSchemas, DumpedSchemas)):
+        size = sum(resource_schemas.get_size(key) for key in resource_schemas)
+        return ESTIMATED_MEMORY_PER_ATTRIBUTE * size // resource_schemas.ATTRIBUTE_SIZE
+
+    return ESTIMATED_MEMORY_PER_ATTRIBUTE * sum(
+        count_attributes(resource_schema.block)
+        for resource_schema in resource_schemas.values()
+    )
+
+
+def release_module_element_loggers(
+    model_files: typing.Mapping[str, typing.Iterable[ModuleElement]]
+) -> None:
+    """
+    Each module element registers its own logger, named after its repr, which the
+    logging module keeps forever.  Drop the loggers of the elements of the model files,
+    and of the peers of their relations, the elements which are still referenced keep a
+    reference to their own logger.  Any other logger is left untouched.
+    """
+    logger_dict = logging.Logger.manager.loggerDict
+    for module_elements in model_files.values():
+        for module_element in module_elements:
+            elements = [module_element]
+            if isinstance(module_element, EntityRelation):
+                elements.append(module_element._peer)
+            for element in elements:
+                logger = getattr(element, "_logger", None)
+                if logger is not None and logger_dict.get(logger.name) is logger:
+                    del logger_dict[logger.name]
+
+
+def write_model_files(
+    module_builder: InmantaModuleBuilder,
+    model_dir: Path,
+    copyright_header_tmpl: typing.Optional[str] = None,
+) -> None:
+    with tracing.span("write model files", "write", model_dir=str(model_dir)):
+        for file_key in list(module_builder._model_files.keys()):
+            module_builder.generate_model_file(
+                model_dir,
+                file_key,
+                force=True,
+                copyright_header_template=copyright_header_tmpl,
+            )
+
+
+def write_targets_model_files(
+    module_builder: InmantaModuleBuilder,
+    targets: typing.Sequence[typing.Tuple[Path, typing.Optional[str]]],
+) -> None:
+    for model_dir, copyright_header_tmpl in targets:
+        write_model_files(module_builder, model_dir, copyright_header_tmpl)
+
+
+@dataclass()
+class StreamTarget:
+    """
+    A module the resources are streamed to.
+
+    :attr module_builder: The module builder the elements of the resources sub-module
+        should be added to.
+    :attr model_dir: The model dir the files of each resource should be written to.
+    :attr copyright_header_tmpl: The copyright header to use in those files.
+    """
+
+    module_builder: InmantaModuleBuilder
+    model_dir: Path
+    copyright_header_tmpl: typing.Optional[str] = None
+
+
+def build_module(
+    terraform_module: schema.Module,
+    module_builder: InmantaModuleBuilder,
+    model_dir: Path,
+    copyright_header_tmpl: typing.Optional[str] = None,
+) -> None:
+    """
+    Build the resources of the module one at a time, and write the files of each of
+    them in the model dir as soon as it is built.  Each resource is built in its own
+    module builder, which is dropped, along with the resource and all the cached results
+    of its blocks, once its files are written.  Only the elements the resources add to
+    the resources sub-module are rendered and kept in the main module builder.
+
+    The base elements of the module should already have been added to the main module
+    builder, and the model dir should exist.  The main module builder still needs to be
+    written once all the resources are built.
+    """
+    build_modules(
+        terraform_module,
+        [StreamTarget(module_builder, model_dir, copyright_header_tmpl)],
+    )
+
+
+def build_modules(
+    terraform_module: schema.Module,
+    targets: typing.Sequence[StreamTarget],
+    generation_report: typing.Optional[report.GenerationReport] = None,
+    sub_modules: typing.Optional[typing.Dict[str, int]] = None,
+) -> None:
+    """
+    Same as build_module, but each resource is written to all the targets, it is only
+    built once.  The base elements should have been added to the module builder of each
+    target, the resources reuse the ones of the first target.  If a report is given,
+    the elements of each resource are added to it before they are released.  If
+    sub-modules are given, the sub-modules written for each resource are added to them.
+    """
+    if terraform_module.shared_nested_blocks is not None:
+        raise ValueError(
+            "The resources can not be streamed when sharing the nested blocks"
+        )
+
+    module_builder = targets[0].module_builder
+    resources_file = "::".join([terraform_module.name, "resources"])
+    pending_writes: typing.Deque[concurrent.futures.Future] = collections.deque()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=IO_WORKERS) as executor:
+        for name in terraform_module.resource_schemas.keys():
+            resource_builder = InmantaModuleBuilder(
+                module_builder._module,
+                generation=module_builder.generation,
+            )
+            # The base elements, already in the main module builder, should not be
+            # added again to the module builder of the resource
+            cache.inherit_cache(resource_builder, module_builder)
+            for module_element in terraform_module.add_resource(name, resource_builder):
+                rendered_element = RenderedModuleElement.from_module_element(
+                    module_element
+                )
+                for target in targets:
+                    target.module_builder.add_module_element(rendered_element)
+
+            model_files = resource_builder._model_files
+            if generation_report is not None:
+                generation_report.add_model_files(model_files, [name])
+            release_module_element_loggers(model_files)
+            model_files.pop(resources_file, None)
+
+            # Same as the module builder does, each parent of a file of the resource
+            # should exist
+            resource_file = "::".join([resources_file, inmanta_safe_name(name)])
+            for file_key in list(model_files.keys()):
+                parts = file_key.split("::")
+                for i in range(len(resource_file.split("::")) + 1, len(parts)):
+                    if "::".join(parts[:i]) not in model_files:
+                        model_files["::".join(parts[:i])] = [
+                            DummyModuleElement(parts[:i])
+                        ]
+
+            if sub_modules is not None:
+                inmanta_module_tests.add_submodules(sub_modules, model_files)
+
+            cache.release_cache(resource_builder)
+
+            while len(pending_writes) >= MAX_PENDING_WRITES:
+                pending_writes.popleft().result()
+
+            # The files of a resource are written to all the targets by the same thread,
+            # the module builder sorts its elements in place when writing them
+            pending_writes.append(
+                executor.submit(
+                    write_targets_model_files,
+                    resource_builder,
+                    [
+                        (target.model_dir, target.copyright_header_tmpl)
+                        for target in targets
+                    ],
+                )
+            )
+
+        while pending_writes:
+            pending_writes.popleft().result()
@@ -0,0 +1,282 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import json
+import logging
+import random
+import typing
+from dataclasses import dataclass, field, replace
+
+import click
+
+from terraform_module_generator.schema import mocks
+from terraform_module_generator.schema_cache import SchemaCache
+from terraform_module_generator.schema_json import NESTING_MODES
+
+LOGGER = logging.getLogger(__name__)
+
+PRIMITIVE_TYPES = ["string", "number", "bool"]
+
+# The kinds of cty types the attributes can have, the collections can only contain
+# primitives or structures
+TYPE_KINDS = ["primitive", "list", "set", "map", "object", "tuple", "set_of_objects"]
+
+
+@dataclass(frozen=True)
+class SchemaShape:
+    """
+    The shape of a synthetic provider schema.
+
+    :attr resources: The amount of resources of the provider.
+    :attr data_sources: The amount of data sources of the provider.
+    :attr attributes: The maximum amount of attributes of each block.
+    :attr fields: The maximum amount of fields of the structures (objects, tuples) in
+        the attributes types.
+    :attr nested_blocks: The maximum amount of nested blocks of each block.
+    :attr depth: The maximum depth of the nested blocks, 0 for none.
+    :attr type_depth: The maximum depth of the structures and collections in the
+        attributes types, 0 for primitives only.
+    :attr nesting_modes: The nesting modes the nested blocks can have.
+    :attr type_kinds: The kinds of types the attributes can have, a kind can be
+        repeated to make it more frequent.
+    """
+
+    resources: int = 100
+    data_sources: int = 10
+    attributes: int = 8
+    fields: int = 4
+    nested_blocks: int = 2
+    depth: int = 2
+    type_depth: int = 2
+    nesting_modes: typing.Tuple[str, ...] = tuple(NESTING_MODES.keys())
+    type_kinds: typing.Tuple[str, ...] = ("primitive",) * 4 + tuple(TYPE_KINDS[1:])
+
+    def __post_init__(self) -> None:
+        for name in ["resources", "data_sources", "depth", "type_depth"]:
+            if getattr(self, name) < 0:
+                raise ValueError(f"The {name} of a schema shape can not be negative")
+
+        for name in ["attributes", "fields", "nested_blocks"]:
+            if getattr(self, name) < 1:
+                raise ValueError(f"The {name} of a schema shape should be at least 1")
+
+        unknown = set(self.nesting_modes) - set(NESTING_MODES.keys())
+        unknown |= set(self.type_kinds) - set(TYPE_KINDS)
+        if unknown or not self.nesting_modes or not self.type_kinds:
+            raise ValueError(
+                f"Invalid nesting modes or type kinds: {sorted(unknown) or 'empty'}"
+            )
+
+
+# Shapes reproducing the providers which are the hardest to generate
+PRESETS: typing.Dict[str, SchemaShape] = {
+    # A lot of simple resources, like the big cloud providers
+    "large": SchemaShape(resources=1000, data_sources=200),
+    # Few resources, with many attributes of complex types
+    "wide": SchemaShape(resources=20, data_sources=2, attributes=64, type_depth=3),
+    # Deeply nested blocks, like the firewall and load balancer providers
+    "deep": SchemaShape(resources=20, data_sources=2, nested_blocks=3, depth=5),
+    # Collections of structures only, which are all converted to entities
+    "structures": SchemaShape(
+        resources=50,
+        data_sources=5,
+        type_depth=3,
+        type_kinds=("object", "tuple", "map", "set_of_objects"),
+    ),
+}
+
+
+@dataclass()
+class SchemaGenerator:
+    """
+    Generate provider schemas of a given shape.  The schemas are built with the mock
+    objects, which have the same attributes as the ones received from a provider.  The
+    same shape and seed always give the same schema.
+    """
+
+    shape: SchemaShape
+    seed: int = 0
+    rand: random.Random = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.rand = random.Random(self.seed)
+
+    def attribute_type(self, depth: int) -> typing.Any:
+        kind = self.rand.choice(self.shape.type_kinds)
+        if depth >= self.shape.type_depth or kind == "primitive":
+            return self.rand.choice(PRIMITIVE_TYPES)
+
+        if kind == "object":
+            return ["object", self.object_fields(depth + 1)]
+
+        if kind == "tuple":
+            return [
+                "tuple",
+                [
+                    self.attribute_type(depth + 1)
+                    for _ in range(self.rand.randint(1, self.shape.fields))
+                ],
+            ]
+
+        if kind == "set_of_objects":
+            return ["set", ["object", self.object_fields(depth + 2)]]
+
+        # The collections can not contain other collections
+        inner_type = self.attribute_type(depth + 1)
+        if isinstance(inner_type, list) and inner_type[0] in ["list", "set", "map"]:
+            inner_type = ["object", self.object_fields(depth + 2)]
+        return [kind, inner_type]
+
+    def object_fields(self, depth: int) -> typing.Dict[str, typing.Any]:
+        return {
+            f"field_{i}": self.attribute_type(depth)
+            for i in range(self.rand.randint(1, self.shape.fields))
+        }
+
+    def attribute(self, index: int) -> mocks.AttributeMock:
+        required = self.rand.random() < 0.2
+        return mocks.AttributeMock(
+            name=f"attribute_{index}",
+            type=json.dumps(self.attribute_type(0)).encode(),
+            description=f"The attribute {index} of the block.",
+            required=required,
+            optional=not required,
+            computed=not required and self.rand.random() < 0.2,
+            description_kind="plain",
+        )
+
+    def block(self, depth: int) -> mocks.BlockMock:
+        attributes = [
+            self.attribute(i)
+            for i in range(self.rand.randint(1, self.shape.attributes))
+        ]
+        block_types: typing.List[mocks.NestedBlockMock] = []
+        if depth < self.shape.depth:
+            block_types = [
+                self.nested_block(i, depth + 1)
+                for i in range(self.rand.randint(0, self.shape.nested_blocks))
+            ]
+
+        return mocks.BlockMock(
+            version=0,
+            attributes=attributes,
+            block_types=block_types,
+            description=f"A block at depth {depth}.",
+            description_kind="plain",
+        )
+
+    def nested_block(self, index: int, depth: int) -> mocks.NestedBlockMock:
+        nesting = NESTING_MODES[self.rand.choice(self.shape.nesting_modes)]
+        max_items = 1 if nesting == NESTING_MODES["single"] else 0
+        return mocks.NestedBlockMock(
+            type_name=f"nested_block_{index}",
+            block=self.block(depth),
+            nesting=nesting,
+            min_items=0,
+            max_items=self.rand.choice([0, max_items]),
+        )
+
+    def schema(self, depth: int = 0) -> mocks.SchemaMock:
+        return mocks.SchemaMock(version=0, block=self.block(depth))
+
+    def provider_schema(self, type: str = "synthetic") -> mocks.ProviderSchemaMock:
+        return mocks.ProviderSchemaMock(
+            provider=self.schema(self.shape.depth),
+            resource_schemas={
+                f"{type}_resource_{i}": self.schema()
+                for i in range(self.shape.resources)
+            },
+            data_source_schemas={
+                f"{type}_data_source_{i}": self.schema()
+                for i in range(self.shape.data_sources)
+            },
+        )
+
+
+def generate_schema(
+    shape: SchemaShape, seed: int = 0, type: str = "synthetic"
+) -> mocks.ProviderSchemaMock:
+    """
+    Generate the schema of a provider with the given shape.  The same shape and seed
+    always give the same schema.
+    """
+    return SchemaGenerator(shape, seed).provider_schema(type)
+
+
+@click.command()
+@click.option(
+    "--type",
+    help="The type of the synthetic provider, the prefix of its resources.",
+    default="synthetic",
+)
+@click.option(
+    "--version",
+    help="The version of the synthetic provider.",
+    default="1.0.0",
+)
+@click.option(
+    "--preset",
+    help="The shape to start from, the other options change it.",
+    type=click.Choice(list(PRESETS.keys())),
+    required=False,
+)
+@click.option("--resources", help="The amount of resources.", type=int)
+@click.option("--data-sources", help="The amount of data sources.", type=int)
+@click.option(
+    "--attributes", help="The maximum amount of attributes per block.", type=int
+)
+@click.option("--fields", help="The maximum amount of fields per structure.", type=int)
+@click.option(
+    "--nested-blocks", help="The maximum amount of nested blocks per block.", type=int
+)
+@click.option("--depth", help="The maximum depth of the nested blocks.", type=int)
+@click.option(
+    "--type-depth", help="The maximum depth of the attributes types.", type=int
+)
+@click.option(
+    "--nesting-mode",
+    "nesting_modes",
+    help="A nesting mode the nested blocks can have, can be repeated.",
+    type=click.Choice(list(NESTING_MODES.keys())),
+    multiple=True,
+)
+@click.option(
+    "--type-kind",
+    "type_kinds",
+    help="A kind of type the attributes can have, can be repeated.",
+    type=click.Choice(TYPE_KINDS),
+    multiple=True,
+)
+@click.option("--seed", help="The seed of the generation.", type=int, default=0)
+@click.option(
+    "--schema-cache-dir",
+    help="The schema cache directory the schema should be stored in, a module can then be generated from it.",
+    required=True,
+)
+def main(
+    type: str,
+    version: str,
+    preset: typing.Optional[str],
+    seed: int,
+    schema_cache_dir: str,
+    **options: typing.Any,
+) -> None:
+    """
+    Generate the schema of a synthetic provider, and store it in the schema cache, as
+    the schema of the provider synthetic/<type> <version>.  The module can then be
+    generated with the cli, using the same schema cache directory.
+    """
+    shape = replace(
+        PRESETS[preset] if preset is not None else SchemaShape(),
+        **{key: value for key, value in options.items() if value not in [None, ()]},
+    )
+    path = SchemaCache(schema_cache_dir).put(
+        "synthetic", type, version, generate_schema(shape, seed, type)
+    )
+    click.echo(f"Stored the schema of synthetic/{type} {version} at {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import typing
+from pathlib import Path
+
+LOGGER = logging.getLogger(__name__)
+
+TraceEvent = typing.Dict[str, typing.Any]
+
+# The events recorded since the tracing was started, None when it is not enabled
+_events: typing.Optional[typing.List[TraceEvent]] = None
+
+
+def start_tracing() -> None:
+    """
+    Start recording the duration of the spans, in this process.
+    """
+    global _events
+    _events = []
+
+
+def stop_tracing() -> typing.List[TraceEvent]:
+    """
+    Stop recording the spans, and return all the events recorded since the tracing was
+    started.
+    """
+    global _events
+    events, _events = _events or [], None
+    return events
+
+
+def is_tracing() -> bool:
+    return _events is not None
+
+
+def get_events() -> typing.List[TraceEvent]:
+    """
+    Get the events recorded so far, without stopping the tracing.
+    """
+    return list(_events or [])
+
+
+def add_events(events: typing.Iterable[TraceEvent]) -> None:
+    """
+    Add events recorded in another process (i.e. a worker building some resources) to
+    the ones recorded in this process.
+    """
+    if _events is not None:
+        _events.extend(events)
+
+
+@contextlib.contextmanager
+def span(name: str, category: str = "stage", **args: object) -> typing.Iterator[None]:
+    """
+    Record the wall time and the cpu time of the thread spent in the body of the span,
+    as a complete event of the chrome trace event format.  Does nothing when the
+    tracing is not enabled.
+    """
+    events = _events
+    if events is None:
+        yield
+        return
+
+    start = time.perf_counter_ns()
+    cpu_start = time.thread_time_ns()
+    try:
+        yield
+    finally:
+        events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (time.perf_counter_ns() - start) / 1000,
+                "tts": cpu_start / 1000,
+                "tdur": (time.thread_time_ns() - cpu_start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+
+def write_trace(path: str, events: typing.List[TraceEvent]) -> None:
+    """
+    Write the events in a file which can be loaded in chrome://tracing or Perfetto.
+    """
+    Path(path).write_text(
+        json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, indent=None)
+    )
+    LOGGER.info(f"Wrote {len(events)} trace events to {path}")
@@ -0,0 +1,316 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+
+    Offline benchmark of the generator.  The provider schemas are loaded from the
+    fixtures recorded in the fixtures directory, or generated, so that no provider has
+    to be downloaded nor executed.  Each phase of the generation is timed separately,
+    and the timings are compared to a stored baseline.
+"""
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+import typing
+from dataclasses import dataclass
+from pathlib import Path
+
+import click
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.inmanta.module import Module
+
+import terraform_module_generator
+from terraform_module_generator import cli, schema, synthetic
+from terraform_module_generator.inmanta_module_tests import (
+    add_submodules,
+    write_module_tests,
+)
+from terraform_module_generator.schema import mocks
+from terraform_module_generator.schema_cache import dump_cache_file, load_cache_file
+
+LOGGER = logging.getLogger(__name__)
+
+BENCHMARKS_DIR = Path(__file__).parent
+FIXTURES_DIR = BENCHMARKS_DIR / "fixtures"
+BASELINE_FILE = BENCHMARKS_DIR / "baseline.json"
+
+# The phases of the generation, in the order they are executed
+PHASES = ["parse", "build", "files", "tests"]
+
+# A phase is only reported as a regression if it is slower than the baseline by this
+# ratio, and by this amount of seconds, shorter phases are too noisy
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_DELTA = 0.05
+
+
+@dataclass()
+class RecordedProvider:
+    """
+    A provider whose schema was recorded in the fixtures directory.
+    """
+
+    namespace: str
+    type: str
+    version: str
+
+    @property
+    def fixture(self) -> Path:
+        return FIXTURES_DIR / f"{self.namespace}-{self.type}-{self.version}.msgpack"
+
+    def load(self) -> typing.Optional[mocks.ProviderSchemaMock]:
+        if not self.fixture.is_file():
+            return None
+
+        return load_cache_file(self.fixture)
+
+
+@dataclass()
+class SyntheticProvider:
+    """
+    A provider whose schema is generated, to measure the generator on providers larger
+    than the recorded ones.
+    """
+
+    type: str
+    shape: synthetic.SchemaShape
+    seed: int = 0
+
+    def load(self) -> typing.Optional[mocks.ProviderSchemaMock]:
+        return synthetic.generate_schema(self.shape, self.seed, self.type)
+
+
+PROVIDERS: typing.Dict[str, typing.Union[RecordedProvider, SyntheticProvider]] = {
+    "hashicorp/local": RecordedProvider("hashicorp", "local", "2.1.0"),
+    "kreuzwerker/docker": RecordedProvider("kreuzwerker", "docker", "2.22.0"),
+    "gitlabhq/gitlab": RecordedProvider("gitlabhq", "gitlab", "3.6.0"),
+    "synthetic/large": SyntheticProvider("synthetic", synthetic.PRESETS["large"]),
+    "synthetic/deep": SyntheticProvider("synthetic", synthetic.PRESETS["deep"]),
+}
+
+
+def create_module_skeleton(output_dir: Path, name: str) -> Path:
+    """
+    Create the minimal v1 module the generated files are written to, the module
+    template can not be fetched offline.
+    """
+    module_path = output_dir / name
+    (module_path / "model").mkdir(parents=True)
+    (module_path / "tests").mkdir()
+    (module_path / "module.yml").write_text(
+        f"name: {name}\nversion: 1.0.0\nlicense: Inmanta EULA\n"
+    )
+    (module_path / "tests/test_basics.py").write_text(
+        f'def test_basics(project):\n    project.compile("import {name}")\n'
+    )
+    return module_path
+
+
+def run_provider(provider_schema: typing.Any, name: str) -> typing.Dict[str, float]:
+    """
+    Generate the module of the provider once, and return the duration of each phase.
+    The resources are parsed before being built, the module is then built serially.
+    """
+    timings: typing.Dict[str, float] = dict()
+
+    start = time.perf_counter()
+    terraform_module = schema.Module(
+        name=name,
+        schema=provider_schema,
+        namespace="benchmark",
+        type=name,
+        version="1.0.0",
+    )
+    terraform_module.resources
+    terraform_module.data_sources
+    timings["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    module_builder = InmantaModuleBuilder(Module(name, "1.0.0"), generation="v1")
+    terraform_module.build(module_builder)
+    timings["build"] = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        module_path = create_module_skeleton(Path(output_dir), name)
+        for file_key in list(module_builder._model_files.keys()):
+            module_builder.generate_model_file(
+                module_path / "model", file_key, force=True
+            )
+        timings["files"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sub_modules: typing.Dict[str, int] = dict()
+        add_submodules(sub_modules, module_builder._model_files)
+        write_module_tests(module_builder, str(module_path), sub_modules)
+        timings["tests"] = time.perf_counter() - start
+
+    return timings
+
+
+def run_benchmarks(
+    providers: typing.Sequence[str], repeat: int = 3
+) -> typing.Dict[str, typing.Any]:
+    """
+    Run the benchmark of each provider, the best duration of each phase over all the
+    runs is kept.  The providers whose fixture hasn't been recorded are skipped.
+    """
+    results: typing.Dict[str, typing.Dict[str, typing.Any]] = dict()
+    for key in providers:
+        provider_schema = PROVIDERS[key].load()
+        if provider_schema is None:
+            LOGGER.warning(f"Skipping {key}, its schema hasn't been recorded")
+            continue
+
+        runs = [
+            run_provider(provider_schema, PROVIDERS[key].type) for _ in range(repeat)
+        ]
+        results[key] = {
+            "resources": len(provider_schema.resource_schemas),
+            **{phase: min(timings[phase] for timings in runs) for phase in PHASES},
+        }
+        LOGGER.info(
+            f"{key}: "
+            + ", ".join(f"{phase} {results[key][phase]:.3f}s" for phase in PHASES)
+        )
+
+    return {
+        "generator": terraform_module_generator.__version__,
+        "python": platform.python_version(),
+        "repeat": repeat,
+        "providers": results,
+    }
+
+
+def compare(
+    results: typing.Dict[str, typing.Any],
+    baseline: typing.Dict[str, typing.Any],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> typing.List[str]:
+    """
+    Compare the results to the baseline, and return a description of each phase which
+    got slower than the tolerance allows.
+    """
+    regressions: typing.List[str] = []
+    for key, timings in results["providers"].items():
+        baseline_timings = baseline["providers"].get(key)
+        if baseline_timings is None:
+            continue
+
+        for phase in PHASES:
+            current, previous = timings[phase], baseline_timings[phase]
+            if (
+                current > previous * (1 + tolerance)
+                and current - previous > MIN_REGRESSION_DELTA
+            ):
+                regressions.append(
+                    f"{key} {phase}: {current:.3f}s, baseline {previous:.3f}s "
+                    f"(+{(current / previous - 1) * 100:.0f}%)"
+                )
+
+    return regressions
+
+
+@click.group()
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    # The generated modules are never version controlled
+    logging.getLogger("inmanta.module").setLevel(logging.ERROR)
+
+
+@main.command()
+@click.option(
+    "--provider",
+    "providers",
+    help="The provider to benchmark, can be repeated.  Defaults to all of them.",
+    type=click.Choice(list(PROVIDERS.keys())),
+    multiple=True,
+)
+@click.option(
+    "--repeat",
+    help="The amount of times each module is generated, the best time is kept.",
+    type=int,
+    default=3,
+)
+@click.option(
+    "--output",
+    help="A file in which the results should be written, as json.",
+    required=False,
+)
+@click.option(
+    "--baseline",
+    help="The results to compare to.",
+    default=str(BASELINE_FILE),
+)
+@click.option(
+    "--tolerance",
+    help="The ratio a phase can be slower than the baseline without failing.",
+    type=float,
+    default=DEFAULT_TOLERANCE,
+)
+@click.option(
+    "--update-baseline",
+    help="Store the results as the new baseline instead of comparing them.",
+    is_flag=True,
+    default=False,
+)
+def run(
+    providers: typing.Tuple[str, ...],
+    repeat: int,
+    output: typing.Optional[str],
+    baseline: str,
+    tolerance: float,
+    update_baseline: bool,
+) -> None:
+    """
+    Run the benchmarks, and compare them to the baseline.
+    """
+    results = run_benchmarks(providers or list(PROVIDERS.keys()), repeat)
+    raw_results = json.dumps(results, indent=2, sort_keys=True) + "\n"
+    if output is not None:
+        Path(output).write_text(raw_results)
+    else:
+        click.echo(raw_results, nl=False)
+
+    if update_baseline:
+        Path(baseline).write_text(raw_results)
+        return
+
+    if not Path(baseline).is_file():
+        LOGGER.warning(f"No baseline at {baseline}, the results are not compared")
+        return
+
+    regressions = compare(results, json.loads(Path(baseline).read_text()), tolerance)
+    if regressions:
+        raise click.ClickException(
+            "Slower than the baseline:\n" + "\n".join(regressions)
+        )
+
+
+@main.command()
+@click.option("--namespace", required=True)
+@click.option("--type", required=True)
+@click.option("--version", required=True)
+@click.option(
+    "--working-dir",
+    help="A directory in which the provider binary should be downloaded and installed.",
+    default=tempfile.gettempdir(),
+)
+def record(namespace: str, type: str, version: str, working_dir: str) -> None:
+    """
+    Fetch the schema of a provider, and record it in the fixtures directory.
+    """
+    provider = RecordedProvider(namespace, type, version)
+    dump_cache_file(
+        provider.fixture,
+        cli.get_provider_schema(namespace, type, version, working_dir),
+    )
+    click.echo(
+        f"Recorded the schema of {namespace}/{type} {version} at {provider.fixture}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import pathlib
+
+from terraform_module_generator import batch
+
+
+def test_fetch_failure(tmp_path: pathlib.Path) -> None:
+    """
+    A provider which can not be fetched should make all its entries fail in the batch
+    summary, without stopping the other entries.
+    """
+    mirror = tmp_path / "mirror"
+    mirror.mkdir()
+    entries = [
+        batch.BatchEntry(
+            "hashicorp", "missing", "1.0.0", str(tmp_path / "v1"), v1=True
+        ),
+        batch.BatchEntry("hashicorp", "missing", "1.0.0", str(tmp_path / "v2")),
+        batch.BatchEntry(
+            "hashicorp",
+            "test",
+            "1.0.0",
+            str(tmp_path / "other"),
+            schema_file=str(tmp_path / "missing.json"),
+        ),
+    ]
+
+    results = batch.generate_batch(
+        entries, str(tmp_path / "cache"), jobs=1, provider_mirror=str(mirror)
+    )
+    assert [result.entry for result in results] == entries
+    assert not any(result.success for result in results)
+    for result in results[:2]:
+        assert result.error is not None
+        assert result.error.startswith("Stage fetch failed: ")
+        assert "can not be found in the mirror" in result.error
+
+    # The entry with a schema file is not fetched, it fails when it is generated
+    assert results[2].error is not None
+    assert "Stage" not in results[2].error
+    assert str(tmp_path / "missing.json") in results[2].error
@@ -0,0 +1,45 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+from benchmarks import benchmark
+
+
+def test_recorded_provider() -> None:
+    """
+    The recorded providers should be generated offline, each phase being timed.
+    """
+    results = benchmark.run_benchmarks(["hashicorp/local"], repeat=1)
+
+    timings = results["providers"]["hashicorp/local"]
+    assert timings["resources"] == 1
+    assert all(timings[phase] > 0 for phase in benchmark.PHASES)
+
+    # Comparing the results to themselves shouldn't report anything
+    assert benchmark.compare(results, results) == []
+
+
+def test_compare() -> None:
+    """
+    Only the phases slower than the baseline by more than the tolerance, and by a
+    significant amount of time, should be reported.
+    """
+    baseline = {
+        "providers": {
+            "test/a": {"parse": 1.0, "build": 2.0, "files": 0.01, "tests": 0.5},
+            "test/b": {"parse": 1.0, "build": 1.0, "files": 1.0, "tests": 1.0},
+        },
+    }
+    results = {
+        "providers": {
+            "test/a": {"parse": 1.2, "build": 3.0, "files": 0.03, "tests": 0.4},
+            "test/c": {"parse": 9.0, "build": 9.0, "files": 9.0, "tests": 9.0},
+        },
+    }
+
+    regressions = benchmark.compare(results, baseline, tolerance=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("test/a build: 3.000s, baseline 2.000s")
+
+    assert len(benchmark.compare(results, baseline, tolerance=0.1)) == 2
@@ -0,0 +1,131 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import gc
+import pathlib
+import typing
+
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.inmanta.module import Module
+from inmanta_tfplugin import tfplugin5_pb2
+
+from terraform_module_generator import schema
+from terraform_module_generator.schema.helpers import cache
+
+
+def provider_schema() -> tfplugin5_pb2.GetProviderSchema.Response:
+    response = tfplugin5_pb2.GetProviderSchema.Response()
+    response.provider.block.attributes.add(
+        name="token", type=b'"string"', optional=True
+    )
+    for i in range(3):
+        block = response.resource_schemas[f"test_resource_{i}"].block
+        block.attributes.add(name="name", type=b'"string"', required=True)
+        block.attributes.add(name="tags", type=b'["set","string"]', optional=True)
+        nested_block = block.block_types.add(type_name="timeouts", nesting=1)
+        nested_block.block.attributes.add(
+            name="create", type=b'"string"', optional=True
+        )
+
+    return response
+
+
+def render(
+    module: schema.Module, output_dir: pathlib.Path
+) -> typing.Tuple[InmantaModuleBuilder, typing.Dict[str, str]]:
+    module_builder = InmantaModuleBuilder(Module("test"))
+    module.build(module_builder, workers=1)
+
+    files = dict()
+    for file_key in list(module_builder._model_files.keys()):
+        file_path = module_builder.generate_model_file(output_dir, file_key, force=True)
+        assert file_path is not None
+        files[file_key] = file_path.read_text()
+
+    return module_builder, files
+
+
+def test_several_builders(tmp_path: pathlib.Path) -> None:
+    """
+    The same parsed module can be built in several module builders, each of them should
+    get the complete module, and nothing from the other builds.
+    """
+    module = schema.Module(
+        name="test",
+        schema=provider_schema(),
+        namespace="test",
+        type="test",
+        version="1.0.0",
+    )
+
+    cache.reset_cache_info()
+    first_builder, first = render(module, tmp_path / "first")
+    info = cache.get_cache_info()["Block.get_entity"]
+    assert info.misses == 7  # The provider, three resources and their timeouts
+    assert info.hits > 0
+
+    _, second = render(module, tmp_path / "second")
+    assert cache.get_cache_info()["Block.get_entity"].misses == 14
+    assert first == second
+
+    # Building it again in the first builder doesn't add anything to it
+    elements = sum(len(elements) for elements in first_builder._model_files.values())
+    module.build(first_builder, workers=1)
+    assert elements == sum(
+        len(elements) for elements in first_builder._model_files.values()
+    )
+
+    # Once released, the module can be built again in the same builder
+    cache.release_cache(first_builder)
+    module.build(first_builder, workers=1)
+    assert cache.get_cache_info()["Block.get_entity"].misses == 21
+
+    # The cached results are dropped with the module builder
+    del first_builder
+    gc.collect()
+    assert len(cache._builder_caches) <= 1
+
+
+def test_arguments() -> None:
+    """
+    The calls with different arguments should each get their own result, the
+    arguments which can not be hashed are compared by identity.
+    """
+    module = schema.Module(
+        name="test",
+        schema=provider_schema(),
+        namespace="test",
+        type="test",
+        version="1.0.0",
+    )
+    module_builder = InmantaModuleBuilder(Module("test"))
+    attribute = next(
+        attribute
+        for attribute in module.resources[0].block.attributes
+        if attribute.name == "tags"
+    )
+
+    first_imports: typing.Set[str] = set()
+    expression = attribute.get_serialized_attribute_expression(
+        "self", module_builder, first_imports
+    )
+    assert first_imports == {"terraform"}
+    assert expression == (
+        "self.tags is defined ? terraform::sorted_list(self.tags) : self.tags"
+    )
+
+    assert expression is attribute.get_serialized_attribute_expression(
+        "self", module_builder, first_imports
+    )
+
+    second_imports: typing.Set[str] = set()
+    assert expression == attribute.get_serialized_attribute_expression(
+        "self", module_builder, second_imports
+    )
+    assert second_imports == {"terraform"}
+
+    assert attribute.get_serialized_attribute_expression(
+        "parent", module_builder, second_imports
+    ).startswith("parent.tags is defined")
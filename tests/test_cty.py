@@ -0,0 +1,74 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import pytest
+
+from terraform_module_generator import module_cache, schema
+from terraform_module_generator.schema.helpers import cty
+from terraform_module_generator.schema.mocks import AttributeMock
+
+
+@pytest.mark.parametrize(
+    argnames="raw",
+    argvalues=[
+        b'["list",["object",{"name":"string","ports":["set","number"]}]]',
+        b'list(object({"name":string,"ports":set(number)}))',
+        b'["list", object({"name": "string", "ports": ["set", "number"]})]',
+        b'["list",["object",{"name":"string","ports":["set","number"]},["ports"]]]',
+    ],
+)
+def test_parse_type(raw: bytes) -> None:
+    """
+    The legacy json form and the function-like form of the types, and any mix of
+    them, should all be parsed to the same type.
+    """
+    cty_type = cty.parse_type(raw)
+    assert cty_type.kind == "list"
+    assert cty_type.element is not None
+    assert cty_type.element.kind == "object"
+    assert cty_type.element.attributes is not None
+    assert list(cty_type.element.attributes.keys()) == ["name", "ports"]
+    assert cty_type.element.attributes["name"].kind == "string"
+    assert cty_type.element.attributes["ports"].kind == "set"
+
+    # The same expression, or any of its sub-expressions, is only parsed once
+    assert cty.parse_type(raw) is cty_type
+    assert cty.parse_type(cty_type.element.raw) is cty_type.element
+
+    attribute = schema.Attribute.build_attribute(
+        ["test"], AttributeMock(name="rules", type=raw)
+    )
+    assert isinstance(attribute, schema.ListAttribute)
+    assert isinstance(attribute.inner_type, schema.ObjectAttribute)
+    assert [a.name for a in attribute.inner_type.inner_attributes] == ["name", "ports"]
+
+
+@pytest.mark.parametrize(
+    argnames="raw",
+    argvalues=[b'"dynamic"', b'["list"]', b"list(string", b'"string" "number"', b"foo"],
+)
+def test_unsupported_type(raw: bytes) -> None:
+    with pytest.raises(ValueError, match="Couldn't find a matching type"):
+        schema.Attribute.build_attribute(["test"], AttributeMock(name="a", type=raw))
+
+
+def test_type_caches() -> None:
+    """
+    The types should be dropped from the caches when a schema or a module is evicted
+    from the module cache, the types parsed before are not shared with the new ones.
+    """
+    raw = b'["map",["list","string"]]'
+    cty_type = cty.parse_type(raw)
+    assert cty.PARSED_TYPES.get(b'["list","string"]') is cty_type.element
+    assert cty.PARSED_TYPES.max_size == cty.MAX_CACHED_TYPES
+
+    modules = module_cache.ModuleCache(max_schemas=1)
+    modules.schemas.put(("a", "a", "1.0.0", None, 0, 0), None)
+    assert cty.parse_type(raw) is cty_type
+
+    modules.schemas.put(("b", "b", "1.0.0", None, 0, 0), None)
+    assert len(cty.PARSED_TYPES) == 0
+    assert cty.intern_type.cache_info().currsize == 0
+    assert cty.parse_type(raw) is not cty_type
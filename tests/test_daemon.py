@@ -0,0 +1,161 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import json
+import pathlib
+import threading
+import typing
+
+import pytest
+import yaml
+from click.testing import CliRunner
+
+from terraform_module_generator import cli, client, daemon, module_cache
+
+SCHEMA_DUMP = {
+    "format_version": "1.0",
+    "provider_schemas": {
+        "registry.terraform.io/hashicorp/test": {
+            "provider": {"version": 0, "block": {"description_kind": "plain"}},
+            "resource_schemas": {
+                "test_file": {
+                    "version": 0,
+                    "block": {
+                        "attributes": {
+                            "filename": {
+                                "type": "string",
+                                "description_kind": "plain",
+                                "required": True,
+                            },
+                        },
+                        "description_kind": "plain",
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+@pytest.fixture
+def daemon_server(tmp_path: pathlib.Path) -> typing.Iterator[daemon.DaemonServer]:
+    """
+    A daemon listening on a socket in the tmp dir, until it is stopped.
+    """
+    server = daemon.DaemonServer(
+        str(tmp_path / "daemon.sock"),
+        daemon.GeneratorDaemon(str(tmp_path / "cache")),
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+
+
+def test_module_cache(tmp_path: pathlib.Path) -> None:
+    """
+    The provider schema should only be loaded once, and the module only parsed once for
+    each set of options, as long as they are in the cache.
+    """
+    lru: module_cache.LRUCache[str, int] = module_cache.LRUCache(2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1
+    lru.put("c", 3)
+    assert lru.keys() == ["a", "c"]
+    assert lru.get("b") is None
+
+    schema_file = tmp_path / "schema.json"
+    schema_file.write_text(json.dumps(SCHEMA_DUMP))
+    modules = module_cache.ModuleCache()
+
+    def get_module(parsed: bool, plugin_config: bool = False) -> typing.Any:
+        return cli.get_terraform_module(
+            "hashicorp",
+            "test",
+            "1.0.0",
+            str(tmp_path),
+            plugin_config=plugin_config,
+            schema_file=str(schema_file),
+            module_cache=modules,
+            parsed=parsed,
+        )
+
+    terraform_module = get_module(parsed=True)
+    assert get_module(parsed=True) is terraform_module
+    assert get_module(parsed=True, plugin_config=True) is not terraform_module
+    assert get_module(parsed=False) is not terraform_module
+    assert (modules.schemas.info.hits, modules.schemas.info.misses) == (2, 1)
+    assert (modules.modules.info.hits, modules.modules.info.misses) == (1, 2)
+
+    # A schema file which changed is loaded again
+    schema_file.write_text(json.dumps(SCHEMA_DUMP, indent=2))
+    assert get_module(parsed=True) is not terraform_module
+    assert modules.schemas.info.misses == 2
+    assert modules.get_info()["modules"]["keys"] == ["hashicorp/test/1.0.0"] * 3
+
+
+def test_daemon(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    daemon_server: daemon.DaemonServer,
+) -> None:
+    """
+    The client should send the generation requests to the daemon, with their paths
+    relative to the directory of the client, and report the outcome of each of them.
+    """
+    monkeypatch.chdir(tmp_path)
+    runner = CliRunner()
+    socket_option = f"--socket={daemon_server.socket_path}"
+
+    manifest = tmp_path / "manifest.yaml"
+    manifest.write_text(
+        yaml.safe_dump(
+            [
+                {
+                    "namespace": "hashicorp",
+                    "type": "test",
+                    "version": "1.0.0",
+                    "output_dir": "modules",
+                    "schema-file": "missing.json",
+                }
+            ]
+        )
+    )
+    result = runner.invoke(
+        client.main,
+        [socket_option, "generate", "--summary-file=summary.json", str(manifest)],
+    )
+    assert result.exit_code == 1, result.output
+    assert "Failed to generate 1 out of 1 modules" in result.output
+    (summary,) = json.loads((tmp_path / "summary.json").read_text())
+    assert summary["entry"]["output_dir"] == str(tmp_path / "modules")
+    assert str(tmp_path / "missing.json") in summary["error"]
+
+    manifest.write_text(yaml.safe_dump([{"namespace": "hashicorp", "unknown": 1}]))
+    result = runner.invoke(client.main, [socket_option, "generate", str(manifest)])
+    assert result.exit_code == 1
+    assert "Invalid generation request" in result.output
+
+    result = runner.invoke(client.main, [socket_option, "status"])
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.output)["requests"] == 1
+
+    # A single daemon can listen on the socket
+    with pytest.raises(RuntimeError):
+        daemon.remove_stale_socket(daemon_server.socket_path)
+
+    result = runner.invoke(client.main, [socket_option, "stop"])
+    assert result.exit_code == 0, result.output
+    daemon_server.server_close()
+    assert not pathlib.Path(daemon_server.socket_path).exists()
+
+    result = runner.invoke(client.main, [socket_option, "status"])
+    assert result.exit_code == 1
+    assert "No daemon is listening" in result.output
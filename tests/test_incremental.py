@@ -0,0 +1,97 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import pathlib
+import typing
+
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.inmanta.module import Module
+from inmanta_tfplugin import tfplugin5_pb2
+
+from terraform_module_generator import incremental, schema
+
+
+def provider_schema(
+    resources: typing.List[str], changed: str = ""
+) -> tfplugin5_pb2.GetProviderSchema.Response:
+    response = tfplugin5_pb2.GetProviderSchema.Response()
+    response.provider.block.attributes.add(
+        name="token", type=b'"string"', optional=True
+    )
+    for name in resources:
+        block = response.resource_schemas[name].block
+        block.attributes.add(name="name", type=b'"string"', required=True)
+        if name == changed:
+            block.attributes.add(name="size", type=b'"number"', optional=True)
+        nested_block = block.block_types.add(type_name="timeouts", nesting=1)
+        nested_block.block.attributes.add(
+            name="create", type=b'"string"', optional=True
+        )
+
+    return response
+
+
+def generate(
+    response: tfplugin5_pb2.GetProviderSchema.Response,
+    module_path: pathlib.Path,
+    previous: typing.Optional[incremental.GenerationManifest] = None,
+) -> typing.Tuple[incremental.GenerationManifest, typing.Set[str]]:
+    terraform_module = schema.Module(
+        name="test",
+        schema=response,
+        namespace="test",
+        type="test",
+        version="1.0.0",
+    )
+    module_builder = InmantaModuleBuilder(Module("test"))
+    if previous is not None:
+        return incremental.regenerate_model(
+            module_path, terraform_module, module_builder, previous
+        )
+
+    resources, built = incremental.build_module(terraform_module, module_builder)
+    incremental.write_model_files(module_builder, module_path / "model")
+    manifest = incremental.GenerationManifest(
+        module="test", options="", resources=resources
+    )
+    return manifest, built
+
+
+def read_model(module_path: pathlib.Path) -> typing.Dict[str, str]:
+    return {
+        str(file.relative_to(module_path)): file.read_text()
+        for file in sorted(module_path.glob("model/**/*.cf"))
+    }
+
+
+def test_incremental_generation(tmp_path: pathlib.Path) -> None:
+    """
+    Generating a module again, in place, should only touch the files of the resources
+    which changed, and give the same result as generating it from scratch.
+    """
+    module_path = tmp_path / "incremental"
+    manifest, built = generate(
+        provider_schema(["test_a", "test_b", "test_c"]), module_path
+    )
+    assert built == {"test_a", "test_b", "test_c"}
+
+    manifest.save(module_path)
+    manifest = incremental.GenerationManifest.load(module_path)
+    assert manifest is not None
+
+    unchanged_file = module_path / "model/resources/test_a/_init.cf"
+    unchanged_mtime = unchanged_file.stat().st_mtime_ns
+
+    response = provider_schema(["test_a", "test_b", "test_d"], changed="test_b")
+    manifest, changed = generate(response, module_path, manifest)
+    assert changed == {"test_b", "test_c", "test_d"}
+    assert unchanged_file.stat().st_mtime_ns == unchanged_mtime
+    assert not (module_path / "model/resources/test_c").exists()
+
+    generate(response, tmp_path / "full")
+    regenerated = read_model(module_path)
+    full = read_model(tmp_path / "full")
+    assert regenerated == full
+    assert "size" in regenerated["model/resources/_init.cf"]
@@ -0,0 +1,145 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import gc
+import sys
+import tracemalloc
+import typing
+
+import pytest
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.inmanta.module import Module
+from inmanta_tfplugin import tfplugin5_pb2
+
+from terraform_module_generator import schema
+from terraform_module_generator.schema.helpers import cty
+
+
+def provider_schema(resources: int) -> tfplugin5_pb2.GetProviderSchema.Response:
+    response = tfplugin5_pb2.GetProviderSchema.Response()
+    response.provider.block.attributes.add(
+        name="token", type=b'"string"', optional=True, description="The token."
+    )
+    for i in range(resources):
+        block = response.resource_schemas[f"test_resource_{i}"].block
+        block.description = f"Resource {i}"
+        block.attributes.add(
+            name="name",
+            type=b'"string"',
+            required=True,
+            description="The name of the resource.",
+        )
+        block.attributes.add(
+            name="id",
+            type=b'"string"',
+            computed=True,
+            description="The id of the resource.",
+        )
+        block.attributes.add(
+            name="tags",
+            type=b'["map","string"]',
+            optional=True,
+            description="A map of tags to assign to the resource.",
+        )
+        block.attributes.add(
+            name="rules",
+            type=b'["set",["object",{"port":"number","cidr_blocks":["list","string"]}]]',
+            optional=True,
+            description="The rules.",
+        )
+        nested_block = block.block_types.add(
+            type_name="timeouts", nesting=1, max_items=1
+        )
+        for operation in ("create", "update", "delete"):
+            nested_block.block.attributes.add(
+                name=operation, type=b'"string"', optional=True
+            )
+        nested_block = block.block_types.add(type_name="settings", nesting=2)
+        nested_block.block.attributes.add(
+            name="key",
+            type=b'"string"',
+            required=True,
+            description="The key of the setting.",
+        )
+
+    return response
+
+
+def measure_tree(resources: int) -> typing.Tuple[schema.Module, int]:
+    """
+    Parse all the resources of the benchmark provider, and return the module and the
+    memory taken by the parsed tree, including the types it is the first to parse.
+    """
+    response = provider_schema(resources)
+    cty.clear_type_caches()
+    gc.collect()
+
+    tracemalloc.start()
+    try:
+        module = schema.Module(
+            name="test",
+            schema=response,
+            namespace="test",
+            type="test",
+            version="1.0.0",
+        )
+        module.resources
+        gc.collect()
+        tree_memory, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return module, tree_memory
+
+
+def test_tree_memory() -> None:
+    """
+    The parsed tree of a provider with 1000 resources should stay compact: the names,
+    descriptions and types repeated across the resources are only stored once, so each
+    resource takes far less memory than the same resource parsed on its own.
+    """
+    _, baseline = measure_tree(1)
+    module, tree_memory = measure_tree(1000)
+
+    assert len(module.resources) == 1000
+    assert tree_memory < 1000 * baseline / 1.5
+
+
+def test_release_schemas() -> None:
+    """
+    Once the schemas are released, the module shouldn't reference the provider schema
+    anymore, and should still be built the same way.
+    """
+    response = provider_schema(3)
+    references = sys.getrefcount(response)
+
+    released_module = schema.Module(
+        name="test", schema=response, namespace="test", type="test", version="1.0.0"
+    )
+    released_builder = InmantaModuleBuilder(Module("test"))
+    released_module.build(released_builder, workers=1, release_schemas=True)
+    gc.collect()
+    assert sys.getrefcount(response) == references
+
+    with pytest.raises(RuntimeError):
+        released_module.build_resource("test_resource_0")
+
+    module = schema.Module(
+        name="test",
+        schema=provider_schema(3),
+        namespace="test",
+        type="test",
+        version="1.0.0",
+    )
+    module_builder = InmantaModuleBuilder(Module("test"))
+    module.build(module_builder, workers=1)
+
+    assert {
+        key: sorted(str(element) for element in elements)
+        for key, elements in released_builder._model_files.items()
+    } == {
+        key: sorted(str(element) for element in elements)
+        for key, elements in module_builder._model_files.items()
+    }
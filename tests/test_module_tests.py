@@ -0,0 +1,122 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import pathlib
+import re
+import typing
+
+import pytest
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.inmanta.module import Module
+
+import inmanta.module
+from terraform_module_generator import (
+    incremental,
+    inmanta_module_tests,
+    schema,
+    streaming,
+    synthetic,
+)
+
+
+def new_module() -> schema.Module:
+    return schema.Module(
+        name="test",
+        schema=synthetic.generate_schema(
+            synthetic.SchemaShape(resources=6, data_sources=2, depth=2), type="test"
+        ),
+        namespace="test",
+        type="test",
+        version="1.0.0",
+    )
+
+
+def make_module(module_path: pathlib.Path) -> None:
+    """
+    Write the skeleton of a v1 module, the module template can not be fetched offline.
+    """
+    (module_path / "model").mkdir(parents=True)
+    (module_path / "tests").mkdir()
+    (module_path / "module.yml").write_text(
+        "name: test\nlicense: Inmanta EULA\nversion: 1.0.0\n"
+    )
+
+
+def get_imports(test_file: pathlib.Path) -> typing.List[str]:
+    return re.findall(r"^(?:.*\"\"\")?import ([\w:]+)", test_file.read_text(), re.M)
+
+
+def test_shard_submodules() -> None:
+    """
+    The largest sub-modules should be placed first, each in the smallest shard.
+    """
+    sizes = {"a": 50, "b": 20, "c": 20, "d": 20, "e": 10, "f": 5}
+    assert inmanta_module_tests.shard_submodules(sizes, 3) == [
+        ["a"],
+        ["b", "d"],
+        ["c", "e", "f"],
+    ]
+    assert inmanta_module_tests.shard_submodules(sizes, 1) == [sorted(sizes)]
+    assert inmanta_module_tests.shard_submodules({"a": 1}, 4) == [["a"]]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_module_tests(tmp_path: pathlib.Path, stream: bool) -> None:
+    """
+    The sub-modules known by the module builder should be the ones written to disk,
+    whether the resources are built at once or streamed, and each of them should be
+    imported in exactly one of the sharded test cases.
+    """
+    module_path = tmp_path / "test"
+    make_module(module_path)
+    terraform_module = new_module()
+    module_builder = InmantaModuleBuilder(Module("test"))
+    sub_modules: typing.Dict[str, int] = dict()
+    if stream:
+        terraform_module.build_base(module_builder)
+        inmanta_module_tests.add_submodules(sub_modules, module_builder._model_files)
+        streaming.build_modules(
+            terraform_module,
+            [streaming.StreamTarget(module_builder, module_path / "model")],
+            sub_modules=sub_modules,
+        )
+    else:
+        terraform_module.build(module_builder, workers=1)
+    inmanta_module_tests.add_submodules(sub_modules, module_builder._model_files)
+    incremental.write_model_files(module_builder, module_path / "model")
+
+    inmanta_module = inmanta.module.Module.from_path(str(module_path))
+    assert inmanta_module is not None
+    assert sorted(sub_modules) == sorted(inmanta_module.get_all_submodules())
+    assert sub_modules.keys() == (
+        inmanta_module_tests.get_submodule_sizes(inmanta_module).keys()
+    )
+
+    test_files = inmanta_module_tests.write_module_tests(
+        module_builder, str(module_path), sub_modules, shards=3
+    )
+    assert test_files == inmanta_module_tests.get_advanced_test_files(str(module_path))
+    assert [test_file.name for test_file in test_files] == [
+        "test_advanced_0.py",
+        "test_advanced_1.py",
+        "test_advanced_2.py",
+    ]
+    imported = [get_imports(test_file) for test_file in test_files]
+    assert sorted(name for shard in imported for name in shard) == sorted(sub_modules)
+    assert all(imported)
+
+    with pytest.raises(RuntimeError):
+        inmanta_module_tests.write_module_tests(
+            module_builder, str(module_path), sub_modules, shards=3
+        )
+
+    # Without shards, all the sub-modules are imported in a single test case
+    (tmp_path / "tests").mkdir()
+    (test_file,) = inmanta_module_tests.write_module_tests(
+        module_builder, str(tmp_path), sub_modules
+    )
+    assert test_file.name == "test_advanced.py"
+    assert get_imports(test_file) == sorted(sub_modules)
+    compile(test_file.read_text(), str(test_file), "exec")
@@ -0,0 +1,86 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import json
+import time
+import typing
+
+import pytest
+
+from terraform_module_generator import schema
+from terraform_module_generator.schema import mocks
+
+
+def nested_object_type(depth: int) -> typing.Any:
+    """
+    Build an object type, nested depth times, each level containing a primitive and
+    a list of objects of the next level.
+    """
+    if depth == 0:
+        return "string"
+
+    return [
+        "object",
+        {"name": "string", "children": ["list", nested_object_type(depth - 1)]},
+    ]
+
+
+@pytest.mark.parametrize(argnames="depth", argvalues=[5, 10])
+def test_nested_blocks_construction(
+    monkeypatch: pytest.MonkeyPatch, depth: int
+) -> None:
+    """
+    Regression guard for the construction of a resource with deeply nested object
+    attributes: each attribute of the schema should only be built once, when the
+    structure attributes are converted into nested blocks, their inner attributes
+    should be reused.
+    """
+    built_attributes = 0
+    build_attribute = schema.Attribute.build_attribute.__func__  # type: ignore
+
+    def counting_build_attribute(
+        cls: typing.Type[schema.Attribute],
+        path: typing.List[str],
+        attribute: typing.Any,
+    ) -> schema.Attribute:
+        nonlocal built_attributes
+        built_attributes += 1
+        return build_attribute(cls, path, attribute)
+
+    monkeypatch.setattr(
+        schema.Attribute, "build_attribute", classmethod(counting_build_attribute)
+    )
+
+    resource_schema = mocks.SchemaMock(
+        version=0,
+        block=mocks.BlockMock(
+            version=0,
+            attributes=[
+                mocks.AttributeMock(
+                    name="root",
+                    type=json.dumps(nested_object_type(depth)).encode("utf-8"),
+                )
+            ],
+            block_types=[],
+            description="",
+            description_kind="",
+        ),
+    )
+
+    start = time.perf_counter()
+    block = schema.Block("test_resource", ["test", "resources"], resource_schema.block)
+    duration = time.perf_counter() - start
+
+    # The root attribute, and for each level, the primitive, the list and the object
+    # inside the list.  Building the inner attributes again for each nested block
+    # would make this grow with the square of the depth.
+    expected = 1 + 3 * depth
+    assert built_attributes == expected, f"Built in {duration:.3f}s"
+
+    # Walk the tree of nested blocks down to the last level
+    nested_block = block.nested_blocks[0]
+    for _ in range(depth - 1):
+        assert [a.name for a in nested_block.attributes] == ["name"]
+        nested_block = nested_block.nested_blocks[0]
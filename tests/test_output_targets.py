@@ -0,0 +1,107 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import pathlib
+import typing
+
+import pytest
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.helpers.const import ASL_2_0_LICENSE, EULA_LICENSE
+from inmanta_module_factory.inmanta.module import Module
+from inmanta_tfplugin import tfplugin5_pb2
+
+from terraform_module_generator import cli, schema, streaming
+
+
+def provider_schema() -> tfplugin5_pb2.GetProviderSchema.Response:
+    response = tfplugin5_pb2.GetProviderSchema.Response()
+    response.provider.block.attributes.add(
+        name="token", type=b'"string"', optional=True
+    )
+    for i in range(4):
+        block = response.resource_schemas[f"test_resource_{i}"].block
+        block.attributes.add(name="name", type=b'"string"', required=True)
+        nested_block = block.block_types.add(type_name="timeouts", nesting=1)
+        nested_block.block.attributes.add(
+            name="create", type=b'"string"', optional=True
+        )
+
+    return response
+
+
+def read_model(model_dir: pathlib.Path) -> typing.Dict[str, str]:
+    return {
+        str(file.relative_to(model_dir)): file.read_text()
+        for file in sorted(model_dir.glob("**/*.cf"))
+    }
+
+
+def stream(
+    terraform_module: schema.Module,
+    targets: typing.List[typing.Tuple[pathlib.Path, typing.Optional[str]]],
+) -> None:
+    stream_targets = []
+    for model_dir, copyright_header_tmpl in targets:
+        module_builder = InmantaModuleBuilder(Module("test"))
+        terraform_module.build_base(module_builder)
+        streaming.write_model_files(module_builder, model_dir, copyright_header_tmpl)
+        module_builder._model_files.clear()
+        stream_targets.append(
+            streaming.StreamTarget(module_builder, model_dir, copyright_header_tmpl)
+        )
+
+    streaming.build_modules(terraform_module, stream_targets)
+    for target in stream_targets:
+        streaming.write_model_files(
+            target.module_builder, target.model_dir, target.copyright_header_tmpl
+        )
+
+
+def test_stream_several_targets(tmp_path: pathlib.Path) -> None:
+    """
+    Streaming the resources to several targets should write in each of them the same
+    files as streaming them to each target separately.
+    """
+    header = '"""\nCustom header %(copyright)s\n"""\n'
+    terraform_module = schema.Module(
+        name="test",
+        schema=provider_schema(),
+        namespace="test",
+        type="test",
+        version="1.0.0",
+    )
+    stream(terraform_module, [(tmp_path / "a", None), (tmp_path / "b", header)])
+
+    stream(terraform_module, [(tmp_path / "single_a", None)])
+    stream(terraform_module, [(tmp_path / "single_b", header)])
+
+    assert read_model(tmp_path / "a") == read_model(tmp_path / "single_a")
+    assert read_model(tmp_path / "b") == read_model(tmp_path / "single_b")
+    assert read_model(tmp_path / "a") != read_model(tmp_path / "b")
+
+
+def test_parse_target() -> None:
+    """
+    The values missing from an output target should be taken from the main target.
+    """
+    main_target = cli.OutputTarget(output_dir="/tmp/v1", license=EULA_LICENSE, v1=True)
+
+    target = cli.parse_target(
+        f"output-dir=/tmp/v2,v1=false,license={ASL_2_0_LICENSE}", main_target
+    )
+    assert target == cli.OutputTarget(
+        output_dir="/tmp/v2", license=ASL_2_0_LICENSE, v1=False
+    )
+    assert main_target.output_dir == "/tmp/v1"
+
+    assert cli.parse_target("output_dir=/tmp/other", main_target) == cli.OutputTarget(
+        output_dir="/tmp/other", license=EULA_LICENSE, v1=True
+    )
+
+    with pytest.raises(ValueError):
+        cli.parse_target("output-dir=/tmp/v2,color=blue", main_target)
+
+    with pytest.raises(ValueError):
+        cli.parse_target("/tmp/v2", main_target)
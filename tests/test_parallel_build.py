@@ -0,0 +1,97 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import pathlib
+import typing
+
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.inmanta.module import Module
+from inmanta_tfplugin import tfplugin5_pb2
+
+from terraform_module_generator import schema
+from terraform_module_generator.schema.helpers import parallel
+
+
+def provider_schema(resources: int) -> tfplugin5_pb2.GetProviderSchema.Response:
+    response = tfplugin5_pb2.GetProviderSchema.Response()
+    response.provider.block.attributes.add(
+        name="token", type=b'"string"', optional=True
+    )
+    for i in range(resources):
+        block = response.resource_schemas[f"test_resource_{i}"].block
+        block.attributes.add(name="name", type=b'"string"', required=True)
+        block.attributes.add(name="id", type=b'"string"', computed=True)
+        block.attributes.add(
+            name="rules",
+            type=b'["set",["object",{"port":"number","tags":["list","string"]}]]',
+            optional=True,
+        )
+        nested_block = block.block_types.add(type_name="timeouts", nesting=1)
+        nested_block.block.attributes.add(
+            name="create", type=b'"string"', optional=True
+        )
+
+    return response
+
+
+def render(workers: int, output_dir: pathlib.Path) -> typing.Dict[str, str]:
+    module = schema.Module(
+        name="test",
+        schema=provider_schema(12),
+        namespace="test",
+        type="test",
+        version="1.0.0",
+    )
+    module_builder = InmantaModuleBuilder(Module("test"))
+    module.build(module_builder, workers=workers)
+
+    files = dict()
+    for file_key in list(module_builder._model_files.keys()):
+        file_path = module_builder.generate_model_file(output_dir, file_key, force=True)
+        assert file_path is not None
+        files[file_key] = file_path.read_text()
+
+    return files
+
+
+def test_parallel_build(tmp_path: pathlib.Path) -> None:
+    """
+    Building the resources in worker processes should produce exactly the same files
+    as building them serially.
+    """
+    serial = render(1, tmp_path / "serial")
+    sharded = render(3, tmp_path / "sharded")
+
+    assert list(serial.keys()) == list(sharded.keys())
+    for file_key in serial:
+        assert serial[file_key] == sharded[file_key], file_key
+
+
+def test_record_module_elements() -> None:
+    """
+    Each record should only contain the elements added to the builder while it was
+    open, the nested records included.
+    """
+    module = schema.Module(
+        name="test",
+        schema=provider_schema(2),
+        namespace="test",
+        type="test",
+        version="1.0.0",
+    )
+    module_builder = InmantaModuleBuilder(Module("test"))
+    with parallel.record_module_elements(module_builder) as base_elements:
+        module.build_base(module_builder)
+        with parallel.record_module_elements(module_builder) as resource_elements:
+            resources = module.add_resource("test_resource_0", module_builder)
+
+    assert resources and set(map(id, resources)) <= set(map(id, resource_elements))
+    assert set(map(id, resource_elements)) < set(map(id, base_elements))
+    assert "add_module_element" not in vars(module_builder)
+
+    # The elements which are already in the builder are not added again
+    with parallel.record_module_elements(module_builder) as base_elements:
+        module.build_base(module_builder)
+    assert base_elements == []
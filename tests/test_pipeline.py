@@ -0,0 +1,103 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import threading
+import time
+import typing
+
+import pytest
+
+from terraform_module_generator import pipeline
+
+
+def sleeping(duration: float) -> typing.Callable[[int], int]:
+    def func(item: int) -> int:
+        time.sleep(duration)
+        return item
+
+    return func
+
+
+def test_overlap() -> None:
+    """
+    The stages should process different items at the same time, the pipeline should
+    then take about as long as its slowest stage, not as long as all of them.
+    """
+    stages = [
+        pipeline.Stage("fetch", sleeping(0.1)),
+        pipeline.Stage("schema", sleeping(0.05)),
+        pipeline.Stage("generate", lambda item: item * 2),
+    ]
+    start = time.monotonic()
+    results = pipeline.run_pipeline(list(range(10)), stages)
+    duration = time.monotonic() - start
+
+    assert results == [item * 2 for item in range(10)]
+    assert stages[0].busy_time >= 1.0
+    assert duration < 1.0 + 0.05 * 5
+
+    # The jobs of a stage process several items at the same time
+    stages = [pipeline.Stage("fetch", sleeping(0.1), jobs=5)]
+    start = time.monotonic()
+    assert pipeline.run_pipeline(list(range(10)), stages) == list(range(10))
+    assert time.monotonic() - start < 0.5
+
+
+def test_failure() -> None:
+    """
+    An item which fails in a stage should not go through the next ones, it shouldn't
+    stop the other items either.
+    """
+    processed: typing.List[int] = []
+
+    def fail(item: int) -> int:
+        if item == 1:
+            raise ValueError("failed")
+        return item
+
+    results = pipeline.run_pipeline(
+        [0, 1, 2],
+        [pipeline.Stage("fail", fail), pipeline.Stage("add", processed.append)],
+    )
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], pipeline.PipelineError)
+    assert results[1].stage == "fail"
+    assert isinstance(results[1].error, ValueError)
+    assert processed == [0, 2]
+
+
+@pytest.mark.parametrize("queue_size", [1, 2])
+def test_backpressure(queue_size: int) -> None:
+    """
+    A fast stage should not run further ahead of the slow stage after it than the
+    queue between them allows.
+    """
+    release = threading.Event()
+    fetched: typing.List[int] = []
+    ahead: typing.List[int] = []
+
+    def fetch(item: int) -> int:
+        fetched.append(item)
+        return item
+
+    def generate(item: int) -> int:
+        release.wait()
+        ahead.append(len(fetched) - item)
+        return item
+
+    thread = threading.Thread(target=lambda: (time.sleep(0.2), release.set()))
+    thread.start()
+    results = pipeline.run_pipeline(
+        list(range(10)),
+        [pipeline.Stage("fetch", fetch), pipeline.Stage("generate", generate)],
+        queue_size,
+    )
+    thread.join()
+
+    assert results == list(range(10))
+    # While the first item is blocked, the fetch stage can only fill the queue of the
+    # generation, and then hold one more item, waiting for room in the queue
+    assert ahead[0] == queue_size + 2
+    assert max(ahead) <= queue_size + 2
@@ -0,0 +1,120 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import pathlib
+import types
+import typing
+
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.inmanta.module import Module
+from inmanta_tfplugin import tfplugin5_pb2
+
+from inmanta.execute.util import Unknown
+from terraform_module_generator import schema
+from terraform_module_generator.schema import const
+
+
+def provider_schema(resources: int) -> tfplugin5_pb2.GetProviderSchema.Response:
+    response = tfplugin5_pb2.GetProviderSchema.Response()
+    response.provider.block.attributes.add(
+        name="token", type=b'"string"', optional=True
+    )
+    for i in range(resources):
+        block = response.resource_schemas[f"test_resource_{i}"].block
+        block.attributes.add(name="name", type=b'"string"', required=True)
+        block.attributes.add(name="tags", type=b'["set","string"]', optional=True)
+        block.attributes.add(name="id", type=b'"string"', computed=True)
+        block.attributes.add(name="arn", type=b'"string"', computed=True)
+        nested_block = block.block_types.add(
+            type_name="timeouts", nesting=1, max_items=1
+        )
+        nested_block.block.attributes.add(
+            name="create", type=b'"string"', optional=True
+        )
+
+    return response
+
+
+def build(
+    workers: int, output_dir: pathlib.Path
+) -> typing.Tuple[InmantaModuleBuilder, typing.Dict[str, str]]:
+    module = schema.Module(
+        name="test",
+        schema=provider_schema(4),
+        namespace="test",
+        type="test",
+        version="1.0.0",
+        plugin_config=True,
+    )
+    module_builder = InmantaModuleBuilder(Module("test"))
+    module.build(module_builder, workers=workers)
+
+    files = dict()
+    for file_key in list(module_builder._model_files.keys()):
+        file_path = module_builder.generate_model_file(output_dir, file_key, force=True)
+        assert file_path is not None
+        files[file_key] = file_path.read_text()
+
+    return module_builder, files
+
+
+def test_plugin_config(tmp_path: pathlib.Path) -> None:
+    """
+    The config block of each entity should be serialized by a single call to the
+    plugin of the module, whether the resources are built serially or in worker
+    processes.
+    """
+    module_builder, serial = build(1, tmp_path / "serial")
+    _, parallel = build(2, tmp_path / "parallel")
+    assert serial == parallel
+
+    (plugin,) = module_builder._plugins
+    assert plugin.name == const.CONFIG_ATTRIBUTES_PLUGIN_NAME
+
+    resource = serial["test::resources::test_resource_0"]
+    assert "terraform::sorted_list" not in resource
+    assert (
+        'attributes=test::config_attributes(self, "name=name,tags=tags:sorted")'
+        in resource
+    )
+    assert "state = self._config_block._state\n" in resource
+    assert 'self.arn = state["arn"]' in resource
+    assert (
+        'attributes=test::config_attributes(self, "create=create")'
+        in serial["test::resources::test_resource_0::timeouts"]
+    )
+    assert (
+        'attributes=test::config_attributes(self, "token=token")'
+        in serial["test::provider"]
+    )
+
+
+def test_config_attributes_plugin() -> None:
+    """
+    The plugin should serialize the attributes listed in the field table, sorting the
+    sets, and leave the null and unknown values as they are.
+    """
+    plugin = const.get_config_attributes_plugin(
+        InmantaModuleBuilder(Module("test")), "test"
+    )
+    namespace: typing.Dict[str, typing.Any] = {
+        "plugin": lambda f: f,
+        "Unknown": Unknown,
+    }
+    exec(str(plugin), namespace)
+    config_attributes = namespace[const.CONFIG_ATTRIBUTES_PLUGIN_NAME]
+
+    entity = types.SimpleNamespace(
+        name="a", tags=["c", "b"], class_=None, ports=Unknown(None)
+    )
+    attributes = config_attributes(
+        entity, "name=name,tags=tags:sorted,class=class_,ports=ports:sorted"
+    )
+    assert attributes == {
+        "name": "a",
+        "tags": ["b", "c"],
+        "class": None,
+        "ports": entity.ports,
+    }
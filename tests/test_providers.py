@@ -0,0 +1,191 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import hashlib
+import http.server
+import json
+import pathlib
+import threading
+import typing
+import zipfile
+
+import pytest
+import requests
+from inmanta_plugins.terraform.tf.exceptions import InstallerException
+
+from terraform_module_generator import batch, providers
+
+
+def make_archive(path: pathlib.Path, type: str, version: str) -> bytes:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("LICENSE", "license")
+        archive.writestr(f"terraform-provider-{type}_v{version}", f"{type} {version}")
+    return path.read_bytes()
+
+
+@pytest.fixture
+def registry(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> typing.Iterator[typing.List[str]]:
+    """
+    A registry serving the providers test/a, test/b and test/c in version 1.0.0, on
+    the local host.  Return the list of the requested paths.
+    """
+    archives = {
+        type: make_archive(tmp_path / f"registry/{type}.zip", type, "1.0.0")
+        for type in ["a", "b", "c"]
+    }
+    requests: typing.List[str] = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            requests.append(self.path)
+            parts = self.path.strip("/").split("/")
+            if len(parts) > 1 and parts[3] not in archives:
+                self.send_error(404)
+                return
+
+            if len(parts) == 1:
+                body = archives[parts[0].split(".")[0]]
+            elif len(parts) == 4:
+                body = json.dumps({"versions": ["1.0.0"]}).encode()
+            else:
+                type = parts[3]
+                body = json.dumps(
+                    {
+                        "download_url": f"{base_url}/{type}.zip",
+                        "filename": f"{type}.zip",
+                        "shasum": hashlib.sha256(archives[type]).hexdigest(),
+                    }
+                ).encode()
+
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(providers, "BASE_URL", f"{base_url}/v1/providers")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield requests
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_registry(tmp_path: pathlib.Path, registry: typing.List[str]) -> None:
+    """
+    The provider should be downloaded from the registry once, the archive is then
+    reused as long as it matches the checksum published by the registry.
+    """
+    working_dir = tmp_path / "cache"
+    working_dir.mkdir()
+    binary = pathlib.Path(
+        providers.install_provider("test", "b", "1.0.0", str(working_dir))
+    )
+    assert binary.read_text() == "b 1.0.0"
+    assert binary.parent == working_dir
+    assert registry[-1] == "/b.zip"
+    assert len(registry) == 3
+
+    assert providers.install_provider("test", "b", "1.0.0", str(working_dir)) == str(
+        binary
+    )
+    assert len(registry) == 5
+    assert not any(path.endswith(".zip") for path in registry[3:])
+
+    (working_dir / "test-b-1.0.0").write_bytes(b"truncated")
+    providers.install_provider("test", "b", "1.0.0", str(working_dir))
+    assert registry[-1] == "/b.zip"
+    assert binary.read_text() == "b 1.0.0"
+
+    with pytest.raises(requests.HTTPError):
+        providers.install_provider("test", "d", "1.0.0", str(working_dir))
+
+
+def test_prefetch_session(
+    tmp_path: pathlib.Path,
+    registry: typing.List[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    All the providers fetched by the batch generation should be downloaded through
+    the same session, so that they share its pool of connections.
+    """
+
+    def unpooled_get(*args: object, **kwargs: object) -> None:
+        raise AssertionError("The providers should be fetched through the session")
+
+    monkeypatch.setattr(requests, "get", unpooled_get)
+
+    session = providers.get_session(2)
+    session_requests: typing.List[str] = []
+    session.hooks["response"].append(
+        lambda response, *args, **kwargs: session_requests.append(
+            response.request.path_url
+        )
+    )
+
+    working_dir = tmp_path / "cache"
+    for type in ["a", "c"]:
+        entry = batch.BatchEntry("test", type, "1.0.0", str(tmp_path / type))
+        batch.fetch_providers([entry], str(working_dir), session=session)
+        assert (working_dir / f"terraform-provider-{type}_v1.0.0").is_file()
+
+    session.close()
+    assert session_requests == registry
+    assert {"/a.zip", "/c.zip"} <= set(session_requests)
+
+
+def test_mirror(tmp_path: pathlib.Path) -> None:
+    """
+    The providers should be installed from both layouts of the filesystem mirrors.
+    """
+    mirror = tmp_path / "mirror"
+    platform = providers.get_platform()
+    make_archive(
+        mirror
+        / f"registry.terraform.io/HashiCorp/local/terraform-provider-local_2.1.0_{platform}.zip",
+        "local",
+        "2.1.0",
+    )
+    unpacked = mirror / f"registry.terraform.io/test/unpacked/1.0.0/{platform}"
+    unpacked.mkdir(parents=True)
+    (unpacked / "terraform-provider-unpacked_v1.0.0").write_text("unpacked 1.0.0")
+
+    working_dir = tmp_path / "cache"
+    working_dir.mkdir()
+    binary = pathlib.Path(
+        providers.install_provider(
+            "hashicorp", "local", "2.1.0", str(working_dir), str(mirror)
+        )
+    )
+    assert binary == working_dir / "terraform-provider-local_v2.1.0"
+    assert binary.read_text() == "local 2.1.0"
+
+    # An installed binary is not extracted again
+    modified = binary.stat().st_mtime_ns
+    providers.install_provider(
+        "hashicorp", "local", "2.1.0", str(working_dir), str(mirror)
+    )
+    assert binary.stat().st_mtime_ns == modified
+
+    assert providers.install_provider(
+        "test", "unpacked", "1.0.0", str(working_dir), str(mirror)
+    ) == str(unpacked / "terraform-provider-unpacked_v1.0.0")
+
+    with pytest.raises(InstallerException):
+        providers.install_provider(
+            "hashicorp", "local", "2.2.0", str(working_dir), str(mirror)
+        )
@@ -0,0 +1,147 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import json
+import pathlib
+from dataclasses import replace
+
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.inmanta.module import Module
+from inmanta_tfplugin import tfplugin5_pb2
+
+from terraform_module_generator import report, schema, streaming, synthetic
+
+
+def provider_schema(resources: int) -> tfplugin5_pb2.GetProviderSchema.Response:
+    response = tfplugin5_pb2.GetProviderSchema.Response()
+    response.provider.block.attributes.add(
+        name="token", type=b'"string"', optional=True
+    )
+    for i in range(resources):
+        block = response.resource_schemas[f"test_resource_{i}"].block
+        block.attributes.add(name="name", type=b'"string"', required=True)
+        if i % 2:
+            nested_block = block.block_types.add(type_name="timeouts", nesting=1)
+            nested_block.block.attributes.add(
+                name="create", type=b'"string"', optional=True
+            )
+
+    return response
+
+
+def build_report(
+    terraform_module: schema.Module, workers: int
+) -> report.GenerationReport:
+    generation_report = report.GenerationReport("test", "1.0.0")
+    module_builder = InmantaModuleBuilder(Module("test"))
+    terraform_module.build(module_builder, workers=workers)
+    generation_report.add_model_files(
+        module_builder._model_files, terraform_module.resource_schemas.keys()
+    )
+    return generation_report
+
+
+def test_resource_metrics() -> None:
+    """
+    The metrics of each resource should count the elements in its own sub-module and
+    the ones it added to the resources sub-module.
+    """
+    terraform_module = schema.Module(
+        name="test",
+        schema=provider_schema(2),
+        namespace="test",
+        type="test",
+        version="1.0.0",
+    )
+    resources = build_report(terraform_module, workers=1).resources
+
+    simple, nested = resources["test_resource_0"], resources["test_resource_1"]
+    assert (simple.entities, simple.attributes, simple.relations) == (1, 1, 0)
+    assert (nested.entities, nested.attributes, nested.relations) == (2, 2, 1)
+    assert (simple.indexes, nested.indexes) == (1, 2)
+    assert (simple.depth, nested.depth) == (0, 1)
+    assert simple.implementations < nested.implementations
+    assert 0 < simple.lines < nested.lines
+
+
+def test_build_modes(tmp_path: pathlib.Path) -> None:
+    """
+    The report should be the same whether the resources are built serially, in
+    parallel or streamed.
+    """
+    shape = synthetic.SchemaShape(resources=8, data_sources=0, depth=2)
+
+    def new_module() -> schema.Module:
+        return schema.Module(
+            name="test",
+            schema=synthetic.generate_schema(shape, type="test"),
+            namespace="test",
+            type="test",
+            version="1.0.0",
+        )
+
+    serial = build_report(new_module(), workers=1)
+    parallel = build_report(new_module(), workers=2)
+
+    streamed = report.GenerationReport("test", "1.0.0")
+    terraform_module = new_module()
+    module_builder = InmantaModuleBuilder(Module("test"))
+    terraform_module.build_base(module_builder)
+    streaming.write_model_files(module_builder, tmp_path)
+    module_builder._model_files.clear()
+    streaming.build_modules(
+        terraform_module,
+        [streaming.StreamTarget(module_builder, tmp_path)],
+        streamed,
+    )
+
+    assert serial.resources == parallel.resources == streamed.resources
+    assert serial.totals().entities == sum(
+        metrics.entities for metrics in serial.resources.values()
+    )
+
+
+def test_record_report(tmp_path: pathlib.Path) -> None:
+    """
+    The report should be compared to the previous one saved in the same file, and the
+    time spent building each resource should be part of it.
+    """
+    report_file = tmp_path / "report.json"
+    with report.record_report(report_file, "test", "1.0.0") as generation_report:
+        terraform_module = schema.Module(
+            name="test",
+            schema=provider_schema(2),
+            namespace="test",
+            type="test",
+            version="1.0.0",
+        )
+        module_builder = InmantaModuleBuilder(Module("test"))
+        terraform_module.build(module_builder, workers=1)
+        generation_report.add_model_files(
+            module_builder._model_files, terraform_module.resource_schemas.keys()
+        )
+
+    first = json.loads(report_file.read_text())
+    assert "diff" not in first
+    assert first["totals"]["entities"] == 3
+    assert first["resources"]["test_resource_1"]["build_time"] > 0
+
+    previous = report.GenerationReport.load(report_file)
+    assert previous is not None
+    with report.record_report(report_file, "test", "2.0.0") as generation_report:
+        assert generation_report.previous == previous
+        generation_report.resources = {
+            "test_resource_1": replace(
+                previous.resources["test_resource_1"], attributes=5
+            ),
+            "test_resource_2": previous.resources["test_resource_0"],
+        }
+
+    diff = json.loads(report_file.read_text())["diff"]
+    assert diff["version"] == "1.0.0"
+    assert diff["added"] == ["test_resource_2"]
+    assert diff["removed"] == ["test_resource_0"]
+    assert diff["changed"] == {"test_resource_1": {"attributes": 3}}
+    assert diff["totals"]["attributes"] == 3
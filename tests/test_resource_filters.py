@@ -0,0 +1,67 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import typing
+
+from inmanta_tfplugin import tfplugin5_pb2
+
+from terraform_module_generator import schema
+from terraform_module_generator.schema import mocks
+
+
+class RecordingSchemas(typing.Mapping[str, typing.Any]):
+    """
+    Mapping of schemas recording which of them are accessed.
+    """
+
+    def __init__(self, schemas: typing.Mapping[str, typing.Any]) -> None:
+        self.schemas = schemas
+        self.accessed: typing.List[str] = []
+
+    def __getitem__(self, key: str) -> typing.Any:
+        self.accessed.append(key)
+        return self.schemas[key]
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self.schemas)
+
+    def __len__(self) -> int:
+        return len(self.schemas)
+
+
+def test_resource_filters() -> None:
+    """
+    Only the resources and data sources matching the include patterns, and none of the
+    exclude patterns should be part of the module.  The schemas of the other ones
+    should not even be accessed.
+    """
+    response = tfplugin5_pb2.GetProviderSchema.Response()
+    for name in ["aws_s3_bucket", "aws_s3_object", "aws_s3_bucket_acl", "aws_vpc"]:
+        response.resource_schemas[name].block.attributes.add(
+            name="name", type=b'"string"', required=True
+        )
+        response.data_source_schemas[name].block.attributes.add(
+            name="name", type=b'"string"', required=True
+        )
+
+    resource_schemas = RecordingSchemas(response.resource_schemas)
+    module = schema.Module(
+        name="aws",
+        schema=mocks.ProviderSchemaMock(
+            provider=response.provider,
+            resource_schemas=resource_schemas,
+            data_source_schemas=response.data_source_schemas,
+        ),
+        namespace="hashicorp",
+        type="aws",
+        version="4.0.0",
+        include=["aws_s3_*"],
+        exclude=["*_acl"],
+    )
+
+    selected = ["aws_s3_bucket", "aws_s3_object"]
+    assert sorted(resource_schemas.accessed) == selected
+    assert sorted(r.name for r in module.resources) == selected
+    assert sorted(d.name for d in module.data_sources) == selected
@@ -0,0 +1,80 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import pathlib
+
+from inmanta_tfplugin import tfplugin5_pb2
+
+from terraform_module_generator import schema
+from terraform_module_generator.schema_cache import SchemaCache
+
+
+def provider_schema() -> tfplugin5_pb2.GetProviderSchema.Response:
+    response = tfplugin5_pb2.GetProviderSchema.Response()
+    response.provider.block.attributes.add(
+        name="token", type=b'"string"', optional=True
+    )
+
+    resource = response.resource_schemas["local_file"]
+    resource.version = 1
+    resource.block.description = "Generates a local file with the given content."
+    resource.block.attributes.add(name="content", type=b'"string"', required=True)
+    resource.block.attributes.add(name="id", type=b'"string"', computed=True)
+    resource.block.attributes.add(
+        name="permissions", type=b'["list",["object",{"mode":"number"}]]', optional=True
+    )
+    nested_block = resource.block.block_types.add(type_name="timeouts", nesting=1)
+    nested_block.block.attributes.add(name="create", type=b'"string"', optional=True)
+
+    response.data_source_schemas["local_file"].block.attributes.add(
+        name="filename", type=b'"string"', required=True
+    )
+    return response
+
+
+def test_schema_cache(tmp_path: pathlib.Path) -> None:
+    """
+    Make sure that a schema stored in the cache can be loaded again, one resource at a
+    time, and that it can be used as a replacement for the schema of the provider.
+    """
+    cache = SchemaCache(str(tmp_path))
+    assert cache.get("hashicorp", "local", "2.1.0") is None
+
+    original = provider_schema()
+    cache.put("hashicorp", "local", "2.1.0", original)
+    assert cache.get("hashicorp", "local", "2.1.1") is None
+
+    cached = cache.get("hashicorp", "local", "2.1.0")
+    assert cached is not None
+    assert list(cached.resource_schemas.keys()) == ["local_file"]
+    assert list(cached.data_source_schemas.keys()) == ["local_file"]
+
+    resource = cached.resource_schemas["local_file"]
+    assert resource.version == 1
+    assert (
+        resource.block.description
+        == original.resource_schemas["local_file"].block.description
+    )
+    assert [a.name for a in resource.block.attributes] == [
+        "content",
+        "id",
+        "permissions",
+    ]
+    assert resource.block.attributes[2].type == b'["list",["object",{"mode":"number"}]]'
+    assert resource.block.block_types[0].type_name == "timeouts"
+    assert resource.block.block_types[0].nesting == 1
+
+    module = schema.Module(
+        name="local",
+        schema=cached,
+        namespace="hashicorp",
+        type="local",
+        version="2.1.0",
+    )
+    assert [r.name for r in module.resources] == ["local_file"]
+
+    # A corrupted cache file is simply ignored
+    cache.path("hashicorp", "local", "2.1.0").write_bytes(b"garbage")
+    assert cache.get("hashicorp", "local", "2.1.0") is None
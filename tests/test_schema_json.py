@@ -0,0 +1,329 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import json
+import pathlib
+import tracemalloc
+import typing
+
+import pytest
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.inmanta.module import Module
+from inmanta_tfplugin import tfplugin5_pb2
+
+from terraform_module_generator import cli, incremental, schema, schema_json
+from terraform_module_generator.schema import mocks
+
+SCHEMA_DUMP = {
+    "format_version": "1.0",
+    "provider_schemas": {
+        "registry.terraform.io/hashicorp/test": {
+            "provider": {
+                "version": 0,
+                "block": {
+                    "attributes": {
+                        "token": {
+                            "type": "string",
+                            "description": "The token.",
+                            "description_kind": "plain",
+                            "optional": True,
+                            "sensitive": True,
+                        },
+                    },
+                    "description_kind": "plain",
+                },
+            },
+            "resource_schemas": {
+                "test_file": {
+                    "version": 1,
+                    "block": {
+                        "attributes": {
+                            "filename": {
+                                "type": "string",
+                                "description": "The path of the file.",
+                                "description_kind": "plain",
+                                "required": True,
+                            },
+                            "id": {
+                                "type": "string",
+                                "description_kind": "plain",
+                                "computed": True,
+                            },
+                            "rules": {
+                                "type": [
+                                    "set",
+                                    [
+                                        "object",
+                                        {"port": "number", "protocol": "string"},
+                                    ],
+                                ],
+                                "description_kind": "plain",
+                                "optional": True,
+                            },
+                        },
+                        "block_types": {
+                            "timeouts": {
+                                "nesting_mode": "single",
+                                "block": {
+                                    "attributes": {
+                                        "create": {
+                                            "type": "string",
+                                            "description_kind": "plain",
+                                            "optional": True,
+                                        },
+                                    },
+                                    "description_kind": "plain",
+                                },
+                                "max_items": 1,
+                            },
+                        },
+                        "description": "A file.",
+                        "description_kind": "plain",
+                    },
+                },
+            },
+            "data_source_schemas": {
+                "test_file": {
+                    "version": 0,
+                    "block": {
+                        "attributes": {
+                            "filename": {
+                                "type": "string",
+                                "description_kind": "plain",
+                                "required": True,
+                            },
+                        },
+                        "description_kind": "plain",
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+def load_provider_schema(
+    raw: dict, namespace: str, type: str
+) -> mocks.ProviderSchemaMock:
+    """
+    Load the given provider from a schema dump already loaded in memory, as a reference
+    for the streaming reader.
+    """
+    raw_provider = next(
+        value
+        for key, value in raw["provider_schemas"].items()
+        if schema_json.matches_provider(key, namespace, type)
+    )
+    return mocks.ProviderSchemaMock(
+        provider=schema_json.load_schema(raw_provider.get("provider", {"block": {}})),
+        resource_schemas={
+            name: schema_json.load_schema(value)
+            for name, value in raw_provider.get("resource_schemas", {}).items()
+        },
+        data_source_schemas={
+            name: schema_json.load_schema(value)
+            for name, value in raw_provider.get("data_source_schemas", {}).items()
+        },
+    )
+
+
+def provider_schema() -> tfplugin5_pb2.GetProviderSchema.Response:
+    """
+    The schema received from the provider, for the provider of the schema dump.
+    """
+    response = tfplugin5_pb2.GetProviderSchema.Response()
+    response.provider.block.attributes.add(
+        name="token",
+        type=b'"string"',
+        description="The token.",
+        optional=True,
+        sensitive=True,
+    )
+
+    resource = response.resource_schemas["test_file"]
+    resource.version = 1
+    resource.block.version = 1
+    resource.block.description = "A file."
+    resource.block.attributes.add(
+        name="filename",
+        type=b'"string"',
+        description="The path of the file.",
+        required=True,
+    )
+    resource.block.attributes.add(name="id", type=b'"string"', computed=True)
+    resource.block.attributes.add(
+        name="rules",
+        type=b'["set",["object",{"port":"number","protocol":"string"}]]',
+        optional=True,
+    )
+    nested_block = resource.block.block_types.add(
+        type_name="timeouts", nesting=1, max_items=1
+    )
+    nested_block.block.attributes.add(name="create", type=b'"string"', optional=True)
+
+    data_source = response.data_source_schemas["test_file"]
+    data_source.block.attributes.add(name="filename", type=b'"string"', required=True)
+
+    return response
+
+
+def render(
+    provider_schema: typing.Any, output_dir: pathlib.Path
+) -> typing.Dict[str, str]:
+    module = schema.Module(
+        name="test",
+        schema=provider_schema,
+        namespace="hashicorp",
+        type="test",
+        version="1.0.0",
+    )
+    module_builder = InmantaModuleBuilder(Module("test"))
+    module.build(module_builder, workers=1)
+
+    files = dict()
+    for file_key in list(module_builder._model_files.keys()):
+        file_path = module_builder.generate_model_file(output_dir, file_key, force=True)
+        assert file_path is not None
+        files[file_key] = file_path.read_text()
+
+    return files
+
+
+def test_schema_file(tmp_path: pathlib.Path) -> None:
+    """
+    The module generated from a schema dump should be the same as the one generated
+    from the schema received from the provider.
+    """
+    schema_file = tmp_path / "schema.json"
+    schema_file.write_text(json.dumps(SCHEMA_DUMP))
+
+    # The provider is found whatever the case of its namespace
+    dumped_schema = cli.get_provider_schema(
+        "HashiCorp", "test", "1.0.0", str(tmp_path), schema_file=str(schema_file)
+    )
+    assert dumped_schema.resource_schemas["test_file"].version == 1
+    assert incremental.get_resource_fingerprint(
+        dumped_schema.resource_schemas["test_file"]
+    ) == incremental.get_resource_fingerprint(
+        provider_schema().resource_schemas["test_file"]
+    )
+
+    assert render(dumped_schema, tmp_path / "json") == render(
+        provider_schema(), tmp_path / "provider"
+    )
+
+    with pytest.raises(ValueError):
+        schema_json.load_schema_file(str(schema_file), "hashicorp", "other")
+
+
+def test_nested_type() -> None:
+    """
+    The nested attributes of the providers using the protocol version 6 should be
+    converted to the equivalent cty types.
+    """
+    attribute = schema_json.load_attribute(
+        "rules",
+        {
+            "nested_type": {
+                "attributes": {
+                    "port": {"type": "number", "required": True},
+                    "labels": {
+                        "nested_type": {
+                            "attributes": {"key": {"type": "string"}},
+                            "nesting_mode": "single",
+                        },
+                    },
+                },
+                "nesting_mode": "list",
+            },
+            "description": "The rules.",
+            "description_kind": "markdown",
+            "optional": True,
+        },
+    )
+
+    assert json.loads(attribute.type) == [
+        "list",
+        ["object", {"port": "number", "labels": ["object", {"key": "string"}]}],
+    ]
+    assert attribute.description_kind == 1
+    assert attribute.optional and not attribute.required
+
+
+def test_streaming_reader(tmp_path: pathlib.Path) -> None:
+    """
+    The provider should be read from the schema dump whatever the formatting of the
+    dump, and whatever the size of the chunks it is read in.
+    """
+    dump = json.loads(json.dumps(SCHEMA_DUMP))
+    resource = dump["provider_schemas"]["registry.terraform.io/hashicorp/test"][
+        "resource_schemas"
+    ]["test_file"]
+    resource["block"]["description"] = 'A "file" \\ with [brackets} and é ☃'
+    dump["provider_schemas"]["registry.terraform.io/hashicorp/other"] = {
+        "resource_schemas": {"other": {"block": {"description": '"}] \\\\ [{"'}}},
+        "extra": [1, -2.5e3, True, None, {"x": [False]}],
+    }
+    dump["provider_versions"] = {"registry.terraform.io/hashicorp/test": "1.0.0"}
+    expected = load_provider_schema(dump, "hashicorp", "test")
+
+    schema_file = tmp_path / "schema.json"
+    for indent in [None, 2]:
+        for ensure_ascii in [True, False]:
+            schema_file.write_text(
+                json.dumps(dump, indent=indent, ensure_ascii=ensure_ascii)
+            )
+            for chunk_size in [1, 7, 1024]:
+                provider_schema = schema_json.load_schema_file(
+                    str(schema_file), "hashicorp", "test", chunk_size=chunk_size
+                )
+                assert provider_schema.provider == expected.provider
+                assert dict(provider_schema.resource_schemas) == dict(
+                    expected.resource_schemas
+                )
+                assert dict(provider_schema.data_source_schemas) == dict(
+                    expected.data_source_schemas
+                )
+
+    # A truncated dump is reported as invalid
+    schema_file.write_text(json.dumps(dump)[:-100])
+    with pytest.raises(ValueError):
+        schema_json.load_schema_file(str(schema_file), "hashicorp", "missing")
+
+
+def test_streaming_reader_memory(tmp_path: pathlib.Path) -> None:
+    """
+    Reading a provider from a large schema dump should only take the memory needed
+    for a single resource schema, and for the index of the resources.
+    """
+    resource = SCHEMA_DUMP["provider_schemas"]["registry.terraform.io/hashicorp/test"][
+        "resource_schemas"
+    ]["test_file"]
+    raw_resource = json.dumps(resource)
+    schema_file = tmp_path / "schema.json"
+    with open(schema_file, "w") as f:
+        f.write('{"format_version": "1.0", "provider_schemas": {')
+        for i in range(12):
+            f.write(f'"registry.terraform.io/hashicorp/test{i}": {{')
+            f.write('"resource_schemas": {')
+            f.write(", ".join(f'"test{i}_{j}": {raw_resource}' for j in range(1000)))
+            f.write("}}, " if i < 11 else "}}")
+        f.write("}}")
+
+    assert schema_file.stat().st_size > 7 * 1024**2
+
+    tracemalloc.start()
+    try:
+        provider_schema = schema_json.load_schema_file(
+            str(schema_file), "hashicorp", "test10"
+        )
+        for name in provider_schema.resource_schemas.keys():
+            assert provider_schema.resource_schemas[name].version == 1
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(provider_schema.resource_schemas) == 1000
+    assert peak < 4 * 1024**2
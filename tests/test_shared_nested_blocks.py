@@ -0,0 +1,115 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import pathlib
+import typing
+
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.inmanta.module import Module
+from inmanta_tfplugin import tfplugin5_pb2
+
+from terraform_module_generator import schema
+
+
+def provider_schema(resources: int) -> tfplugin5_pb2.GetProviderSchema.Response:
+    response = tfplugin5_pb2.GetProviderSchema.Response()
+    response.provider.block.attributes.add(
+        name="token", type=b'"string"', optional=True
+    )
+    for i in range(resources):
+        block = response.resource_schemas[f"test_resource_{i}"].block
+        block.attributes.add(name="name", type=b'"string"', required=True)
+        block.attributes.add(
+            name="rules",
+            type=b'["set",["object",{"port":"number"}]]',
+            optional=True,
+        )
+        nested_block = block.block_types.add(
+            type_name="timeouts", nesting=1, max_items=1
+        )
+        nested_block.block.attributes.add(
+            name="create", type=b'"string"', optional=True
+        )
+
+    # Same name, different structure, it can not be shared with the others
+    nested_block = response.resource_schemas["test_resource_0"].block.block_types.add(
+        type_name="settings", nesting=2
+    )
+    nested_block.block.attributes.add(name="key", type=b'"string"', required=True)
+    nested_block = response.resource_schemas["test_resource_1"].block.block_types.add(
+        type_name="settings", nesting=2
+    )
+    nested_block.block.attributes.add(name="key", type=b'"number"', required=True)
+
+    return response
+
+
+def render(workers: int, output_dir: pathlib.Path) -> typing.Dict[str, str]:
+    module = schema.Module(
+        name="test",
+        schema=provider_schema(12),
+        namespace="test",
+        type="test",
+        version="1.0.0",
+        share_nested_blocks=True,
+    )
+    module_builder = InmantaModuleBuilder(Module("test"))
+    module.build(module_builder, workers=workers)
+
+    files = dict()
+    for file_key in list(module_builder._model_files.keys()):
+        file_path = module_builder.generate_model_file(output_dir, file_key, force=True)
+        assert file_path is not None
+        files[file_key] = file_path.read_text()
+
+    return files
+
+
+def test_shared_nested_blocks(tmp_path: pathlib.Path) -> None:
+    """
+    All the nested blocks with the same structure should be represented by a single
+    entity, which is placed in the shared sub-module, whether the resources are built
+    serially or in worker processes.
+    """
+    serial = render(1, tmp_path / "serial")
+
+    shared_entities = sorted(
+        file_key.split("::")[-1]
+        for file_key, content in serial.items()
+        if file_key.startswith("test::shared::") and "\nentity " in content
+    )
+    assert [name.split("_")[0] for name in shared_entities] == [
+        "rules",
+        "settings",
+        "settings",
+        "timeouts",
+    ]
+    assert not any(
+        "\nentity Timeouts" in content
+        for file_key, content in serial.items()
+        if file_key.startswith("test::resources")
+    )
+
+    timeouts = next(name for name in shared_entities if name.startswith("timeouts"))
+    resources = serial["test::resources"]
+    assert (
+        f"TestResource5.timeouts [0:1] -- test::shared::{timeouts}::Timeouts"
+        in resources
+    )
+    assert (
+        "Timeouts._parent [1] -- test::ConfigBasedEntity"
+        in serial[f"test::shared::{timeouts}"]
+    )
+
+    config = serial["test::resources::test_resource_5"]
+    assert (
+        "if self.timeouts is defined:\n        self.timeouts._parent = self" in config
+    )
+    assert "for child in self.rules:\n        child._parent = self" in config
+
+    sharded = render(3, tmp_path / "sharded")
+    assert sorted(serial.keys()) == sorted(sharded.keys())
+    for file_key in serial:
+        assert serial[file_key] == sharded[file_key], file_key
@@ -0,0 +1,132 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import os
+import pathlib
+import time
+import zipfile
+
+from click.testing import CliRunner
+
+from terraform_module_generator import providers, store
+
+
+def add_provider(
+    provider_store: store.ProviderStore,
+    tmp_path: pathlib.Path,
+    type: str,
+    size: int,
+    last_use: float,
+) -> store.StoredProvider:
+    """
+    Add a provider whose archive and binary take about the given size to the store, as
+    if it was last used at the given time.
+    """
+    archive = tmp_path / f"{type}.zip"
+    with zipfile.ZipFile(archive, "w") as f:
+        f.writestr(f"terraform-provider-{type}_v1.0.0", os.urandom(size // 2))
+
+    providers.store_provider(
+        provider_store, "test", type, "1.0.0", str(archive), str(tmp_path / "install")
+    )
+    stored = provider_store.get("test", type, "1.0.0")
+    assert stored is not None
+    for digest in [stored.archive, stored.binary]:
+        os.utime(provider_store.blob_path(digest), (last_use, last_use))
+    return stored
+
+
+def test_store(tmp_path: pathlib.Path) -> None:
+    """
+    Each file should only be stored once, and installed as a hard link to its blob.
+    """
+    provider_store = store.ProviderStore(str(tmp_path / "store"))
+    stored = add_provider(provider_store, tmp_path, "a", 1024, time.time())
+
+    first = pathlib.Path(
+        providers.install_provider(
+            "Test", "A", "1.0.0", str(tmp_path / "first"), store=provider_store
+        )
+    )
+    second = pathlib.Path(
+        provider_store.install("test", "a", "1.0.0", str(tmp_path / "second")) or ""
+    )
+    assert first.name == second.name == "terraform-provider-a_v1.0.0"
+    assert os.path.samefile(first, second)
+    assert os.path.samefile(first, provider_store.blob_path(stored.binary))
+
+    # Adding the same provider again doesn't add any blob
+    assert provider_store.put(tmp_path / "a.zip") == stored.archive
+    assert len(provider_store.blobs()) == 2
+    assert provider_store.install("test", "b", "1.0.0", str(tmp_path)) is None
+
+
+def test_eviction(tmp_path: pathlib.Path) -> None:
+    """
+    The least recently used blobs should be evicted when the store grows above its max
+    size, the garbage collection should then remove the refs of the providers whose
+    binary was evicted.
+    """
+    provider_store = store.ProviderStore(str(tmp_path / "store"), 9 * 1024)
+    now = time.time()
+    old = add_provider(provider_store, tmp_path, "old", 4096, now - 300)
+    recent = add_provider(provider_store, tmp_path, "recent", 4096, now - 100)
+
+    # Installing the old provider makes its binary the most recently used blob, its
+    # archive is only used to install it the first time
+    assert provider_store.install("test", "old", "1.0.0", str(tmp_path / "install"))
+    new = add_provider(provider_store, tmp_path, "new", 4096, now)
+
+    assert provider_store.size() <= 9 * 1024
+    assert not provider_store.blob_path(old.archive).is_file()
+    assert provider_store.blob_path(old.binary).is_file()
+    assert not provider_store.blob_path(recent.binary).is_file()
+    assert provider_store.install("test", "recent", "1.0.0", str(tmp_path)) is None
+
+    # The garbage collection removes the refs of the evicted providers and the
+    # temporary files left over, it can shrink the store further
+    stale = provider_store.tmp_dir / "stale"
+    stale.write_text("stale")
+    os.utime(stale, (now - 2 * store.STALE_TMP_AGE, now - 2 * store.STALE_TMP_AGE))
+    recent_tmp = provider_store.tmp_dir / "recent"
+    recent_tmp.write_text("recent")
+    result = CliRunner().invoke(
+        store.main, ["gc", f"--store-dir={provider_store.store_dir}", "--max-size=7K"]
+    )
+    assert result.exit_code == 0, result.output
+
+    assert provider_store.size() <= 7 * 1024
+    assert not provider_store.blob_path(recent.archive).is_file()
+    assert provider_store.blob_path(new.binary).is_file()
+    assert provider_store.get("test", "recent", "1.0.0") is None
+    assert provider_store.install("test", "new", "1.0.0", str(tmp_path)) is not None
+    assert provider_store.install("test", "old", "1.0.0", str(tmp_path)) is not None
+    assert not stale.exists()
+    assert recent_tmp.exists()
+
+    # The installed binaries are hard links to their blob, evicting them doesn't free
+    # any space
+    blobs = provider_store.blobs()
+    unlinked = sum(size for _, size, path in blobs if path.stat().st_nlink == 1)
+    assert 0 < unlinked < sum(size for _, size, _ in blobs)
+    assert provider_store.evict(0) == unlinked
+    assert provider_store.size() == 0
+
+
+def test_gc_stale_tmp_dir(tmp_path: pathlib.Path) -> None:
+    """
+    The garbage collection should remove the temporary dirs left over by the
+    interrupted installs, and count the size of the files inside them as freed.
+    """
+    provider_store = store.ProviderStore(str(tmp_path / "store"))
+    stale = provider_store.tmp_dir / "install"
+    (stale / "nested").mkdir(parents=True)
+    (stale / "terraform-provider-a_v1.0.0").write_bytes(os.urandom(3000))
+    (stale / "nested" / "file").write_bytes(os.urandom(1000))
+    stale_time = time.time() - 2 * store.STALE_TMP_AGE
+    os.utime(stale, (stale_time, stale_time))
+
+    assert provider_store.gc() == 4000
+    assert not stale.exists()
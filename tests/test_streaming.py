@@ -0,0 +1,140 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import logging
+import pathlib
+import typing
+
+import pytest
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.inmanta.module import Module
+from inmanta_tfplugin import tfplugin5_pb2
+
+from terraform_module_generator import incremental, schema, streaming, synthetic
+from terraform_module_generator.schema_cache import CachedSchemas, SchemaCache
+
+
+def provider_schema(resources: int) -> tfplugin5_pb2.GetProviderSchema.Response:
+    response = tfplugin5_pb2.GetProviderSchema.Response()
+    response.provider.block.attributes.add(
+        name="token", type=b'"string"', optional=True
+    )
+    for i in range(resources):
+        block = response.resource_schemas[f"test_resource_{i}"].block
+        block.attributes.add(name="name", type=b'"string"', required=True)
+        block.attributes.add(
+            name="rules",
+            type=b'["set",["object",{"port":"number","tags":["list","string"]}]]',
+            optional=True,
+        )
+        nested_block = block.block_types.add(type_name="timeouts", nesting=1)
+        nested_block.block.attributes.add(
+            name="create", type=b'"string"', optional=True
+        )
+
+    return response
+
+
+def read_model(model_dir: pathlib.Path) -> typing.Dict[str, str]:
+    return {
+        str(file.relative_to(model_dir)): file.read_text()
+        for file in sorted(model_dir.glob("**/*.cf"))
+    }
+
+
+def test_streaming(tmp_path: pathlib.Path) -> None:
+    """
+    Writing the files of the resources one at a time should produce the same module
+    as writing all of them at the end.
+    """
+    terraform_module = schema.Module(
+        name="test",
+        schema=provider_schema(12),
+        namespace="test",
+        type="test",
+        version="1.0.0",
+    )
+    module_builder = InmantaModuleBuilder(Module("test"))
+    terraform_module.build(module_builder, workers=1)
+    incremental.write_model_files(module_builder, tmp_path / "full")
+
+    terraform_module = schema.Module(
+        name="test",
+        schema=provider_schema(12),
+        namespace="test",
+        type="test",
+        version="1.0.0",
+    )
+    assert streaming.estimate_memory(terraform_module) == 12 * 3 * (16 * 1024)
+
+    module_builder = InmantaModuleBuilder(Module("test"))
+    terraform_module.build_base(module_builder)
+    streaming.write_model_files(module_builder, tmp_path / "streamed")
+    module_builder._model_files.clear()
+    # A library creating its logger while the resources are built
+    add_resource = terraform_module.add_resource
+    unrelated: typing.List[logging.Logger] = []
+
+    def add_resource_with_logger(
+        name: str, builder: InmantaModuleBuilder
+    ) -> typing.List[typing.Any]:
+        unrelated.append(logging.getLogger("unrelated"))
+        return add_resource(name, builder)
+
+    terraform_module.add_resource = add_resource_with_logger  # type: ignore
+    known_loggers = set(logging.Logger.manager.loggerDict.keys())
+    streaming.build_module(terraform_module, module_builder, tmp_path / "streamed")
+    assert list(module_builder._model_files.keys()) == ["test::resources"]
+
+    # Only the loggers of the elements of the resources are dropped
+    loggers = logging.Logger.manager.loggerDict
+    assert all(loggers["unrelated"] is logger for logger in unrelated)
+    assert not [
+        name for name in loggers.keys() - known_loggers if "@test::resources" in name
+    ]
+    streaming.write_model_files(module_builder, tmp_path / "streamed")
+
+    full = read_model(tmp_path / "full")
+    streamed = read_model(tmp_path / "streamed")
+    assert full == streamed
+
+
+def test_estimate_memory(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    The memory of a module whose schemas are read lazily from the schema cache should
+    be estimated from the index of the cache file, without reading the schemas, and
+    be close to the estimate from the parsed schemas.
+    """
+    generated_schema = synthetic.generate_schema(synthetic.SchemaShape(resources=50))
+    schema_cache = SchemaCache(str(tmp_path))
+    schema_cache.put("test", "test", "1.0.0", generated_schema)
+    cached_schema = schema_cache.get("test", "test", "1.0.0")
+    assert cached_schema is not None
+
+    def new_module(provider: typing.Any) -> schema.Module:
+        return schema.Module(
+            name="test",
+            schema=provider,
+            namespace="test",
+            type="test",
+            version="1.0.0",
+        )
+
+    expected = streaming.estimate_memory(new_module(generated_schema))
+    cached_module = new_module(cached_schema)
+    monkeypatch.setattr(CachedSchemas, "__getitem__", None)
+    estimated = streaming.estimate_memory(cached_module)
+    assert expected / 1.5 < estimated < expected * 1.5
+    assert not cached_module.is_parsed
+
+
+@pytest.mark.parametrize(
+    argnames=["value", "size"],
+    argvalues=[("1024", 1024), ("512M", 512 * 1024**2), ("2GiB", 2 * 1024**3)],
+)
+def test_parse_memory_size(value: str, size: int) -> None:
+    assert streaming.parse_memory_size(value) == size
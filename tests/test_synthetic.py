@@ -0,0 +1,102 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import json
+import pathlib
+import typing
+from dataclasses import replace
+
+import pytest
+from click.testing import CliRunner
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.inmanta.module import Module
+
+from terraform_module_generator import schema, synthetic
+from terraform_module_generator.schema_cache import SchemaCache
+
+
+def max_depth(block: typing.Any) -> int:
+    return max(
+        (1 + max_depth(nested_block.block) for nested_block in block.block_types),
+        default=0,
+    )
+
+
+def test_generate_schema() -> None:
+    """
+    The generated schemas should follow the shape, and only depend on the seed.
+    """
+    shape = synthetic.SchemaShape(
+        resources=12,
+        data_sources=3,
+        attributes=5,
+        depth=3,
+        nesting_modes=("list", "map"),
+        type_kinds=("object", "set_of_objects"),
+    )
+    provider_schema = synthetic.generate_schema(shape, seed=1)
+    assert provider_schema == synthetic.generate_schema(shape, seed=1)
+    assert provider_schema != synthetic.generate_schema(shape, seed=2)
+
+    assert len(provider_schema.resource_schemas) == 12
+    assert len(provider_schema.data_source_schemas) == 3
+    for resource_schema in provider_schema.resource_schemas.values():
+        assert 1 <= len(resource_schema.block.attributes) <= 5
+        assert max_depth(resource_schema.block) <= 3
+        for nested_block in resource_schema.block.block_types:
+            assert nested_block.nesting in [2, 4]
+        for attribute in resource_schema.block.attributes:
+            assert json.loads(attribute.type)[0] in ["object", "set"]
+
+    with pytest.raises(ValueError):
+        synthetic.SchemaShape(nesting_modes=("nested",))
+
+
+@pytest.mark.parametrize("preset", synthetic.PRESETS.keys())
+def test_presets(preset: str) -> None:
+    """
+    The module of each preset shape should be generated.
+    """
+    provider_schema = synthetic.generate_schema(
+        replace(synthetic.PRESETS[preset], resources=5, data_sources=1)
+    )
+    module = schema.Module(
+        name="synthetic",
+        schema=provider_schema,
+        namespace="synthetic",
+        type="synthetic",
+        version="1.0.0",
+    )
+    module_builder = InmantaModuleBuilder(Module("synthetic"))
+    module.build(module_builder, workers=1)
+    assert "synthetic::resources::synthetic_resource_4" in module_builder._model_files
+
+
+def test_cli(tmp_path: pathlib.Path) -> None:
+    """
+    The cli should store the generated schema in the schema cache.
+    """
+    result = CliRunner().invoke(
+        synthetic.main,
+        [
+            "--preset=deep",
+            "--resources=3",
+            "--seed=4",
+            f"--schema-cache-dir={tmp_path}",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+
+    cached_schema = SchemaCache(str(tmp_path)).get("synthetic", "synthetic", "1.0.0")
+    assert cached_schema is not None
+    assert list(cached_schema.resource_schemas.keys()) == [
+        f"synthetic_resource_{i}" for i in range(3)
+    ]
+    assert cached_schema.resource_schemas["synthetic_resource_0"] == (
+        synthetic.generate_schema(
+            replace(synthetic.PRESETS["deep"], resources=3),
+            seed=4,
+        ).resource_schemas["synthetic_resource_0"]
+    )
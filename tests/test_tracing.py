@@ -0,0 +1,124 @@
+"""
+    :copyright: 2022 Inmanta
+    :contact: code@inmanta.com
+    :license: Inmanta EULA
+"""
+import json
+import pathlib
+import pstats
+
+from click.testing import CliRunner
+from inmanta_module_factory.builder import InmantaModuleBuilder
+from inmanta_module_factory.inmanta.module import Module
+
+from terraform_module_generator import cli, schema, synthetic, tracing
+
+
+def schema_dump(resources: int) -> dict:
+    resource = {
+        "version": 0,
+        "block": {
+            "attributes": {
+                "name": {
+                    "type": "string",
+                    "description_kind": "plain",
+                    "required": True,
+                },
+            },
+            "description_kind": "plain",
+        },
+    }
+    return {
+        "format_version": "1.0",
+        "provider_schemas": {
+            "registry.terraform.io/hashicorp/test": {
+                "provider": {"version": 0, "block": {"description_kind": "plain"}},
+                "resource_schemas": {
+                    f"test_resource_{i}": resource for i in range(resources)
+                },
+            },
+        },
+    }
+
+
+def test_span() -> None:
+    """
+    The spans should only be recorded when the tracing is enabled, as complete events
+    of the chrome trace event format.
+    """
+    with tracing.span("ignored"):
+        pass
+    assert not tracing.is_tracing()
+
+    tracing.start_tracing()
+    try:
+        with tracing.span("outer", size=3):
+            with tracing.span("inner", "build"):
+                pass
+    finally:
+        events = tracing.stop_tracing()
+
+    assert not tracing.is_tracing()
+    assert [event["name"] for event in events] == ["inner", "outer"]
+    inner, outer = events
+    assert inner["cat"] == "build" and inner["ph"] == "X"
+    assert outer["args"] == {"size": 3}
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    assert {"tts", "tdur", "pid", "tid"} <= outer.keys()
+
+
+def test_parallel_build_trace() -> None:
+    """
+    The events recorded in the workers should be merged with the ones of the main
+    process, each resource should be parsed and built once.
+    """
+    terraform_module = schema.Module(
+        name="synthetic",
+        schema=synthetic.generate_schema(
+            synthetic.SchemaShape(resources=6, data_sources=0, depth=1)
+        ),
+        namespace="synthetic",
+        type="synthetic",
+        version="1.0.0",
+    )
+    tracing.start_tracing()
+    try:
+        terraform_module.build(InmantaModuleBuilder(Module("synthetic")), workers=2)
+    finally:
+        events = tracing.stop_tracing()
+
+    for category in ["parse", "build"]:
+        assert sorted(
+            event["name"] for event in events if event["cat"] == category
+        ) == sorted(terraform_module.resource_schemas.keys())
+
+
+def test_cli_failure(tmp_path: pathlib.Path) -> None:
+    """
+    The trace and the profile should be written even if the generation fails, to see
+    where it failed.
+    """
+    schema_file = tmp_path / "schema.json"
+    schema_file.write_text(json.dumps(schema_dump(3)))
+    trace_file = tmp_path / "trace.json"
+    result = CliRunner().invoke(
+        cli.main,
+        [
+            "--namespace=hashicorp",
+            "--type=missing",
+            "--version=1.0.0",
+            f"--schema-file={schema_file}",
+            f"--trace={trace_file}",
+            "--profile",
+            str(tmp_path / "output"),
+        ],
+    )
+    assert isinstance(result.exception, ValueError)
+
+    trace = json.loads(trace_file.read_text())
+    assert [event["name"] for event in trace["traceEvents"]] == ["load schema file"]
+    assert not tracing.is_tracing()
+
+    stats = pstats.Stats(str(tmp_path / "output/missing-generation.prof"))
+    assert stats.total_calls > 0